@@ -0,0 +1,22 @@
+-- Migration 018: One npa_kpi_snapshots row per snapshot_date
+--
+-- Goal:
+--   The MCP server's KPI snapshot writer upserts today's row with
+--   INSERT ... ON DUPLICATE KEY UPDATE, which needs a unique key on
+--   snapshot_date. This also makes the dashboard's date lookup an index read.
+--   Safe to run multiple times.
+
+-- Keep only the newest row for any date that already has several
+DELETE older FROM npa_kpi_snapshots older
+JOIN npa_kpi_snapshots newer
+  ON newer.snapshot_date = older.snapshot_date AND newer.id > older.id;
+
+SET @idx_exists := (
+  SELECT COUNT(1)
+  FROM information_schema.statistics
+  WHERE table_schema = DATABASE()
+    AND table_name = 'npa_kpi_snapshots'
+    AND index_name = 'uq_npa_kpi_snapshots_date'
+);
+SET @sql := IF(@idx_exists = 0, 'ALTER TABLE npa_kpi_snapshots ADD UNIQUE INDEX uq_npa_kpi_snapshots_date (snapshot_date)', 'SELECT 1');
+PREPARE stmt FROM @sql; EXECUTE stmt; DEALLOCATE PREPARE stmt;
@@ -0,0 +1,15 @@
+-- Migration 019: Cross-process invalidation for the MCP server's ref_* cache
+--
+-- Goal:
+--   Every MCP worker and replica keeps its own in-memory cache of the ref_*
+--   tables. POST /cache/invalidate bumps the generation of one table (or of
+--   "*" for everything) here, and each process re-reads this table every few
+--   seconds (REF_CACHE_SYNC_INTERVAL) to drop what another process invalidated.
+--   Safe to run multiple times.
+
+CREATE TABLE IF NOT EXISTS `mcp_cache_generations` (
+  `cache_key` varchar(64) NOT NULL COMMENT 'ref_* table name, or * for the whole cache',
+  `generation` bigint(20) NOT NULL DEFAULT 0,
+  `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`cache_key`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -61,6 +61,16 @@ CREATE TABLE `kb_documents` (
   PRIMARY KEY (`doc_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 SET character_set_client = @saved_cs_client;
+DROP TABLE IF EXISTS `mcp_cache_generations`;
+SET @saved_cs_client     = @@character_set_client;
+SET character_set_client = utf8mb4;
+CREATE TABLE `mcp_cache_generations` (
+  `cache_key` varchar(64) NOT NULL COMMENT 'ref_* table name, or * for the whole cache',
+  `generation` bigint(20) NOT NULL DEFAULT 0,
+  `updated_at` timestamp NOT NULL DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`cache_key`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+SET character_set_client = @saved_cs_client;
 DROP TABLE IF EXISTS `npa_agent_routing_decisions`;
 SET @saved_cs_client     = @@character_set_client;
 SET character_set_client = utf8mb4;
@@ -317,7 +327,8 @@ CREATE TABLE `npa_kpi_snapshots` (
   `approvals_total` int(11) DEFAULT NULL,
   `critical_risks` int(11) DEFAULT NULL,
   `created_at` timestamp NOT NULL DEFAULT current_timestamp(),
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_npa_kpi_snapshots_date` (`snapshot_date`)
 ) ENGINE=InnoDB AUTO_INCREMENT=4 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 SET character_set_client = @saved_cs_client;
 DROP TABLE IF EXISTS `npa_loop_backs`;
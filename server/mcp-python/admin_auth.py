@@ -0,0 +1,67 @@
+"""
+Admin authentication for operational REST routes (POST /cache/invalidate).
+
+Accepts the bearer token the Node workbench issues at POST /api/auth/login: an
+HS256 JWT signed with JWT_SECRET (server/middleware/auth.js). Access is decided
+the way rbac('ADMIN') decides it there: 401 without a valid token, 403 for any
+other role. The token is verified with the standard library, so the MCP server
+needs no JWT package.
+
+Env vars:
+  - JWT_SECRET: secret shared with the Node server; unset disables admin routes (default: unset)
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Any
+
+
+def _b64decode(part: str) -> bytes:
+    return base64.urlsafe_b64decode(part + "=" * (-len(part) % 4))
+
+
+def _normalize_role(role: Any) -> str:
+    r = str(role or "").strip().upper()
+    # Granular APPROVER_* roles count as APPROVER, as in server/middleware/rbac.js
+    return "APPROVER" if r.startswith("APPROVER_") else r
+
+
+def _claims(token: str, secret: str) -> dict | None:
+    """The token's payload if it is an unexpired HS256 JWT signed with secret, else None."""
+    try:
+        header, payload, signature = token.split(".")
+        if json.loads(_b64decode(header)).get("alg") != "HS256":
+            return None
+        expected = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(_b64decode(signature), expected):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(claims, dict):
+        return None
+    exp = claims.get("exp")
+    if exp is not None and (not isinstance(exp, (int, float)) or exp <= time.time()):
+        return None
+    return claims
+
+
+def admin_error(authorization: str | None, *roles: str) -> tuple[int, str] | None:
+    """None if the Authorization header carries a valid token with one of roles
+    (default: ADMIN), else the (HTTP status, error message) to answer with."""
+    secret = os.getenv("JWT_SECRET", "")
+    if not secret:
+        return 403, "Admin routes are disabled: JWT_SECRET is not set"
+    if not authorization or not authorization.startswith("Bearer "):
+        return 401, "Authentication required"
+    claims = _claims(authorization[len("Bearer "):], secret)
+    if claims is None:
+        return 401, "Authentication required"
+    if _normalize_role(claims.get("role")) not in {_normalize_role(r) for r in roles or ("ADMIN",)}:
+        return 403, "Insufficient permissions"
+    return None
@@ -4,15 +4,32 @@ Mirrors server/mcp/src/db.ts exactly.
 """
 from __future__ import annotations
 
+import asyncio
+import functools
 import os
+import re
 import ssl
+import time
+from contextlib import asynccontextmanager
 from datetime import date, datetime
-from decimal import Decimal
+from typing import Any, AsyncIterator, Awaitable, Callable
 
 import aiomysql
+from pymysql.constants import FIELD_TYPE
 
 _pool: aiomysql.Pool | None = None
 
+# Upper bounds (ms) of the acquire-wait histogram buckets; the last bucket is +Inf.
+_ACQUIRE_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_pool_stats: dict = {
+    "acquires": 0,
+    "timeouts": 0,
+    "wait_ms_total": 0.0,
+    "wait_ms_max": 0.0,
+    "wait_buckets": [0] * (len(_ACQUIRE_BUCKETS_MS) + 1),
+}
+
 
 def _bool_env(name: str, default: bool = False) -> bool:
     val = os.getenv(name)
@@ -21,6 +38,44 @@ def _bool_env(name: str, default: bool = False) -> bool:
     return val.strip().lower() in ("1", "true", "yes", "y", "on")
 
 
+def _int_env(name: str, default: int) -> int:
+    val = os.getenv(name)
+    if val is None or not val.strip():
+        return default
+    return int(val)
+
+
+def _float_env(name: str, default: float) -> float:
+    val = os.getenv(name)
+    if val is None or not val.strip():
+        return default
+    return float(val)
+
+
+def pool_config() -> dict:
+    """
+    Pool sizing and timeouts.
+
+    Env vars:
+      - DB_POOL_MIN: connections opened eagerly (default: 1)
+      - DB_POOL_MAX: hard cap on open connections (default: 10)
+      - DB_POOL_RECYCLE: seconds before an idle connection is re-opened, -1 to never recycle (default: 3600)
+      - DB_POOL_ACQUIRE_TIMEOUT: seconds a tool waits for a free connection before failing (default: 10)
+      - DB_POOL_BUDGET: total connections across all WEB_CONCURRENCY worker processes;
+        when set, each worker's cap is budget // workers instead of DB_POOL_MAX (default: unset)
+    """
+    maxsize = _int_env("DB_POOL_MAX", 10)
+    budget = _int_env("DB_POOL_BUDGET", 0)
+    if budget > 0:
+        maxsize = max(1, budget // max(1, _int_env("WEB_CONCURRENCY", 1)))
+    return {
+        "minsize": min(_int_env("DB_POOL_MIN", 1), maxsize),
+        "maxsize": maxsize,
+        "pool_recycle": _int_env("DB_POOL_RECYCLE", 3600),
+        "acquire_timeout": _float_env("DB_POOL_ACQUIRE_TIMEOUT", 10.0),
+    }
+
+
 def _build_ssl_ctx() -> ssl.SSLContext | None:
     """
     Build an SSLContext for MySQL connections.
@@ -52,60 +107,477 @@ def _build_ssl_ctx() -> ssl.SSLContext | None:
     return ssl_ctx
 
 
+def _connect_kwargs() -> dict:
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", "3306")),
+        "user": os.getenv("DB_USER", "npa_user"),
+        "password": os.getenv("DB_PASSWORD", "npa_password"),
+        "db": os.getenv("DB_NAME", "npa_workbench"),
+        "autocommit": True,
+        "ssl": _build_ssl_ctx(),
+    }
+
+
 async def get_pool() -> aiomysql.Pool:
     """Return the shared connection pool, creating it on first call."""
     global _pool
     if _pool is None:
-        ssl_ctx = _build_ssl_ctx()
+        cfg = pool_config()
 
         _pool = await aiomysql.create_pool(
-            host=os.getenv("DB_HOST", "localhost"),
-            port=int(os.getenv("DB_PORT", "3306")),
-            user=os.getenv("DB_USER", "npa_user"),
-            password=os.getenv("DB_PASSWORD", "npa_password"),
-            db=os.getenv("DB_NAME", "npa_workbench"),
-            minsize=1,
-            maxsize=10,
-            autocommit=True,
-            ssl=ssl_ctx,
+            minsize=cfg["minsize"],
+            maxsize=cfg["maxsize"],
+            pool_recycle=cfg["pool_recycle"],
+            **_connect_kwargs(),
         )
     return _pool
 
 
-def _serialize_row(row: dict) -> dict:
-    """Convert MySQL types (datetime, Decimal, bytes) to JSON-safe Python types."""
-    out = {}
-    for key, val in row.items():
-        if isinstance(val, datetime):
-            out[key] = val.isoformat()
-        elif isinstance(val, date):
-            out[key] = val.isoformat()
-        elif isinstance(val, Decimal):
-            out[key] = float(val)
-        elif isinstance(val, (bytes, bytearray)):
-            out[key] = val.decode("utf-8", errors="replace")
-        else:
-            out[key] = val
+class AdvisoryLock:
+    """A MySQL GET_LOCK() held on its own connection, outside the pool.
+
+    MySQL ties an advisory lock to the session that took it, so the lock is held
+    for as long as the connection lives and released by the server if this
+    process dies. Used to elect one worker/replica for singleton background jobs.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._conn: aiomysql.Connection | None = None
+
+    async def acquire(self) -> bool:
+        """Take the lock without waiting, or confirm it is still held. True if this process holds it."""
+        if self._conn is not None:
+            try:
+                async with self._conn.cursor() as cur:
+                    await cur.execute("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", [self.name])
+                    (held,) = await cur.fetchone()
+                if held:
+                    return True
+            except Exception:
+                pass
+            # Connection dropped (the server released the lock) or the lock was lost
+            self.release()
+        conn = await aiomysql.connect(**_connect_kwargs())
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT GET_LOCK(%s, 0)", [self.name])
+            (got,) = await cur.fetchone()
+        if got == 1:
+            self._conn = conn
+            return True
+        conn.close()
+        return False
+
+    def release(self) -> None:
+        """Drop the lock by closing its connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _observe_acquire(wait_ms: float) -> None:
+    _pool_stats["acquires"] += 1
+    _pool_stats["wait_ms_total"] += wait_ms
+    _pool_stats["wait_ms_max"] = max(_pool_stats["wait_ms_max"], wait_ms)
+    for i, upper in enumerate(_ACQUIRE_BUCKETS_MS):
+        if wait_ms <= upper:
+            _pool_stats["wait_buckets"][i] += 1
+            return
+    _pool_stats["wait_buckets"][-1] += 1
+
+
+@asynccontextmanager
+async def acquire() -> AsyncIterator[aiomysql.Connection]:
+    """Borrow a pooled connection, recording how long the caller waited for it.
+
+    Raises TimeoutError after DB_POOL_ACQUIRE_TIMEOUT seconds so a starved pool
+    surfaces as an explicit error rather than a slow query.
+    """
+    pool = await get_pool()
+    timeout = pool_config()["acquire_timeout"]
+    start = time.perf_counter()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), timeout=timeout)
+    except asyncio.TimeoutError:
+        _pool_stats["timeouts"] += 1
+        raise TimeoutError(
+            f"Timed out after {timeout}s waiting for a DB connection "
+            f"(pool size={pool.size}, max={pool.maxsize})"
+        ) from None
+    _observe_acquire((time.perf_counter() - start) * 1000)
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+def pool_stats() -> dict:
+    """Snapshot of pool occupancy and acquire-wait metrics for /health and /metrics."""
+    cfg = pool_config()
+    acquires = _pool_stats["acquires"]
+    buckets = {f"le_{upper}ms": n for upper, n in zip(_ACQUIRE_BUCKETS_MS, _pool_stats["wait_buckets"])}
+    buckets["le_inf"] = _pool_stats["wait_buckets"][-1]
+    out = {
+        "initialized": _pool is not None,
+        "minsize": cfg["minsize"],
+        "maxsize": cfg["maxsize"],
+        "pool_recycle": cfg["pool_recycle"],
+        "acquire_timeout": cfg["acquire_timeout"],
+        "size": 0,
+        "in_use": 0,
+        "idle": 0,
+        "acquires": acquires,
+        "timeouts": _pool_stats["timeouts"],
+        "wait_ms_avg": round(_pool_stats["wait_ms_total"] / acquires, 3) if acquires else 0.0,
+        "wait_ms_max": round(_pool_stats["wait_ms_max"], 3),
+        "wait_histogram": buckets,
+    }
+    if _pool is not None:
+        out["size"] = _pool.size
+        out["idle"] = _pool.freesize
+        out["in_use"] = _pool.size - _pool.freesize
     return out
 
 
+def _iso(val: Any) -> Any:
+    # Zero dates ("0000-00-00") come back from PyMySQL as plain strings
+    return val.isoformat() if isinstance(val, (date, datetime)) else val
+
+
+def _to_float(val: Any) -> Any:
+    return float(val) if val is not None else None
+
+
+def _decode(val: Any) -> Any:
+    return val.decode("utf-8", errors="replace") if isinstance(val, (bytes, bytearray)) else val
+
+
+# Column type → converter for MySQL types that aren't JSON-safe as returned by
+# PyMySQL. Every other column (ints, VARCHAR, JSON, ...) is passed through untouched.
+# TEXT columns report a BLOB type code but already arrive as str; _decode is a no-op for them.
+_CONVERTERS: dict[int, Callable[[Any], Any]] = {
+    FIELD_TYPE.DATE: _iso,
+    FIELD_TYPE.NEWDATE: _iso,
+    FIELD_TYPE.DATETIME: _iso,
+    FIELD_TYPE.TIMESTAMP: _iso,
+    FIELD_TYPE.DECIMAL: _to_float,
+    FIELD_TYPE.NEWDECIMAL: _to_float,
+    FIELD_TYPE.BIT: _decode,
+    FIELD_TYPE.TINY_BLOB: _decode,
+    FIELD_TYPE.MEDIUM_BLOB: _decode,
+    FIELD_TYPE.LONG_BLOB: _decode,
+    FIELD_TYPE.BLOB: _decode,
+}
+
+
+def _column_plan(description) -> list[tuple[int, str, Callable[[Any], Any]]]:
+    """(index, name, converter) for each column that needs converting, computed once per result set."""
+    plan = []
+    for i, col in enumerate(description or ()):
+        conv = _CONVERTERS.get(col[1])
+        if conv is not None:
+            plan.append((i, col[0], conv))
+    return plan
+
+
+def _serialize_dicts(rows: list[dict], plan) -> list[dict]:
+    """Convert MySQL types (datetime, Decimal, bytes) to JSON-safe Python types in place."""
+    if plan:
+        for row in rows:
+            for _, name, conv in plan:
+                row[name] = conv(row[name])
+    return rows
+
+
+def _serialize_tuples(rows, plan) -> list[tuple]:
+    if not plan:
+        return list(rows)
+    out = []
+    for row in rows:
+        row = list(row)
+        for i, _, conv in plan:
+            row[i] = conv(row[i])
+        out.append(tuple(row))
+    return out
+
+
+# ─── Write notifications ──────────────────────────────────────────
+# In-process aggregates (see kpi.py) subscribe here to learn which tables a
+# committed statement changed, instead of every write tool reporting it by hand.
+
+_WRITE_TARGET_RE = re.compile(
+    r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?",
+    re.IGNORECASE,
+)
+_write_listeners: list[Callable[[str], None]] = []
+
+
+def on_write(listener: Callable[[str], None]) -> None:
+    """Register listener(table), called after each committed write to that table."""
+    _write_listeners.append(listener)
+
+
+@functools.lru_cache(maxsize=1024)
+def _write_target(sql: str) -> str | None:
+    m = _WRITE_TARGET_RE.match(sql)
+    return m.group(1).lower() if m else None
+
+
+def _notify_write(sql: str) -> None:
+    if not _write_listeners:
+        return
+    table = _write_target(sql)
+    if table is None:
+        return
+    for listener in _write_listeners:
+        listener(table)
+
+
+# No prepared-statement layer: aiomysql only speaks the text protocol, and SQL-level
+# PREPARE/EXECUTE takes parameters only as user variables, so each call would cost a
+# "SET @p = ..." round-trip before the EXECUTE (the pool leaves CLIENT_MULTI_STATEMENTS
+# off). MySQL parses a primary-key lookup such as "SELECT * FROM npa_projects WHERE
+# id = %s" in far less than one round-trip, so that would be slower, not faster. Those
+# lookups are not cached either: npa_projects rows are mutable and every worker writes them.
+async def _run_query(conn: aiomysql.Connection, sql: str, params: list | None) -> list[dict]:
+    async with conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(sql, params or [])
+        rows = await cur.fetchall()
+        return _serialize_dicts(list(rows), _column_plan(cur.description))
+
+
+async def _run_query_tuples(conn: aiomysql.Connection, sql: str, params: list | None) -> list[tuple]:
+    async with conn.cursor() as cur:
+        await cur.execute(sql, params or [])
+        rows = await cur.fetchall()
+        return _serialize_tuples(rows, _column_plan(cur.description))
+
+
+async def _run_execute(conn: aiomysql.Connection, sql: str, params: list | None) -> int:
+    async with conn.cursor() as cur:
+        await cur.execute(sql, params or [])
+        return cur.lastrowid
+
+
 async def query(sql: str, params: list | None = None) -> list[dict]:
     """Execute a SELECT and return all rows as JSON-safe dicts."""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
+    async with acquire() as conn:
+        return await _run_query(conn, sql, params)
+
+
+async def query_tuples(sql: str, params: list | None = None) -> list[tuple]:
+    """Execute a SELECT and return JSON-safe tuples in column order.
+    Cheaper than query() for internal callers that index columns positionally."""
+    async with acquire() as conn:
+        return await _run_query_tuples(conn, sql, params)
+
+
+async def stream(sql: str, params: list | None = None, chunk_size: int = 500) -> AsyncIterator[dict]:
+    """Yield the rows of a SELECT one by one from an unbuffered server-side cursor.
+
+    Rows are pulled from MySQL chunk_size at a time, so the driver's memory stays
+    flat however large the result is; the caller's stays flat only if it folds
+    rows into a bounded result (counts, a page) rather than collecting them all.
+
+    The pooled connection is held until the iterator finishes. Consume it inside
+    contextlib.aclosing() so a break or an exception in the loop body releases
+    the connection immediately instead of when the generator is garbage-collected:
+
+        async with aclosing(stream(sql, params)) as rows:
+            async for row in rows:
+                ...
+    """
+    async with acquire() as conn:
+        async with conn.cursor(aiomysql.SSDictCursor) as cur:
             await cur.execute(sql, params or [])
-            rows = await cur.fetchall()
-            return [_serialize_row(r) for r in rows]
+            plan = _column_plan(cur.description)
+            while True:
+                rows = await cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in _serialize_dicts(list(rows), plan):
+                    yield row
+
+
+async def gather(*aws: Awaitable[Any], limit: int | None = None) -> list:
+    """Await independent queries concurrently, each on its own pooled connection.
+
+    At most `limit` run at once (default: half of DB_POOL_MAX) so a single handler
+    fanning out can't starve every other tool of connections. Results come back
+    in argument order, like asyncio.gather.
+    """
+    if limit is None:
+        limit = max(1, pool_config()["maxsize"] // 2)
+    sem = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable[Any]) -> Any:
+        async with sem:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
 
 
 async def execute(sql: str, params: list | None = None) -> int:
     """Execute an INSERT/UPDATE/DELETE and return lastrowid."""
-    pool = await get_pool()
-    async with pool.acquire() as conn:
+    async with acquire() as conn:
+        lastrowid = await _run_execute(conn, sql, params)
+    _notify_write(sql)
+    return lastrowid
+
+
+class Transaction:
+    """query/execute bound to the single connection pinned by transaction()."""
+
+    def __init__(self, conn: aiomysql.Connection) -> None:
+        self._conn = conn
+        self._writes: list[str] = []
+
+    async def query(self, sql: str, params: list | None = None) -> list[dict]:
+        return await _run_query(self._conn, sql, params)
+
+    async def execute(self, sql: str, params: list | None = None) -> int:
+        lastrowid = await _run_execute(self._conn, sql, params)
+        self._writes.append(sql)
+        return lastrowid
+
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[Transaction]:
+    """Run several statements on one pooled connection and commit them once.
+
+        async with transaction() as tx:
+            rows = await tx.query("SELECT ... FOR UPDATE", [...])
+            await tx.execute("UPDATE ...", [...])
+
+    Commits when the block exits normally, rolls back if it raises.
+
+    This buys atomicity and a single pool acquire, not fewer round-trips: each
+    statement is still sent on its own, plus one for BEGIN and one for COMMIT
+    (N + 2 versus N autocommit statements). Sending them as one multi-statement
+    batch would need CLIENT_MULTI_STATEMENTS on every pooled connection, which
+    this pool deliberately leaves off. Use execute_many for many rows of one statement.
+    """
+    async with acquire() as conn:
+        await conn.begin()
+        tx = Transaction(conn)
+        try:
+            yield tx
+        except BaseException:
+            await conn.rollback()
+            raise
+        await conn.commit()
+    for sql in tx._writes:
+        _notify_write(sql)
+
+
+# Locates the "INSERT ... VALUES (" prefix; the row tuple itself is found by paren matching
+# so templates may contain literals and SQL functions, e.g. VALUES (%s, 'PENDING', NOW()).
+_INSERT_VALUES_RE = re.compile(r"^\s*((?:INSERT|REPLACE)\s.+?\sVALUES\s*)\(", re.IGNORECASE | re.DOTALL)
+
+
+def _split_insert(sql: str) -> tuple[str, str, str] | None:
+    """Split a single-row INSERT into (prefix, row template, postfix), or None."""
+    m = _INSERT_VALUES_RE.match(sql)
+    if not m:
+        return None
+    start = m.end() - 1
+    depth = 0
+    for i in range(start, len(sql)):
+        if sql[i] == "(":
+            depth += 1
+        elif sql[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return m.group(1), sql[start:i + 1], sql[i + 1:].rstrip().rstrip(";")
+    return None
+
+
+async def execute_many(sql: str, params_seq: list, batch_size: int = 500) -> int:
+    """Execute one statement for many parameter rows on a single pooled connection.
+
+    A single-row INSERT/REPLACE ... VALUES (...) [ON DUPLICATE KEY UPDATE ...] is
+    rewritten into multi-row INSERTs of up to batch_size rows, so N rows cost
+    ceil(N / batch_size) round-trips. Any other statement (UPDATE/DELETE) is run
+    once per row on the same connection.
+
+    Returns the affected-row count as MySQL reports it (an upsert that updates
+    counts 2). No auto-increment ids are returned: with innodb_autoinc_lock_mode=2
+    (the MySQL 8 default) or auto_increment_increment > 1, the rows of one
+    multi-row INSERT are not guaranteed consecutive ids. Callers that need the
+    ids use insert_many.
+    """
+    if not params_seq:
+        return 0
+    parts = _split_insert(sql)
+    affected = 0
+    async with acquire() as conn:
         async with conn.cursor() as cur:
-            await cur.execute(sql, params or [])
-            return cur.lastrowid
+            if parts is None:
+                affected = await cur.executemany(sql, params_seq) or 0
+            else:
+                prefix, row_tpl, postfix = parts
+                for i in range(0, len(params_seq), batch_size):
+                    batch = params_seq[i:i + batch_size]
+                    values = ", ".join(cur.mogrify(row_tpl, params) for params in batch)
+                    affected += await cur.execute(f"{prefix}{values}{postfix}")
+    _notify_write(sql)
+    return affected
+
+
+# (innodb_autoinc_lock_mode, auto_increment_increment), read once per process
+_autoinc: tuple[int, int] | None = None
+
+
+async def _autoinc_settings(cur) -> tuple[int, int]:
+    global _autoinc
+    if _autoinc is None:
+        await cur.execute("SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment")
+        mode, increment = await cur.fetchone()
+        _autoinc = (int(mode), int(increment))
+    return _autoinc
+
+
+async def insert_many(sql: str, params_seq: list, batch_size: int = 500) -> list[int]:
+    """Insert many rows with a plain single-row INSERT ... VALUES (...) and return
+    each row's auto-increment id, in params_seq order.
+
+    The template must leave the auto-increment column to the server. Under
+    innodb_autoinc_lock_mode 0 or 1 a multi-row INSERT with a known row count
+    gets one consecutive id block, so each batch is one statement and its ids
+    are lastrowid + i * auto_increment_increment. Under mode 2 (interleaved, the
+    MySQL 8 default) concurrent INSERTs may interleave ids, so the rows are
+    inserted one at a time in a single transaction on one connection and each
+    lastrowid is kept: N round-trips, but exact ids and no pool churn.
+    """
+    if not params_seq:
+        return []
+    parts = _split_insert(sql)
+    if parts is None or parts[2] or not parts[0].lstrip().upper().startswith("INSERT"):
+        raise ValueError("insert_many needs a plain single-row INSERT ... VALUES (...)")
+    prefix, row_tpl, _ = parts
+    ids: list[int] = []
+    async with acquire() as conn:
+        async with conn.cursor() as cur:
+            mode, increment = await _autoinc_settings(cur)
+            if mode in (0, 1):
+                for i in range(0, len(params_seq), batch_size):
+                    batch = params_seq[i:i + batch_size]
+                    values = ", ".join(cur.mogrify(row_tpl, params) for params in batch)
+                    await cur.execute(f"{prefix}{values}")
+                    ids.extend(cur.lastrowid + k * increment for k in range(len(batch)))
+            else:
+                await conn.begin()
+                try:
+                    for params in params_seq:
+                        await cur.execute(sql, params)
+                        ids.append(cur.lastrowid)
+                except BaseException:
+                    await conn.rollback()
+                    raise
+                await conn.commit()
+    _notify_write(sql)
+    return ids
 
 
 async def health_check() -> bool:
@@ -118,11 +590,20 @@ async def health_check() -> bool:
         return False
 
 
-def reset_pool() -> None:
-    """Discard the current pool so the next call to get_pool() creates a fresh one.
-    Call this after running health_check() in a temporary event loop."""
-    global _pool
-    _pool = None
+async def warm_pool(attempts: int = 5, delay: float = 3.0) -> bool:
+    """Create the pool in the running loop and prove it with SELECT 1.
+
+    create_pool() opens DB_POOL_MIN connections eagerly, so once this returns
+    True the first tool call reuses an already-handshaken connection.
+    Retries cover cloud cold starts where MySQL comes up after the server.
+    """
+    for attempt in range(1, attempts + 1):
+        if await health_check():
+            return True
+        await close_pool()
+        print(f"[INIT] DB attempt {attempt}/{attempts} failed, retrying in {delay:g}s...")
+        await asyncio.sleep(delay)
+    return False
 
 
 async def close_pool() -> None:
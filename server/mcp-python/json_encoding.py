@@ -0,0 +1,64 @@
+"""
+JSON encoding for REST and MCP responses.
+
+Tool outputs (audit trails, template fields, KB listings) can run to megabytes,
+and stdlib json.dumps with indent=2 was the slowest and largest way to send
+them. Everything that serializes a response goes through dumps()/dumps_text()
+here, backed by orjson (pinned in requirements.txt) and by stdlib json when it
+is missing from an environment or JSON_ENCODER=stdlib is set; both paths produce the same JSON (non-JSON values fall back to str(), datetimes
+included, exactly like json.dumps(default=str)).
+
+Env vars:
+  - JSON_ENCODER: auto | orjson | stdlib — auto uses orjson when importable (default: auto)
+  - JSON_COMPACT: true drops the indent=2 pretty-printing from MCP text and ToolResult.to_json (default: true)
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _encoder_name() -> str:
+    choice = os.getenv("JSON_ENCODER", "auto").lower()
+    if choice == "orjson" and orjson is None:
+        raise RuntimeError("JSON_ENCODER=orjson but orjson is not installed (pip install orjson)")
+    if choice == "stdlib" or orjson is None:
+        return "stdlib"
+    return "orjson"
+
+
+ENCODER = _encoder_name()
+COMPACT = os.getenv("JSON_COMPACT", "true").lower() in ("1", "true", "yes")
+
+if orjson is not None:
+    # Datetimes pass through to default=str so both encoders emit "2026-01-01 00:00:00"
+    _ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """UTF-8 JSON bytes, compact unless indent=True (2-space)."""
+    if ENCODER == "orjson":
+        return orjson.dumps(obj, default=str, option=_ORJSON_OPTS | (orjson.OPT_INDENT_2 if indent else 0))
+    if indent:
+        return json.dumps(obj, default=str, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_text(obj: Any) -> str:
+    """JSON text for MCP content blocks: compact, or indent=2 when JSON_COMPACT=false."""
+    return dumps(obj, indent=not COMPACT).decode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered through dumps(); also tolerates Decimal/datetime leftovers."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,86 @@
+"""
+KB search index — in-process BM25 inverted index over kb_documents.
+
+search_kb_documents used to run filename/doc_type LIKE '%term%' scans, which
+can't use an index and ignore titles and descriptions. Every text column
+kb_documents carries (filename, title, description, doc_type, ui_category,
+agent_target — the later ones only exist once the KB migrations are applied) is
+tokenized into an inverted index and ranked with BM25. Names and titles count
+twice, so a hit in the document name outranks a passing mention.
+
+This is a metadata index, not full-text search: kb_documents has no content
+column, and the document bodies live in the PDFs under file_path and in the
+Dify datasets the embeddings were built from. Indexing content would need
+that text extracted into the database first (e.g. a text column filled by
+import-kb-pdfs.js alongside the embedding export), then added to _FIELDS.
+
+Tokenizing, filtering and refreshing are shared with npa_similarity in
+text_index: committed writes to kb_documents through db.execute/execute_many
+refresh the index on the next search, and otherwise it is refreshed at most
+every KB_INDEX_REFRESH seconds — rows whose last_synced reached the watermark
+are re-indexed and deleted doc_ids are dropped. The doc_type filter is
+case-insensitive, like the SQL `=` it replaced.
+
+Env vars:
+  - KB_INDEX_REFRESH: seconds between incremental refreshes (default: 30)
+"""
+from __future__ import annotations
+
+import math
+from typing import Any
+
+from text_index import InvertedIndex, TableIndex, tokenize
+
+# (column, weight) — columns missing from the deployed schema are skipped
+_FIELDS = (
+    ("filename", 2), ("title", 2), ("description", 1),
+    ("doc_type", 1), ("ui_category", 1), ("agent_target", 1),
+)
+# Metadata returned with each hit, matching the columns search_kb_documents always returned
+_RESULT_COLUMNS = ("doc_id", "filename", "doc_type", "embedding_id", "last_synced")
+# BM25 parameters (Robertson/Sparck Jones defaults)
+_K1 = 1.2
+_B = 0.75
+
+_table = TableIndex(
+    table="kb_documents",
+    key="doc_id",
+    watermark_column="last_synced",
+    select="SELECT * FROM kb_documents",
+    fields=_FIELDS,
+    result_columns=_RESULT_COLUMNS,
+    max_age_env="KB_INDEX_REFRESH",
+    default_max_age=30,
+)
+_stats = {"searches": 0}
+
+
+def _bm25(index: InvertedIndex, text: str, doc_type: str | None, limit: int) -> list[dict]:
+    n = len(index.docs)
+    if not n:
+        return []
+    avg_len = index.total_len / n or 1.0
+    scores: dict[str, float] = {}
+    for token in set(tokenize(text)):
+        for term in index.expand(token):
+            plist = index.postings[term]
+            idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for doc_id, tf in plist.items():
+                norm = tf + _K1 * (1 - _B + _B * index.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (_K1 + 1) / norm
+    if doc_type:
+        scores = {d: s for d, s in scores.items() if index.matches(d, {"doc_type": doc_type})}
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+    return [{**index.docs[d], "score": round(s, 4)} for d, s in ranked]
+
+
+async def search(text: str, doc_type: str | None = None, limit: int = 10) -> list[dict]:
+    """BM25-ranked kb_documents matching text, best first, each with a 'score'."""
+    index = await _table.refresh()
+    _stats["searches"] += 1
+    return _bm25(index, text, doc_type, limit)
+
+
+def stats() -> dict[str, Any]:
+    """Index size and refresh counters for /metrics."""
+    return {**_table.stats(), **_stats}
@@ -0,0 +1,212 @@
+"""
+KB vector index — local CPU nearest-neighbour search over kb_documents embeddings.
+
+kb_documents.embedding_id points at a row of an embeddings matrix exported
+alongside the KB (the same vectors pushed to the external vector service). The
+matrix is a float .npy file opened memory-mapped, so only the pages a search
+touches are read and several workers share the OS page cache:
+
+  KB_EMBEDDINGS_PATH          e.g. data/kb_embeddings.npy  (N x D float32)
+  <same stem>.ids.json        JSON list of N embedding_ids, row-aligned
+
+Search is cosine similarity. Below KB_VECTOR_IVF_MIN rows it is an exact
+brute-force scan; above it an IVF index (k-means coarse centroids, probing the
+KB_VECTOR_NPROBE nearest lists) is built once per file version. The files are
+re-opened when their mtime changes.
+
+NumPy is pinned in requirements.txt (the `semantic` extra in pyproject.toml)
+and imported on the first semantic search, so it stays off server startup.
+Without it semantic_search_kb reports that it is unavailable and every other
+tool is unaffected.
+
+Env vars:
+  - KB_EMBEDDINGS_PATH: embeddings .npy file, unset disables semantic search (default: unset)
+  - KB_VECTOR_IVF_MIN: row count from which the IVF index is used, 0 = always brute force (default: 50000)
+  - KB_VECTOR_NPROBE: IVF lists probed per query (default: 8)
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import json
+import os
+from typing import Any
+
+# Bound by _load_numpy() on the first search
+np = None
+
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLE = 100_000
+# Rows scored per block, bounding the temporary score buffer on large matrices
+_SCAN_BLOCK = 65_536
+
+
+class VectorIndexUnavailable(RuntimeError):
+    """NumPy or the embeddings file is missing; the message says which."""
+
+
+def _embeddings_path() -> str:
+    return os.getenv("KB_EMBEDDINGS_PATH", "")
+
+
+def _ids_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".ids.json"
+
+
+def _ivf_min() -> int:
+    return int(os.getenv("KB_VECTOR_IVF_MIN", "50000"))
+
+
+def _nprobe() -> int:
+    return int(os.getenv("KB_VECTOR_NPROBE", "8"))
+
+
+class _VectorIndex:
+    def __init__(self, path: str) -> None:
+        ids_path = _ids_path(path)
+        self.version = (os.stat(path).st_mtime_ns, os.stat(ids_path).st_mtime_ns)
+        self.matrix = np.load(path, mmap_mode="r")
+        if self.matrix.ndim != 2:
+            raise VectorIndexUnavailable(f"{path} must be a 2-D matrix, got shape {self.matrix.shape}")
+        with open(ids_path) as f:
+            self.ids: list[str] = [str(i) for i in json.load(f)]
+        if len(self.ids) != self.matrix.shape[0]:
+            raise VectorIndexUnavailable(
+                f"{ids_path} has {len(self.ids)} ids for {self.matrix.shape[0]} embedding rows"
+            )
+        self.row_of = {eid: i for i, eid in enumerate(self.ids)}
+        self.inv_norms = np.empty(len(self.ids), dtype=np.float32)
+        for start in range(0, len(self.ids), _SCAN_BLOCK):
+            block = np.asarray(self.matrix[start:start + _SCAN_BLOCK], dtype=np.float32)
+            norms = np.linalg.norm(block, axis=1)
+            self.inv_norms[start:start + len(block)] = 1.0 / np.where(norms == 0, 1.0, norms)
+        self.centroids = None
+        self.lists: list = []
+        if 0 < _ivf_min() <= len(self.ids):
+            self._build_ivf()
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def _build_ivf(self) -> None:
+        n = len(self.ids)
+        nlist = max(1, int(n ** 0.5))
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(n, size=min(n, _KMEANS_SAMPLE), replace=False))
+        sample = np.asarray(self.matrix[sample_rows], dtype=np.float32) * self.inv_norms[sample_rows, None]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+        for _ in range(_KMEANS_ITERATIONS):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, _SCAN_BLOCK):
+            block = np.asarray(self.matrix[start:start + _SCAN_BLOCK], dtype=np.float32)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self.centroids = centroids
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(nlist)]
+
+    def _score_rows(self, q, rows) -> Any:
+        block = np.asarray(self.matrix[rows], dtype=np.float32)
+        return (block @ q) * self.inv_norms[rows]
+
+    def search(self, vector: list[float], k: int, exclude_row: int | None = None) -> list[tuple[str, float]]:
+        q = np.asarray(vector, dtype=np.float32)
+        if q.shape != (self.dim,):
+            raise ValueError(f"query vector has {q.size} dimensions, index has {self.dim}")
+        q = q / (np.linalg.norm(q) or 1.0)
+        want = k + (exclude_row is not None)
+
+        if self.centroids is not None:
+            probe = np.argsort(self.centroids @ q)[::-1][:_nprobe()]
+            rows = np.sort(np.concatenate([self.lists[c] for c in probe]))
+            scores = self._score_rows(q, rows)
+        else:
+            rows = None
+            scores = np.empty(len(self.ids), dtype=np.float32)
+            for start in range(0, len(self.ids), _SCAN_BLOCK):
+                block = np.asarray(self.matrix[start:start + _SCAN_BLOCK], dtype=np.float32)
+                scores[start:start + len(block)] = (block @ q) * self.inv_norms[start:start + len(block)]
+
+        top = np.argpartition(-scores, want - 1)[:want] if want < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        hits = []
+        for i in top:
+            row = int(rows[i]) if rows is not None else int(i)
+            if row == exclude_row:
+                continue
+            hits.append((self.ids[row], round(float(scores[i]), 4)))
+        return hits[:k]
+
+
+_index: _VectorIndex | None = None
+_load_lock = asyncio.Lock()
+
+
+def _load_numpy() -> bool:
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # optional dependency
+            return False
+        np = numpy
+    return True
+
+
+async def _get_index() -> _VectorIndex:
+    global _index
+    if not _load_numpy():
+        raise VectorIndexUnavailable("semantic search requires numpy (pip install numpy)")
+    path = _embeddings_path()
+    if not path:
+        raise VectorIndexUnavailable("no embeddings file configured (set KB_EMBEDDINGS_PATH)")
+    try:
+        version = (os.stat(path).st_mtime_ns, os.stat(_ids_path(path)).st_mtime_ns)
+    except FileNotFoundError as e:
+        raise VectorIndexUnavailable(f"embeddings file not found: {e.filename}") from e
+    if _index is not None and _index.version == version:
+        return _index
+    async with _load_lock:
+        if _index is None or _index.version != version:
+            # Norms and IVF training scan the whole matrix — keep them off the event loop
+            _index = await asyncio.to_thread(_VectorIndex, path)
+    return _index
+
+
+async def search(vector: list[float], k: int = 10) -> list[tuple[str, float]]:
+    """Top-k (embedding_id, cosine score) for a query vector, best first."""
+    index = await _get_index()
+    return await asyncio.to_thread(index.search, vector, k)
+
+
+async def similar_to(embedding_id: str, k: int = 10) -> list[tuple[str, float]]:
+    """Top-k neighbours of an indexed embedding, excluding itself."""
+    index = await _get_index()
+    row = index.row_of.get(str(embedding_id))
+    if row is None:
+        raise KeyError(embedding_id)
+    vector = np.asarray(index.matrix[row], dtype=np.float32)
+    return await asyncio.to_thread(index.search, vector, k, row)
+
+
+def stats() -> dict[str, Any]:
+    """Index shape and mode for /metrics."""
+    if _index is None:
+        return {"loaded": False, "numpy": importlib.util.find_spec("numpy") is not None, "path": _embeddings_path() or None}
+    return {
+        "loaded": True,
+        "numpy": True,
+        "path": _embeddings_path(),
+        "rows": len(_index.ids),
+        "dim": _index.dim,
+        "mode": "ivf" if _index.centroids is not None else "brute_force",
+        "ivf_lists": len(_index.lists),
+        "nprobe": _nprobe() if _index.centroids is not None else None,
+    }
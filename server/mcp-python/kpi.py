@@ -0,0 +1,342 @@
+"""
+Dashboard KPIs — live-KPI invalidation cache and the npa_kpi_snapshots writer for the COO dashboard.
+
+get_dashboard_kpis used to run six GROUP BY scans over npa_projects,
+npa_breach_alerts and npa_signoffs on every refresh. The results of each group
+are now cached in memory. This is invalidation caching, not incremental
+maintenance: a committed write to a group's source table (via db.on_write)
+marks the group dirty, and the group's GROUP BY is re-run in full; groups are
+also re-read once older than KPI_LIVE_MAX_AGE, which reconciles changes made
+outside this process (SQL consoles, the Node server, other workers).
+
+Readers never wait for that re-read. A dirty or expired group is served from
+the cache while a single background task refreshes every stale group, so a
+dashboard can lag a write by one refresh. Only the very first read, with
+nothing cached yet, waits for the queries.
+
+run_snapshot_writer() keeps today's npa_kpi_snapshots row current (pipeline
+value, active NPAs, cycle time, approval rate, critical risks) from a single
+aggregate pass over npa_projects, using the same definitions as the Node
+/api/dashboard/kpis route. It runs as a background task of the REST lifespan in
+every worker, but only the one holding the npa_kpi_snapshot_writer advisory lock
+writes; the others re-try the election each tick and take over if it dies.
+Snapshots are upserted on the unique snapshot_date key (migration 018). The
+leader checks information_schema for that key once; on a database without it,
+it updates today's newest row or inserts one, which is safe because only the
+lock holder writes.
+
+Env vars:
+  - KPI_LIVE_MAX_AGE: seconds a cached group is served without a write before it is refreshed (default: 60)
+  - KPI_SNAPSHOT_INTERVAL: seconds between snapshot refreshes, 0 disables the writer (default: 900)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from datetime import date
+
+from db import AdvisoryLock, execute, gather, on_write, query
+
+# group -> (source table, SQL, row key or None for a single COUNT(*))
+_GROUPS: dict[str, tuple[str, str, str | None]] = {
+    "status_distribution": (
+        "npa_projects",
+        "SELECT status, COUNT(*) as cnt FROM npa_projects GROUP BY status",
+        "status",
+    ),
+    "stage_distribution": (
+        "npa_projects",
+        """SELECT current_stage, COUNT(*) as cnt
+           FROM npa_projects
+           WHERE status = 'ACTIVE'
+           GROUP BY current_stage""",
+        "current_stage",
+    ),
+    "risk_distribution": (
+        "npa_projects",
+        """SELECT risk_level, COUNT(*) as cnt
+           FROM npa_projects
+           WHERE status = 'ACTIVE'
+           GROUP BY risk_level""",
+        "risk_level",
+    ),
+    "open_breaches": (
+        "npa_breach_alerts",
+        """SELECT severity, COUNT(*) as cnt
+           FROM npa_breach_alerts
+           WHERE status IN ('OPEN', 'ESCALATED')
+           GROUP BY severity""",
+        "severity",
+    ),
+    "sla_breaches_pending": (
+        "npa_signoffs",
+        """SELECT COUNT(*) as cnt
+           FROM npa_signoffs
+           WHERE sla_breached = 1 AND status = 'PENDING'""",
+        None,
+    ),
+    "pending_signoffs": (
+        "npa_signoffs",
+        "SELECT COUNT(*) as cnt FROM npa_signoffs WHERE status = 'PENDING'",
+        None,
+    ),
+}
+
+_SOURCES = frozenset(source for source, _, _ in _GROUPS.values())
+
+_values: dict[str, dict | int] = {}
+_computed_at: dict[str, float] = {}
+# Bumped on every write to a group's source table; a group is clean while
+# _clean_version[group] == _version[group]
+_version: dict[str, int] = {name: 0 for name in _GROUPS}
+_clean_version: dict[str, int] = {}
+_lock = asyncio.Lock()
+_refresh_task: asyncio.Task | None = None
+_stats = {
+    "reads": 0, "served_fresh": 0, "served_stale": 0, "refreshes": 0,
+    "refresh_failures": 0, "groups_recomputed": 0, "writes_seen": 0,
+}
+_last_error: str | None = None
+
+
+def _max_age() -> float:
+    return float(os.getenv("KPI_LIVE_MAX_AGE", "60"))
+
+
+def _on_write(table: str) -> None:
+    if table not in _SOURCES:
+        return
+    _stats["writes_seen"] += 1
+    for name, (source, _, _) in _GROUPS.items():
+        if source == table:
+            _version[name] += 1
+
+
+on_write(_on_write)
+
+
+def _fold(rows: list[dict], key: str | None) -> dict | int:
+    if key is None:
+        return rows[0]["cnt"] if rows else 0
+    return {row[key]: row["cnt"] for row in rows}
+
+
+def _stale_groups() -> list[str]:
+    now = time.monotonic()
+    max_age = _max_age()
+    return [
+        name for name in _GROUPS
+        if _clean_version.get(name) != _version[name]
+        or now - _computed_at.get(name, float("-inf")) > max_age
+    ]
+
+
+async def _recompute(names: list[str]) -> None:
+    # Capture versions before reading: a write landing mid-read leaves the group dirty
+    versions = {name: _version[name] for name in names}
+    results = await gather(*(query(_GROUPS[name][1]) for name in names))
+    now = time.monotonic()
+    for name, rows in zip(names, results):
+        _values[name] = _fold(rows, _GROUPS[name][2])
+        _clean_version[name] = versions[name]
+        _computed_at[name] = now
+    _stats["groups_recomputed"] += len(names)
+
+
+async def _background_refresh() -> None:
+    global _last_error
+    _stats["refreshes"] += 1
+    try:
+        async with _lock:
+            stale = _stale_groups()
+            if stale:
+                await _recompute(stale)
+        _last_error = None
+    except Exception as e:
+        _stats["refresh_failures"] += 1
+        _last_error = str(e)
+        print(f"[KPI] Live KPI refresh failed: {e}")
+
+
+async def live() -> dict:
+    """Return the cached live KPI groups. Stale groups are served as-is while one
+    background task re-reads them; only a cold cache makes the caller wait."""
+    global _refresh_task
+    _stats["reads"] += 1
+    if len(_values) < len(_GROUPS):
+        async with _lock:
+            missing = [name for name in _GROUPS if name not in _values]
+            if missing:
+                await _recompute(missing)
+    if _stale_groups():
+        _stats["served_stale"] += 1
+        if _refresh_task is None or _refresh_task.done():
+            _refresh_task = asyncio.create_task(_background_refresh())
+    else:
+        _stats["served_fresh"] += 1
+    return {
+        name: dict(_values[name]) if isinstance(_values[name], dict) else _values[name]
+        for name in _GROUPS
+    }
+
+
+def invalidate() -> None:
+    """Mark every group dirty so the next live() refreshes all of them."""
+    _clean_version.clear()
+
+
+def stats() -> dict:
+    """Read/refresh counters and group ages for /metrics."""
+    now = time.monotonic()
+    return {
+        "max_age": _max_age(),
+        **_stats,
+        "refreshing": _refresh_task is not None and not _refresh_task.done(),
+        "last_error": _last_error,
+        "groups": {
+            name: {
+                "dirty": _clean_version.get(name) != _version[name],
+                "age": round(now - _computed_at[name], 1) if name in _computed_at else None,
+            }
+            for name in _GROUPS
+        },
+    }
+
+
+# ─── Snapshot writer ──────────────────────────────────────────────
+
+_SNAPSHOT_SQL = """
+    SELECT
+        SUM(estimated_revenue) as pipeline_value,
+        COUNT(CASE WHEN status != 'Stopped' AND current_stage NOT IN ('LAUNCHED', 'APPROVED', 'PROHIBITED') THEN 1 END) as active_npas,
+        AVG(CASE WHEN current_stage IN ('LAUNCHED', 'APPROVED') THEN DATEDIFF(updated_at, created_at) END) as avg_cycle_days,
+        COUNT(CASE WHEN current_stage IN ('LAUNCHED', 'APPROVED') THEN 1 END) as approvals_completed,
+        COUNT(CASE WHEN current_stage IN ('LAUNCHED', 'APPROVED', 'PROHIBITED') THEN 1 END) as approvals_total,
+        SUM(CASE WHEN predicted_timeline_days > 60 OR status = 'At Risk' THEN 1 ELSE 0 END) as critical_risks
+    FROM npa_projects
+"""
+
+_SNAPSHOT_COLUMNS = (
+    "pipeline_value", "active_npas", "avg_cycle_days", "approval_rate",
+    "approvals_completed", "approvals_total", "critical_risks",
+)
+
+_snapshot_stats: dict = {
+    "runs": 0, "failures": 0, "leader": False, "skipped_not_leader": 0,
+    # None until checked by the leader, then whether migration 018's unique key exists
+    "unique_date_key": None, "last_written": None, "last_error": None,
+}
+
+
+def _snapshot_interval() -> float:
+    return float(os.getenv("KPI_SNAPSHOT_INTERVAL", "900"))
+
+
+async def compute_snapshot() -> dict:
+    """Compute the npa_kpi_snapshots columns in one pass over npa_projects."""
+    rows = await query(_SNAPSHOT_SQL)
+    row = rows[0] if rows else {}
+    completed = int(row.get("approvals_completed") or 0)
+    total = int(row.get("approvals_total") or 0)
+    return {
+        "pipeline_value": round(row.get("pipeline_value") or 0.0, 2),
+        "active_npas": int(row.get("active_npas") or 0),
+        "avg_cycle_days": round(row.get("avg_cycle_days") or 0.0, 2),
+        "approval_rate": round(completed / total * 100, 2) if total else 0.0,
+        "approvals_completed": completed,
+        "approvals_total": total,
+        "critical_risks": int(row.get("critical_risks") or 0),
+    }
+
+
+_SNAPSHOT_UPSERT = f"""
+    INSERT INTO npa_kpi_snapshots (snapshot_date, {', '.join(_SNAPSHOT_COLUMNS)})
+    VALUES (%s, {', '.join(['%s'] * len(_SNAPSHOT_COLUMNS))})
+    ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in _SNAPSHOT_COLUMNS)}
+"""
+
+
+# A unique index on snapshot_date alone; a composite key would not make upserts one-per-day
+_UNIQUE_DATE_KEY_SQL = """
+    SELECT index_name AS name
+    FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'npa_kpi_snapshots' AND non_unique = 0
+    GROUP BY index_name
+    HAVING COUNT(*) = 1 AND MAX(column_name) = 'snapshot_date'
+"""
+
+_SNAPSHOT_LATEST_ID = "SELECT id FROM npa_kpi_snapshots WHERE snapshot_date = %s ORDER BY id DESC LIMIT 1"
+
+_SNAPSHOT_INSERT = f"""
+    INSERT INTO npa_kpi_snapshots (snapshot_date, {', '.join(_SNAPSHOT_COLUMNS)})
+    VALUES (%s, {', '.join(['%s'] * len(_SNAPSHOT_COLUMNS))})
+"""
+
+_SNAPSHOT_UPDATE = f"""
+    UPDATE npa_kpi_snapshots SET {', '.join(f'{c} = %s' for c in _SNAPSHOT_COLUMNS)} WHERE id = %s
+"""
+
+
+async def has_unique_snapshot_date() -> bool:
+    """True if npa_kpi_snapshots has the unique snapshot_date key that write_snapshot's upsert relies on."""
+    return bool(await query(_UNIQUE_DATE_KEY_SQL))
+
+
+async def write_snapshot(snapshot_date: date | None = None, upsert: bool = True) -> dict:
+    """Compute the KPI set and store it as the snapshot for snapshot_date (default: today).
+
+    upsert=True relies on the unique snapshot_date key. Without it, pass
+    upsert=False: the newest row for the day is updated, or one is inserted.
+    That read-then-write is only safe from a single writer (the lock holder).
+    """
+    day = snapshot_date or date.today()
+    snapshot = await compute_snapshot()
+    values = [snapshot[c] for c in _SNAPSHOT_COLUMNS]
+    if upsert:
+        await execute(_SNAPSHOT_UPSERT, [day] + values)
+    else:
+        existing = await query(_SNAPSHOT_LATEST_ID, [day])
+        if existing:
+            await execute(_SNAPSHOT_UPDATE, values + [existing[0]["id"]])
+        else:
+            await execute(_SNAPSHOT_INSERT, [day] + values)
+    return {"snapshot_date": day.isoformat(), **snapshot}
+
+
+async def run_snapshot_writer() -> None:
+    """Refresh today's snapshot every KPI_SNAPSHOT_INTERVAL seconds until cancelled,
+    in the one process elected by the advisory lock. Failures are logged and
+    retried on the next tick rather than ending the task."""
+    interval = _snapshot_interval()
+    if interval <= 0:
+        return
+    lock = AdvisoryLock("npa_kpi_snapshot_writer")
+    try:
+        while True:
+            _snapshot_stats["runs"] += 1
+            try:
+                _snapshot_stats["leader"] = await lock.acquire()
+                if _snapshot_stats["leader"]:
+                    if _snapshot_stats["unique_date_key"] is None:
+                        _snapshot_stats["unique_date_key"] = await has_unique_snapshot_date()
+                        if not _snapshot_stats["unique_date_key"]:
+                            print("[KPI] npa_kpi_snapshots has no unique snapshot_date key (migration 018); "
+                                  "updating rows in place instead of upserting")
+                    written = await write_snapshot(upsert=_snapshot_stats["unique_date_key"])
+                    _snapshot_stats["last_written"] = written
+                    _snapshot_stats["last_error"] = None
+                else:
+                    _snapshot_stats["skipped_not_leader"] += 1
+            except Exception as e:
+                _snapshot_stats["failures"] += 1
+                _snapshot_stats["last_error"] = str(e)
+                print(f"[KPI] Snapshot write failed: {e}")
+            await asyncio.sleep(interval)
+    finally:
+        lock.release()
+
+
+def snapshot_stats() -> dict:
+    """Writer interval, leadership, run/failure counts and the last snapshot written, for /metrics."""
+    return {"interval": _snapshot_interval(), **_snapshot_stats}
@@ -7,54 +7,85 @@ import os
 import sys
 
 from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp.tools import Tool
+from mcp.server.fastmcp.utilities.func_metadata import ArgModelBase, FuncMetadata
+from mcp.types import TextContent
+from pydantic import ConfigDict
 
 # Ensure tools/ is importable
 sys.path.insert(0, os.path.dirname(__file__))
 
+from json_encoding import dumps_text  # noqa: E402
 from registry import registry  # noqa: E402
 
-# Import all tool modules so they self-register
+# Register every tool (modules with a current catalog entry load on first call)
 import tools  # noqa: E402, F401
 
 MCP_PORT = int(os.getenv("MCP_PORT", "3001"))
 
-# Create the FastMCP server
+
+class _ToolArguments(ArgModelBase):
+    """Passes the call's arguments through as-is; the registry handlers validate their own input."""
+
+    model_config = ConfigDict(extra="allow")
+
+    def model_dump_one_level(self) -> dict:
+        return dict(self.model_extra or {})
+
+
+# One argument model shared by every tool. FastMCP's tool() decorator would build
+# a pydantic model per tool from the handler signature — the bulk of import time,
+# and with a **kwargs handler it advertised a single required "kwargs" string
+# instead of the tool's real input schema.
+_TOOL_METADATA = FuncMetadata(arg_model=_ToolArguments)
+
+
+def _make_handler(name: str):
+    async def handler(**kwargs):
+        try:
+            # Looked up per call: a catalog placeholder is replaced once its module loads
+            result = await registry.get_tool(name).handler(kwargs)
+            # Return a ready TextContent so FastMCP passes it through untouched.
+            # Returning a JSON *string* caused double-serialisation: the string
+            # was wrapped in TextContent and then JSON-encoded again, producing
+            # two concatenated JSON objects that Dify could not parse
+            # ("Extra data: line 1 column 160"). A plain dict works but is
+            # always pretty-printed by pydantic; this goes through json_encoding.
+            return TextContent(type="text", text=result.to_json())
+        except Exception as e:
+            return TextContent(type="text", text=dumps_text({"success": False, "error": str(e)}))
+    handler.__name__ = name
+    return handler
+
+
+# Every registry tool as a FastMCP Tool, advertised with its JSON Schema
+_mcp_tools = [
+    Tool(
+        fn=_make_handler(td.name),
+        name=td.name,
+        description=td.description,
+        parameters=td.input_schema,
+        fn_metadata=_TOOL_METADATA,
+        is_async=True,
+    )
+    for td in registry.get_all()
+]
+
+# Create the FastMCP server.
+# The streamable-HTTP transport (mounted at /mcp by rest_server) is stateless:
+# every POST is a self-contained JSON-RPC exchange, so no connection is held
+# between agent calls and any worker or replica can answer it.
 mcp_server = FastMCP(
     name="npa-workbench-mcp",
     host="0.0.0.0",
     port=MCP_PORT,
+    tools=_mcp_tools,
+    streamable_http_path="/",
+    stateless_http=True,
+    # Plain JSON bodies instead of a one-event SSE stream per call
+    json_response=os.getenv("MCP_HTTP_JSON_RESPONSE", "true").lower() in ("1", "true", "yes"),
 )
 
-# Register every tool from the registry into FastMCP
-for tool_def in registry.get_all():
-    # Capture tool_def in closure
-    def _make_handler(td):
-        async def handler(**kwargs):
-            try:
-                result = await td.handler(kwargs)
-                # Return a plain dict — FastMCP serialises it once as TextContent.
-                # Returning a JSON *string* caused double-serialisation: the string
-                # was wrapped in TextContent and then JSON-encoded again, producing
-                # two concatenated JSON objects that Dify could not parse
-                # ("Extra data: line 1 column 160").
-                d: dict = {"success": result.success}
-                if result.data is not None:
-                    d["data"] = result.data
-                if result.error is not None:
-                    d["error"] = result.error
-                return d
-            except Exception as e:
-                return {"success": False, "error": str(e)}
-        # Set function metadata for FastMCP
-        handler.__name__ = td.name
-        handler.__doc__ = td.description
-        return handler
-
-    # Build the tool's parameter annotations from JSON Schema for FastMCP
-    mcp_server.tool(name=tool_def.name, description=tool_def.description)(
-        _make_handler(tool_def)
-    )
-
 
 def start_mcp_sse_server():
     """Start the MCP SSE server on the configured port."""
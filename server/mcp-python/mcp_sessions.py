@@ -0,0 +1,351 @@
+"""
+MCP SSE session affinity across worker processes and replicas.
+
+FastMCP's SSE transport keeps each session's message queue in the memory of
+the process holding the GET /mcp/sse stream. With several workers
+(WEB_CONCURRENCY > 1) or several replicas behind a load balancer, the client's
+POST /mcp/messages?session_id=... often lands on a process that has never heard
+of the session and FastMCP answers 404.
+
+SessionAffinity wraps the SSE app. It learns each session id from the
+"endpoint" event of the streams it serves and records itself as the owner in a
+SessionStore. A POST for a session owned elsewhere is relayed to the owner's
+relay listener; the owner replays it into its own SSE app and the response is
+copied back to the client.
+
+Stores (MCP_SESSION_STORE):
+  - memory: process-local, no relay — a single process, the default
+  - file:   one owner file per session in MCP_SESSION_DIR — workers on one host,
+            or replicas sharing a volume; also the stand-in used in tests
+  - module:Class — a SessionStore subclass implementing its abstract methods
+                   (e.g. a Redis-backed one); anything else fails at startup
+
+Relay listeners (MCP_RELAY):
+  - unix: a socket per worker inside MCP_SESSION_DIR (same host only)
+  - tcp:  an ephemeral port per worker on MCP_RELAY_BIND, advertised as
+          MCP_RELAY_HOST:port so other replicas can reach it; MCP_RELAY_SECRET
+          authenticates relays and must be set, or the worker refuses to start
+
+Env vars:
+  - MCP_SESSION_STORE: memory | file | module:Class (default: memory, file when WEB_CONCURRENCY > 1)
+  - MCP_SESSION_DIR: file-store directory and unix sockets (default: <tmp>/npa-mcp-sessions-<port>)
+  - MCP_RELAY: unix | tcp (default: unix)
+  - MCP_RELAY_HOST: hostname other replicas use to reach this one (default: this host's name)
+  - MCP_RELAY_BIND: interface the tcp relay listens on (default: MCP_RELAY_HOST)
+  - MCP_RELAY_SECRET: shared secret required on relayed requests, mandatory for tcp (default: unset)
+"""
+from __future__ import annotations
+
+import abc
+import asyncio
+import hmac
+import importlib
+import json
+import os
+import re
+import socket
+import struct
+from urllib.parse import parse_qs
+
+_SESSION_RE = re.compile(rb"session_id=([0-9a-f]{32})")
+_FORWARDED_HEADER = b"x-mcp-forwarded"
+_LEN = struct.Struct(">I")
+
+
+# ─── Session stores ───────────────────────────────────────────────
+
+class SessionStore(abc.ABC):
+    """session_id -> owner relay address ("unix:/path" or "tcp:host:port")."""
+
+    shared = True  # False: owners are only visible to this process, so no relay is started
+
+    @abc.abstractmethod
+    async def register(self, session_id: str, owner: str) -> None: ...
+
+    @abc.abstractmethod
+    async def lookup(self, session_id: str) -> str | None: ...
+
+    @abc.abstractmethod
+    async def unregister(self, session_id: str) -> None: ...
+
+
+class MemorySessionStore(SessionStore):
+    shared = False
+
+    def __init__(self, **_) -> None:
+        self._owners: dict[str, str] = {}
+
+    async def register(self, session_id: str, owner: str) -> None:
+        self._owners[session_id] = owner
+
+    async def lookup(self, session_id: str) -> str | None:
+        return self._owners.get(session_id)
+
+    async def unregister(self, session_id: str) -> None:
+        self._owners.pop(session_id, None)
+
+
+class FileSessionStore(SessionStore):
+    """One small file per session, written atomically."""
+
+    def __init__(self, directory: str, **_) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.owner")
+
+    async def register(self, session_id: str, owner: str) -> None:
+        tmp = f"{self._path(session_id)}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(owner)
+        os.replace(tmp, self._path(session_id))
+
+    async def lookup(self, session_id: str) -> str | None:
+        try:
+            with open(self._path(session_id)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def unregister(self, session_id: str) -> None:
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+_STORES: dict[str, type[SessionStore]] = {"memory": MemorySessionStore, "file": FileSessionStore}
+
+
+def make_store(name: str, directory: str) -> SessionStore:
+    """Build the store named by MCP_SESSION_STORE; "module:Class" imports a custom one."""
+    if ":" in name:
+        module, _, cls = name.partition(":")
+        factory = getattr(importlib.import_module(module), cls)
+        if not (isinstance(factory, type) and issubclass(factory, SessionStore)):
+            raise TypeError(f"MCP_SESSION_STORE '{name}' is not a SessionStore subclass")
+    else:
+        try:
+            factory = _STORES[name]
+        except KeyError:
+            raise ValueError(f"Unknown MCP_SESSION_STORE '{name}' (expected {', '.join(_STORES)} or module:Class)") from None
+    return factory(directory=directory)
+
+
+# ─── Relay wire format ────────────────────────────────────────────
+
+async def _write_frame(writer: asyncio.StreamWriter, header: dict, body: bytes) -> None:
+    encoded = json.dumps(header).encode("utf-8")
+    writer.write(_LEN.pack(len(encoded)) + encoded + _LEN.pack(len(body)) + body)
+    await writer.drain()
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> tuple[dict, bytes]:
+    (header_len,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+    header = json.loads(await reader.readexactly(header_len))
+    (body_len,) = _LEN.unpack(await reader.readexactly(_LEN.size))
+    return header, await reader.readexactly(body_len)
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+async def _connect(address: str) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    kind, _, target = address.partition(":")
+    if kind == "unix":
+        return await asyncio.open_unix_connection(target)
+    host, _, port = target.rpartition(":")
+    return await asyncio.open_connection(host, int(port))
+
+
+# ─── ASGI wrapper ─────────────────────────────────────────────────
+
+class SessionAffinity:
+    """ASGI wrapper that routes MCP SSE POSTs to the process owning the session."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.local: set[str] = set()
+        self.store: SessionStore | None = None
+        self.address: str | None = None
+        self._secret = ""
+        self._unix_path: str | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._stats = {"sessions_opened": 0, "relayed_out": 0, "relayed_in": 0, "relay_failures": 0, "relay_rejected": 0}
+
+    # ── lifecycle (called from the REST lifespan in every worker) ──
+
+    async def start(self, store: SessionStore, relay: str = "unix", directory: str = "",
+                    relay_host: str | None = None, secret: str = "", relay_bind: str | None = None) -> None:
+        self.store = store
+        self._secret = secret
+        if not store.shared:
+            return
+        if relay == "tcp":
+            # Anyone who can reach the port could inject messages into a session
+            if not secret:
+                raise ValueError("MCP_RELAY=tcp requires MCP_RELAY_SECRET")
+            relay_host = relay_host or socket.gethostname()
+            self._server = await asyncio.start_server(self._serve_relay, host=relay_bind or relay_host, port=0)
+            port = self._server.sockets[0].getsockname()[1]
+            self.address = f"tcp:{relay_host}:{port}"
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self._unix_path = os.path.join(directory, f"worker-{os.getpid()}.sock")
+            if os.path.exists(self._unix_path):
+                os.remove(self._unix_path)
+            self._server = await asyncio.start_unix_server(self._serve_relay, path=self._unix_path)
+            self.address = f"unix:{self._unix_path}"
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self.store is not None:
+            for session_id in list(self.local):
+                await self.store.unregister(session_id)
+        if self._unix_path and os.path.exists(self._unix_path):
+            os.remove(self._unix_path)
+
+    # ── ASGI entry point ──
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http":
+            if scope["method"] == "GET" and scope["path"].rstrip("/") == "/sse":
+                await self._serve_sse(scope, receive, send)
+                return
+            if scope["method"] == "POST" and self.address is not None and await self._maybe_relay(scope, receive, send):
+                return
+        await self.app(scope, receive, send)
+
+    async def _serve_sse(self, scope, receive, send) -> None:
+        session_id = None
+
+        async def send_wrapper(message) -> None:
+            nonlocal session_id
+            if session_id is None and message["type"] == "http.response.body":
+                m = _SESSION_RE.search(message.get("body", b""))
+                if m:
+                    session_id = m.group(1).decode()
+                    self.local.add(session_id)
+                    self._stats["sessions_opened"] += 1
+                    if self.address is not None:
+                        await self.store.register(session_id, self.address)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if session_id is not None:
+                self.local.discard(session_id)
+                if self.address is not None:
+                    await self.store.unregister(session_id)
+
+    async def _maybe_relay(self, scope, receive, send) -> bool:
+        session_id = parse_qs(scope.get("query_string", b"").decode()).get("session_id", [None])[0]
+        if not session_id or session_id in self.local:
+            return False
+        if any(name == _FORWARDED_HEADER for name, _ in scope["headers"]):
+            return False
+        owner = await self.store.lookup(session_id)
+        if owner is None or owner == self.address:
+            return False
+
+        body = await _read_body(receive)
+        try:
+            reader, writer = await _connect(owner)
+            try:
+                await _write_frame(writer, {
+                    "secret": self._secret,
+                    "path": scope["path"],
+                    "root_path": scope.get("root_path", ""),
+                    "query_string": scope.get("query_string", b"").decode("latin-1"),
+                    "headers": [[k.decode("latin-1"), v.decode("latin-1")] for k, v in scope["headers"]],
+                }, body)
+                header, response_body = await _read_frame(reader)
+                self._stats["relayed_out"] += 1
+            finally:
+                writer.close()
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            # Owner process is gone; its session died with it
+            self._stats["relay_failures"] += 1
+            await self.store.unregister(session_id)
+            header, response_body = {"status": 404, "headers": [["content-type", "text/plain"]]}, b"Could not find session"
+
+        await send({
+            "type": "http.response.start",
+            "status": header["status"],
+            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in header["headers"]],
+        })
+        await send({"type": "http.response.body", "body": response_body})
+        return True
+
+    async def _serve_relay(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Replay a relayed POST into the local SSE app and send its response back."""
+        try:
+            request, body = await _read_frame(reader)
+            if not hmac.compare_digest(str(request.get("secret", "")), self._secret):
+                self._stats["relay_rejected"] += 1
+                await _write_frame(writer, {"status": 403, "headers": [["content-type", "text/plain"]]}, b"Relay rejected")
+                return
+            self._stats["relayed_in"] += 1
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "POST",
+                "scheme": "http",
+                "path": request["path"],
+                "raw_path": request["path"].encode("latin-1"),
+                "root_path": request["root_path"],
+                "query_string": request["query_string"].encode("latin-1"),
+                "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in request["headers"]]
+                + [(_FORWARDED_HEADER, b"1")],
+                "client": None,
+                "server": None,
+            }
+            delivered = False
+
+            async def receive():
+                nonlocal delivered
+                if delivered:
+                    return {"type": "http.disconnect"}
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            status, headers, chunks = 500, [], []
+
+            async def send(message):
+                nonlocal status, headers
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    headers = [[k.decode("latin-1"), v.decode("latin-1")] for k, v in message.get("headers", [])]
+                elif message["type"] == "http.response.body":
+                    chunks.append(message.get("body", b""))
+
+            await self.app(scope, receive, send)
+            await _write_frame(writer, {"status": status, "headers": headers}, b"".join(chunks))
+        except (asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def stats(self) -> dict:
+        """Store type, relay address, local session count and relay counters for /metrics."""
+        return {
+            "store": type(self.store).__name__ if self.store else None,
+            "relay_address": self.address,
+            "local_sessions": len(self.local),
+            **self._stats,
+        }
@@ -0,0 +1,101 @@
+"""
+NPA similarity index — TF-IDF cosine ranking of historical npa_projects for ideation_find_similar.
+
+ideation_find_similar used to run title/description LIKE '%term%' scans that
+returned unranked rows. Each project's title (weighted 2x), description,
+product_category and npa_type are held as sparse term-frequency vectors with an
+inverted index, so a query only scores projects sharing at least one term and
+results come back ordered by cosine similarity.
+
+Tokenizing, filtering and refreshing are shared with kb_index in text_index.
+Committed writes to npa_projects (ideation_create_npa, update_npa_project, the
+stage/track updates, prospect conversion) mark the index dirty via db.on_write;
+the next search re-reads rows whose updated_at reached the watermark and drops
+deleted ids. NPA_SIMILARITY_MAX_AGE bounds how long writes made outside this
+process go unseen. Filters are case-insensitive, like the SQL `=` they replaced.
+
+Env vars:
+  - NPA_SIMILARITY_MAX_AGE: seconds before a clean index is re-checked anyway (default: 300)
+"""
+from __future__ import annotations
+
+import math
+from collections import Counter
+from typing import Any
+
+from text_index import InvertedIndex, TableIndex, tokenize
+
+_FIELDS = (("title", 2), ("description", 1), ("product_category", 1), ("npa_type", 1))
+# Columns returned with each match: identity plus outcome (stage/status/track)
+_RESULT_COLUMNS = (
+    "id", "title", "description", "npa_type", "product_category", "risk_level",
+    "current_stage", "status", "notional_amount", "approval_track", "created_at",
+)
+
+_table = TableIndex(
+    table="npa_projects",
+    key="id",
+    watermark_column="updated_at",
+    select=f"SELECT {', '.join(_RESULT_COLUMNS)}, updated_at FROM npa_projects",
+    fields=_FIELDS,
+    result_columns=_RESULT_COLUMNS,
+    max_age_env="NPA_SIMILARITY_MAX_AGE",
+    default_max_age=300,
+)
+# (index, generation, norms): IDF shifts with every add/remove, so norms are
+# recomputed lazily once per change batch
+_norms_cache: tuple[InvertedIndex | None, int, dict[str, float]] = (None, -1, {})
+_stats = {"searches": 0}
+
+
+def _idf(index: InvertedIndex, term: str) -> float:
+    return math.log((1 + len(index.docs)) / (1 + len(index.postings[term]))) + 1.0
+
+
+def _doc_norms(index: InvertedIndex) -> dict[str, float]:
+    global _norms_cache
+    cached_index, generation, norms = _norms_cache
+    if cached_index is not index or generation != index.generation:
+        idf = {term: _idf(index, term) for term in index.postings}
+        norms = {
+            pid: math.sqrt(sum((tf * idf[t]) ** 2 for t, tf in terms.items())) or 1.0
+            for pid, terms in index.doc_terms.items()
+        }
+        _norms_cache = (index, index.generation, norms)
+    return norms
+
+
+def _cosine(index: InvertedIndex, text: str, filters: dict[str, str], limit: int) -> list[dict]:
+    q_weights: dict[str, float] = {}
+    for token, tf in Counter(tokenize(text)).items():
+        for term in index.expand(token):
+            q_weights[term] = q_weights.get(term, 0.0) + tf * _idf(index, term)
+    if not q_weights:
+        return []
+    q_norm = math.sqrt(sum(w * w for w in q_weights.values()))
+    norms = _doc_norms(index)
+    scores: dict[str, float] = {}
+    for term, qw in q_weights.items():
+        idf = _idf(index, term)
+        for pid, tf in index.postings[term].items():
+            scores[pid] = scores.get(pid, 0.0) + qw * tf * idf
+    ranked = [
+        (dot / (q_norm * norms[pid]), pid)
+        for pid, dot in scores.items()
+        if not filters or index.matches(pid, filters)
+    ]
+    ranked.sort(reverse=True)
+    return [{**index.docs[pid], "similarity": round(score, 4)} for score, pid in ranked[:limit]]
+
+
+async def find_similar(text: str, filters: dict[str, str] | None = None, limit: int = 10) -> list[dict]:
+    """Projects most similar to text, best first, each with a cosine 'similarity' in [0, 1].
+    filters maps column -> required value, compared case-insensitively (e.g. npa_type, product_category)."""
+    index = await _table.refresh()
+    _stats["searches"] += 1
+    return _cosine(index, text, filters or {}, limit)
+
+
+def stats() -> dict[str, Any]:
+    """Index size and refresh counters for /metrics."""
+    return {**_table.stats(), **_stats}
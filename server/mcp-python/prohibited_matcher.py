@@ -0,0 +1,118 @@
+"""
+Prohibited-list matcher — one-pass screening of product text against ref_prohibited_items.
+
+Every currently effective item contributes its code, its name and its name with
+parentheticals dropped ("Leveraged Crypto (>5x)" -> "leveraged crypto") as
+phrases. All phrases are compiled into a single word-bounded alternation regex
+inside a lookahead, so a description is scanned once regardless of list size
+and overlapping phrases all count: "leveraged crypto" also reports "crypto".
+Text and phrases are normalised the same way — lowercased, punctuation folded
+to spaces, trailing plural 's' dropped — so "binary option" hits "Binary Options".
+
+The compiled matcher is rebuilt only when the table's fingerprint (row count,
+MAX(last_synced), today's date for effective_from/effective_to windows) changes.
+The fingerprint itself is read through ref_cache, so it costs at most one query
+per REF_CACHE_TTL and POST /cache/invalidate forces a re-check.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+from typing import Any
+
+from db import query
+from ref_cache import cached_query
+
+_FINGERPRINT_SQL = """SELECT COUNT(*) as cnt, MAX(last_synced) as synced, CURDATE() as today
+                      FROM ref_prohibited_items"""
+_ITEMS_SQL = """SELECT id, layer, item_code, item_name, description, jurisdictions, severity
+                FROM ref_prohibited_items
+                WHERE effective_from <= CURDATE()
+                  AND (effective_to IS NULL OR effective_to > NOW())"""
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_PAREN_RE = re.compile(r"\([^)]*\)")
+# Ordering used when several hits are reported together
+_SEVERITY_RANK = {"HARD_STOP": 0, "CONDITIONAL": 1, "WARNING": 2}
+
+
+def _normalize(text: str) -> str:
+    words = _WORD_RE.findall(text.lower())
+    return " ".join(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words)
+
+
+def _applies(item: dict, jurisdiction: str | None) -> bool:
+    if jurisdiction is None:
+        return True
+    codes = {c.strip().upper() for c in (item.get("jurisdictions") or "ALL").split(",")}
+    return "ALL" in codes or jurisdiction.upper() in codes
+
+
+class _Matcher:
+    def __init__(self, items: list[dict]) -> None:
+        self.items = items
+        self.by_phrase: dict[str, list[dict]] = {}
+        for item in items:
+            for source in (item["item_code"], item["item_name"], _PAREN_RE.sub(" ", item["item_name"])):
+                phrase = _normalize(source or "")
+                if phrase and item not in self.by_phrase.setdefault(phrase, []):
+                    self.by_phrase[phrase].append(item)
+        phrases = sorted(self.by_phrase, key=len, reverse=True)
+        # The longest phrase matching at a word start; the shorter phrases matching
+        # there are exactly its word-prefixes
+        self.pattern = re.compile(r"\b(?=(" + "|".join(map(re.escape, phrases)) + r")\b)") if phrases else None
+        self.prefixes: dict[str, list[str]] = {}
+        for phrase in phrases:
+            words = phrase.split(" ")
+            candidates = (" ".join(words[:k]) for k in range(len(words), 0, -1))
+            self.prefixes[phrase] = [p for p in candidates if p in self.by_phrase]
+
+    def screen(self, text: str, jurisdiction: str | None) -> list[dict]:
+        if self.pattern is None:
+            return []
+        hits: dict[int, dict] = {}
+        for m in self.pattern.finditer(_normalize(text)):
+            for phrase in self.prefixes[m.group(1)]:
+                for item in self.by_phrase[phrase]:
+                    if not _applies(item, jurisdiction):
+                        continue
+                    hit = hits.get(item["id"])
+                    if hit is None:
+                        hits[item["id"]] = {**item, "matched_terms": [phrase]}
+                    elif phrase not in hit["matched_terms"]:
+                        hit["matched_terms"].append(phrase)
+        return sorted(hits.values(), key=lambda h: (_SEVERITY_RANK.get(h["severity"], 9), h["item_code"]))
+
+
+_compiled: tuple[tuple, _Matcher] | None = None
+_lock = asyncio.Lock()
+_stats = {"screens": 0, "builds": 0}
+
+
+async def _matcher() -> _Matcher:
+    global _compiled
+    fp_rows = await cached_query(_FINGERPRINT_SQL)
+    fingerprint = tuple(fp_rows[0].values()) if fp_rows else ()
+    if _compiled is not None and _compiled[0] == fingerprint:
+        return _compiled[1]
+    async with _lock:
+        if _compiled is None or _compiled[0] != fingerprint:
+            _compiled = (fingerprint, _Matcher(await query(_ITEMS_SQL)))
+            _stats["builds"] += 1
+    return _compiled[1]
+
+
+async def screen(text: str, jurisdiction: str | None = None) -> list[dict]:
+    """Prohibited items whose code or name occurs in text, most severe first.
+    With a jurisdiction, only items applying to it (or to ALL) are returned."""
+    matcher = await _matcher()
+    _stats["screens"] += 1
+    return matcher.screen(text, jurisdiction)
+
+
+def stats() -> dict[str, Any]:
+    """Compiled phrase count and build/screen counters for /metrics."""
+    return {
+        "items": len(_compiled[1].items) if _compiled else 0,
+        "phrases": len(_compiled[1].by_phrase) if _compiled else 0,
+        **_stats,
+    }
@@ -0,0 +1,205 @@
+"""
+Reference-data cache — in-process read-through cache for the ref_* tables.
+
+ref_npa_sections, ref_npa_fields, ref_field_options, ref_classification_criteria,
+ref_prerequisite_*, ref_document_* and ref_prohibited_items only change when the
+reference data is re-seeded, yet tools used to re-query them on every call.
+Results are cached per (SQL, params) and tagged with the ref_* tables the SQL
+reads, so POST /cache/invalidate can drop a single table or everything.
+
+Every worker and replica holds its own cache. invalidate_everywhere() drops the
+local entries and bumps a per-table generation row in mcp_cache_generations
+(migration 019); each process reads that table at most every
+REF_CACHE_SYNC_INTERVAL seconds on its next lookup and drops whatever another
+process invalidated. Without the table (or with the interval at 0) invalidation
+only reaches the process that received it, and other processes serve old rows
+until REF_CACHE_TTL expires them.
+
+Env vars:
+  - REF_CACHE_TTL: seconds an entry stays fresh, 0 disables caching (default: 300)
+  - REF_CACHE_MAX_ENTRIES: LRU bound on cached entries (default: 1024)
+  - REF_CACHE_SYNC_INTERVAL: seconds between reads of other processes' invalidations, 0 disables (default: 5)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from db import execute, query
+
+_REF_TABLE_RE = re.compile(r"\bref_\w+")
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "tables")
+
+    def __init__(self, value: Any, expires_at: float, tables: frozenset[str]) -> None:
+        self.value = value
+        self.expires_at = expires_at
+        self.tables = tables
+
+
+_entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+_inflight: dict[Hashable, asyncio.Future] = {}
+# Bumped by invalidate() so a load that started before an invalidation isn't stored
+_generation = 0
+_stats = {
+    "hits": 0, "misses": 0, "evictions": 0, "invalidations": 0,
+    "syncs": 0, "sync_failures": 0, "remote_invalidations": 0,
+}
+
+# Cache-wide invalidations are recorded under this key instead of a table name
+_ALL = "*"
+_GENERATIONS_SQL = "SELECT cache_key, generation FROM mcp_cache_generations"
+_BUMP_SQL = """INSERT INTO mcp_cache_generations (cache_key, generation) VALUES (%s, 1)
+               ON DUPLICATE KEY UPDATE generation = generation + 1"""
+# Generations as of the last successful sync; None until the first one
+_seen: dict[str, int] | None = None
+_synced_at = float("-inf")
+_last_sync_error: str | None = None
+
+
+def _ttl() -> float:
+    return float(os.getenv("REF_CACHE_TTL", "300"))
+
+
+def _max_entries() -> int:
+    return int(os.getenv("REF_CACHE_MAX_ENTRIES", "1024"))
+
+
+def _sync_interval() -> float:
+    return float(os.getenv("REF_CACHE_SYNC_INTERVAL", "5"))
+
+
+async def _sync() -> None:
+    """Apply invalidations other processes recorded since the last sync."""
+    global _seen, _synced_at, _last_sync_error
+    interval = _sync_interval()
+    if interval <= 0 or time.monotonic() - _synced_at < interval:
+        return
+    # Set before reading so concurrent lookups don't start another sync
+    _synced_at = time.monotonic()
+    _stats["syncs"] += 1
+    try:
+        rows = await query(_GENERATIONS_SQL)
+    except Exception as e:
+        _stats["sync_failures"] += 1
+        _last_sync_error = str(e)
+        return
+    _last_sync_error = None
+    current = {row["cache_key"]: row["generation"] for row in rows}
+    if _seen is None:
+        # Entries cached before the first successful sync may predate an invalidation
+        if _entries:
+            invalidate()
+    else:
+        changed = [key for key, generation in current.items() if _seen.get(key) != generation]
+        _stats["remote_invalidations"] += len(changed)
+        if _ALL in changed:
+            invalidate()
+        else:
+            for key in changed:
+                invalidate(key)
+    _seen = current
+
+
+async def get_or_load(key: Hashable, loader: Callable[[], Awaitable[Any]], tables: Iterable[str]) -> Any:
+    """Return the cached value for key, calling loader() on a miss or expiry.
+
+    Concurrent misses for the same key share one load. The returned value is
+    shared between callers and must be treated as read-only.
+    """
+    ttl = _ttl()
+    if ttl <= 0:
+        return await loader()
+
+    await _sync()
+    entry = _entries.get(key)
+    if entry is not None and entry.expires_at > time.monotonic():
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return entry.value
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        _stats["hits"] += 1
+        return await asyncio.shield(pending)
+
+    _stats["misses"] += 1
+    generation = _generation
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[key] = fut
+    try:
+        value = await loader()
+    except BaseException as e:
+        fut.set_exception(e)
+        fut.exception()  # mark retrieved; waiters (if any) still receive it
+        raise
+    finally:
+        _inflight.pop(key, None)
+    fut.set_result(value)
+
+    if generation == _generation:
+        _entries[key] = _Entry(value, time.monotonic() + ttl, frozenset(tables))
+        _entries.move_to_end(key)
+        while len(_entries) > _max_entries():
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+    return value
+
+
+async def cached_query(sql: str, params: list | None = None) -> list[dict]:
+    """db.query() through the cache, tagged with every ref_* table named in sql.
+    Returns fresh row dicts so callers may annotate rows without touching the cache."""
+    rows = await get_or_load(
+        ("query", sql, tuple(params or ())),
+        lambda: query(sql, params),
+        _REF_TABLE_RE.findall(sql),
+    )
+    return [dict(r) for r in rows]
+
+
+def invalidate(table: str | None = None) -> int:
+    """Drop every entry (table=None) or only entries that read the given ref_* table.
+    Returns the number of entries removed."""
+    global _generation
+    _generation += 1
+    _stats["invalidations"] += 1
+    if table is None:
+        removed = len(_entries)
+        _entries.clear()
+        return removed
+    stale = [k for k, e in _entries.items() if table in e.tables]
+    for k in stale:
+        del _entries[k]
+    return len(stale)
+
+
+async def invalidate_everywhere(table: str | None = None) -> tuple[int, bool]:
+    """invalidate() here and record it in mcp_cache_generations for every other process.
+    Returns (entries removed here, whether the invalidation was recorded for the others)."""
+    removed = invalidate(table)
+    try:
+        await execute(_BUMP_SQL, [table or _ALL])
+    except Exception as e:
+        print(f"[REF_CACHE] Invalidation not propagated to other processes: {e}")
+        return removed, False
+    return removed, True
+
+
+def stats() -> dict:
+    """Entry count, TTL/size settings and hit/miss counters for /metrics."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        "entries": len(_entries),
+        "max_entries": _max_entries(),
+        "ttl": _ttl(),
+        "sync_interval": _sync_interval(),
+        **_stats,
+        "last_sync_error": _last_sync_error,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+    }
@@ -4,10 +4,11 @@ Mirrors server/mcp/src/registry.ts exactly.
 """
 from __future__ import annotations
 
-import json
 from dataclasses import dataclass, field
 from typing import Any, Callable, Awaitable
 
+from json_encoding import dumps_text
+
 
 @dataclass
 class ToolResult:
@@ -21,7 +22,7 @@ class ToolResult:
             d["data"] = self.data
         if self.error is not None:
             d["error"] = self.error
-        return json.dumps(d, indent=2, default=str)
+        return dumps_text(d)
 
 
 @dataclass
@@ -31,16 +32,33 @@ class ToolDefinition:
     category: str
     input_schema: dict[str, Any]  # JSON Schema dict
     handler: Callable[..., Awaitable[ToolResult]]
+    # Set on catalog placeholders (see tools/__init__.py): the module whose import
+    # registers the real definition. None once the tool's module is loaded.
+    module: str | None = None
 
 
 class ToolRegistry:
     def __init__(self) -> None:
         self._tools: dict[str, ToolDefinition] = {}
+        self._version = 0
+        self._categories: list[str] | None = None
 
     def register(self, tool: ToolDefinition) -> None:
-        if tool.name in self._tools:
+        existing = self._tools.get(tool.name)
+        if existing is not None and existing.module is None:
             raise ValueError(f'Tool "{tool.name}" is already registered')
+        # Replacing a placeholder keeps its position, so listing order is unchanged
         self._tools[tool.name] = tool
+        if existing is None or (existing.description, existing.category, existing.input_schema) != (
+            tool.description, tool.category, tool.input_schema,
+        ):
+            self._version += 1
+            self._categories = None
+
+    @property
+    def version(self) -> int:
+        """Bumped whenever the advertised catalog changes; caches built from it compare against this."""
+        return self._version
 
     def register_all(self, tools: list[ToolDefinition]) -> None:
         for tool in tools:
@@ -56,7 +74,10 @@ class ToolRegistry:
         return [t for t in self._tools.values() if t.category == category]
 
     def get_categories(self) -> list[str]:
-        return list({t.category for t in self._tools.values()})
+        # First-seen order: stable across processes, unlike iterating a set of strings
+        if self._categories is None:
+            self._categories = list(dict.fromkeys(t.category for t in self._tools.values()))
+        return list(self._categories)
 
     def count(self) -> int:
         return len(self._tools)
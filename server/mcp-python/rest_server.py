@@ -14,30 +14,84 @@ ARCHITECTURE FIX (2026-02-16):
     /*      → FastAPI REST app (with CORS middleware)
   Both share the same port (single-port deployment constraint).
 """
+import asyncio
+import contextlib
+import hashlib
 import os
+import tempfile
 import sys
 import json
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 
 # Ensure tools/ is importable
 sys.path.insert(0, os.path.dirname(__file__))
 
 from registry import registry  # noqa: E402
 
-# Import all tool modules so they self-register
-import tools  # noqa: E402, F401
+# Register every tool (modules with a current catalog entry load on first call)
+import tools  # noqa: E402
 
 # Import the MCP server instance (already has all 71 tools registered)
 from main import mcp_server  # noqa: E402
 
 # DB health
-from db import health_check  # noqa: E402
+from db import close_pool, gather, health_check, pool_config, pool_stats, warm_pool  # noqa: E402
+from admin_auth import admin_error  # noqa: E402
+from compression import CompressionMiddleware  # noqa: E402
+from json_encoding import FastJSONResponse, dumps  # noqa: E402
+import kb_index  # noqa: E402
+import kb_vectors  # noqa: E402
+import kpi  # noqa: E402
+from mcp_sessions import SessionAffinity, make_store  # noqa: E402
+import npa_similarity  # noqa: E402
+import prohibited_matcher  # noqa: E402
+import ref_cache  # noqa: E402
 
 # Some hosting providers set PORT automatically; otherwise REST_PORT is used.
 REST_PORT = int(os.getenv("PORT", os.getenv("REST_PORT", "3002")))
+# Worker processes (uvicorn's own WEB_CONCURRENCY convention); 1 = single process
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+MCP_SESSION_DIR = os.getenv("MCP_SESSION_DIR", os.path.join(tempfile.gettempdir(), f"npa-mcp-sessions-{REST_PORT}"))
+# Where SSE session owners are recorded; see mcp_sessions.py for the backends
+MCP_SESSION_STORE = os.getenv("MCP_SESSION_STORE", "file" if WORKERS > 1 else "memory")
+
+# ─── Startup / shutdown ──────────────────────────────────────────
+# The pool is built here, inside uvicorn's own event loop, so the first
+# Dify request after a deploy doesn't pay the TLS + MySQL handshake. The
+# npa_kpi_snapshots writer runs alongside the app for the same lifetime.
+@asynccontextmanager
+async def lifespan(_app):
+    # Verify database connectivity (retry up to 5 times for cloud cold starts)
+    print("[INIT] Checking database connection...")
+    if await warm_pool():
+        print(f"[INIT] Database connected ({pool_stats()['size']} pooled connections warm)\n")
+    else:
+        print("[INIT] Database connection failed after 5 attempts.")
+        print("[INIT]    Check DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME env vars.")
+        print("[INIT]    WARNING: Server is starting without database access. Tools requiring DB will fail.")
+    # With a shared store, /mcp/messages for sessions held by another worker or replica are relayed there
+    await mcp_sse_app.start(
+        make_store(MCP_SESSION_STORE, MCP_SESSION_DIR),
+        relay=os.getenv("MCP_RELAY", "unix"),
+        directory=MCP_SESSION_DIR,
+        relay_host=os.getenv("MCP_RELAY_HOST"),
+        secret=os.getenv("MCP_RELAY_SECRET", ""),
+        relay_bind=os.getenv("MCP_RELAY_BIND"),
+    )
+    snapshot_writer = asyncio.create_task(kpi.run_snapshot_writer())
+    # The router only forwards lifespan events to the REST app, so the streamable-HTTP
+    # session manager (normally run by its own Starlette lifespan) is started here
+    async with mcp_server.session_manager.run():
+        yield
+    snapshot_writer.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await snapshot_writer
+    await mcp_sse_app.stop()
+    await close_pool()
+
 
 # ─── FastAPI REST app (with CORS middleware) ─────────────────────
 rest_app = FastAPI(
@@ -47,6 +101,8 @@ rest_app = FastAPI(
     servers=[{"url": os.getenv("PUBLIC_URL", f"http://localhost:{REST_PORT}"), "description": os.getenv("ENV", "Local development")}],
     # Disable FastAPI's built-in /openapi.json so our custom one is served
     openapi_url=None,
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 rest_app.add_middleware(
@@ -56,22 +112,33 @@ rest_app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large JSON bodies (added last, so it wraps CORS and sees final headers)
+if os.getenv("RESPONSE_COMPRESSION", "true").lower() in ("1", "true", "yes"):
+    rest_app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")))
+
 # ─── MCP SSE app (standalone — NO FastAPI middleware) ────────────
 # FastMCP's sse_app() returns a Starlette app with /sse and /messages endpoints.
 # It MUST run without CORS middleware to avoid duplicate JSON responses.
-mcp_sse_app = mcp_server.sse_app()
+# SessionAffinity keeps sessions sticky to their worker/replica (WEB_CONCURRENCY > 1 or a shared store).
+mcp_sse_app = SessionAffinity(mcp_server.sse_app())
+
+# ─── MCP streamable-HTTP app (standalone, stateless) ─────────────
+# Served at /mcp itself; short agent calls don't hold an SSE connection open.
+mcp_http_app = mcp_server.streamable_http_app()
 
 
 # ─── ASGI Path Router — splits /mcp/* vs /* at the ASGI level ───
-# This ensures MCP SSE traffic NEVER passes through FastAPI middleware.
+# This ensures MCP traffic NEVER passes through FastAPI middleware.
 class ASGIPathRouter:
     """Routes requests by path prefix to different ASGI apps.
+    /mcp   → MCP streamable-HTTP app
     /mcp/* → MCP SSE app (strips /mcp prefix)
     /*     → FastAPI REST app
     """
-    def __init__(self, mcp_app, rest_app):
+    def __init__(self, mcp_app, rest_app, mcp_http_app=None):
         self.mcp_app = mcp_app
         self.rest_app = rest_app
+        self.mcp_http_app = mcp_http_app
 
     async def __call__(self, scope, receive, send):
         if scope["type"] in ("http", "websocket"):
@@ -81,24 +148,48 @@ class ASGIPathRouter:
                 scope = dict(scope)
                 scope["path"] = path[4:] or "/"
                 scope["root_path"] = scope.get("root_path", "") + "/mcp"
-                await self.mcp_app(scope, receive, send)
+                if scope["path"] == "/" and self.mcp_http_app is not None:
+                    await self.mcp_http_app(scope, receive, send)
+                else:
+                    await self.mcp_app(scope, receive, send)
                 return
         await self.rest_app(scope, receive, send)
 
 
 # The top-level ASGI app — this is what uvicorn runs
-app = ASGIPathRouter(mcp_app=mcp_sse_app, rest_app=rest_app)
+app = ASGIPathRouter(mcp_app=mcp_sse_app, rest_app=rest_app, mcp_http_app=mcp_http_app)
 
 
-# ─── Custom OpenAPI spec matching TypeScript output ───────────────
+# ─── Precomputed tool catalog ─────────────────────────────────────
+# /openapi.json and /tools only change when the registry does. Both bodies are
+# built and encoded once per registry version (at import, once every tool is
+# registered) and served as-is. Dify re-imports and pollers revalidate with
+# If-None-Match and get an empty 304 back.
 
-@rest_app.get("/openapi.json", include_in_schema=False)
-async def openapi_spec():
-    """Generate OpenAPI 3.0.3 spec identical to the TypeScript version."""
-    all_tools = registry.get_all()
+class _EncodedJSON:
+    """A JSON body encoded once, with its weak ETag."""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, content) -> None:
+        self.body = dumps(content)
+        # Weak: the same entity may be sent gzip- or brotli-encoded
+        self.etag = f'W/"{hashlib.blake2b(self.body, digest_size=16).hexdigest()}"'
+
+    def response(self, request: Request) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match", "")
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in candidates or self.etag.removeprefix("W/") in candidates:
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+def _build_openapi_spec() -> dict:
+    """OpenAPI 3.0.3 spec identical to the TypeScript version."""
     paths = {}
 
-    for td in all_tools:
+    for td in registry.get_all():
         paths[f"/tools/{td.name}"] = {
             "post": {
                 "operationId": td.name,
@@ -132,7 +223,7 @@ async def openapi_spec():
             },
         }
 
-    spec = {
+    return {
         "openapi": "3.0.3",
         "info": {
             "title": "NPA Workbench MCP Tools API",
@@ -145,13 +236,9 @@ async def openapi_spec():
         "paths": paths,
         "tags": [{"name": cat, "description": f"{cat} tools"} for cat in registry.get_categories()],
     }
-    return JSONResponse(content=spec)
 
 
-# ─── Tool listing endpoint ────────────────────────────────────────
-
-@rest_app.get("/tools")
-async def list_tools():
+def _build_tool_list() -> dict:
     all_tools = registry.get_all()
     return {
         "tools": [{"name": t.name, "description": t.description, "category": t.category} for t in all_tools],
@@ -159,25 +246,98 @@ async def list_tools():
     }
 
 
+_catalog: dict = {"version": None, "openapi": None, "tools": None, "builds": 0}
+
+
+def _current_catalog() -> dict:
+    if _catalog["version"] != registry.version:
+        _catalog.update(
+            version=registry.version,
+            openapi=_EncodedJSON(_build_openapi_spec()),
+            tools=_EncodedJSON(_build_tool_list()),
+            builds=_catalog["builds"] + 1,
+        )
+    return _catalog
+
+
+_current_catalog()
+
+
+# ─── Custom OpenAPI spec matching TypeScript output ───────────────
+
+@rest_app.get("/openapi.json", include_in_schema=False)
+async def openapi_spec(request: Request):
+    """Serve the precomputed OpenAPI 3.0.3 spec."""
+    return _current_catalog()["openapi"].response(request)
+
+
+# ─── Tool listing endpoint ────────────────────────────────────────
+
+@rest_app.get("/tools")
+async def list_tools(request: Request):
+    return _current_catalog()["tools"].response(request)
+
+
 # ─── Dynamic tool execution ──────────────────────────────────────
 
 @rest_app.api_route("/tools/{tool_name}", methods=["POST"], include_in_schema=False)
 async def execute_tool(tool_name: str, request: Request):
     """Execute a tool by name. Matches POST /tools/{tool-name} from TypeScript."""
-    td = registry.get_tool(tool_name)
-    if td is None:
-        return JSONResponse(status_code=404, content={"success": False, "error": f"Tool '{tool_name}' not found"})
-
     try:
         body = await request.json()
     except Exception:
         body = {}
 
+    status, content = await _run_tool(tool_name, body)
+    return FastJSONResponse(status_code=status, content=content)
+
+
+async def _run_tool(tool_name: str, body: dict) -> tuple[int, dict]:
+    """Run one tool and return (HTTP status, response body); shared by single and batch execution."""
+    td = registry.get_tool(tool_name)
+    if td is None:
+        return 404, {"success": False, "error": f"Tool '{tool_name}' not found"}
+
     try:
         result = await td.handler(body)
-        return JSONResponse(content={"success": result.success, "data": result.data, "error": result.error})
+        return 200, {"success": result.success, "data": result.data, "error": result.error}
     except Exception as e:
-        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
+        return 500, {"success": False, "error": str(e)}
+
+
+# ─── Batch tool execution ────────────────────────────────────────
+# One HTTP round-trip for several independent lookups. Calls run concurrently
+# through db.gather, so a batch can hold at most TOOLS_BATCH_CONCURRENCY pooled
+# connections (default: half the pool) and never starves single-tool requests.
+
+TOOLS_BATCH_MAX_CALLS = int(os.getenv("TOOLS_BATCH_MAX_CALLS", "50"))
+TOOLS_BATCH_CONCURRENCY = int(os.getenv("TOOLS_BATCH_CONCURRENCY", "0")) or None
+
+
+@rest_app.post("/tools:batch", include_in_schema=False)
+async def execute_tools_batch(request: Request):
+    """Execute [{"tool": name, "input": {...}}, ...] (or {"calls": [...]}); results keep call order."""
+    try:
+        body = await request.json()
+    except Exception:
+        return FastJSONResponse(status_code=400, content={"success": False, "error": "Request body must be JSON"})
+
+    calls = body.get("calls") if isinstance(body, dict) else body
+    if not isinstance(calls, list) or not all(isinstance(c, dict) and c.get("tool") for c in calls):
+        return FastJSONResponse(status_code=400, content={"success": False, "error": 'Expected an array of {"tool": ..., "input": {...}} calls'})
+    if len(calls) > TOOLS_BATCH_MAX_CALLS:
+        return FastJSONResponse(status_code=413, content={"success": False, "error": f"Batch of {len(calls)} calls exceeds the limit of {TOOLS_BATCH_MAX_CALLS}"})
+
+    outcomes = await gather(
+        *(_run_tool(c["tool"], c.get("input") or {}) for c in calls),
+        limit=TOOLS_BATCH_CONCURRENCY,
+    )
+    results = [{"tool": c["tool"], "status": status, **content} for c, (status, content) in zip(calls, outcomes)]
+    return FastJSONResponse(content={
+        "success": all(r["success"] for r in results),
+        "results": results,
+        "count": len(results),
+    })
 
 
 # ─── Health check ─────────────────────────────────────────────────
@@ -192,21 +352,75 @@ async def health():
         "tools": registry.count(),
         "categories": registry.get_categories(),
         "openApiSpec": f"{os.getenv('PUBLIC_URL', f'http://localhost:{REST_PORT}')}/openapi.json",
+        "pool": {k: v for k, v in pool_stats().items() if k != "wait_histogram"},
+    }
+
+
+# ─── Metrics ──────────────────────────────────────────────────────
+
+@rest_app.get("/metrics")
+async def metrics():
+    """Connection pool occupancy and acquire-wait histogram, ref-cache and
+    live-KPI counters. Separates pool starvation (high wait / timeouts) from slow queries."""
+    return {
+        "pool": pool_stats(),
+        "ref_cache": ref_cache.stats(),
+        "kpi_live": kpi.stats(),
+        "kpi_snapshots": kpi.snapshot_stats(),
+        "kb_index": kb_index.stats(),
+        "kb_vectors": kb_vectors.stats(),
+        "npa_similarity": npa_similarity.stats(),
+        "prohibited_matcher": prohibited_matcher.stats(),
+        "mcp_sessions": mcp_sse_app.stats(),
+        "tool_modules": tools.stats(),
+        "tool_catalog": {
+            "version": _catalog["version"],
+            "builds": _catalog["builds"],
+            "openapi_bytes": len(_catalog["openapi"].body),
+            "tools_bytes": len(_catalog["tools"].body),
+        },
     }
 
 
+# ─── Reference-data cache invalidation ────────────────────────────
+
+@rest_app.post("/cache/invalidate")
+async def invalidate_cache(request: Request):
+    """Drop cached ref_* data after the reference tables are re-seeded, in every
+    worker and replica. Requires an ADMIN bearer token from the Node workbench.
+    Body {"table": "ref_npa_fields"} drops one table; an empty body drops everything."""
+    denied = admin_error(request.headers.get("authorization"))
+    if denied is not None:
+        status, error = denied
+        return FastJSONResponse(status_code=status, content={"success": False, "error": error})
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    table = body.get("table") if isinstance(body, dict) else None
+    removed, propagated = await ref_cache.invalidate_everywhere(table)
+    return {"success": True, "table": table or "ALL", "entries_removed": removed, "propagated": propagated}
+
+
 def start_rest_server():
     """Start the unified server (ASGI path router → REST + MCP SSE)."""
     import uvicorn
     public = os.getenv("PUBLIC_URL", f"http://localhost:{REST_PORT}")
     print(f"[SERVER]   Listening on http://0.0.0.0:{REST_PORT}")
-    print(f"[SERVER]   ASGI path router: /mcp/* → MCP SSE, /* → FastAPI REST")
+    print(f"[SERVER]   ASGI path router: /mcp → MCP streamable HTTP, /mcp/* → MCP SSE, /* → FastAPI REST")
     print(f"[REST API] OpenAPI spec: {public}/openapi.json")
     print(f"[REST API] {registry.count()} tools exposed as POST /tools/{{name}}")
     print(f"[MCP SSE]  SSE endpoint: {public}/mcp/sse")
     print(f"[MCP SSE]  Messages endpoint: {public}/mcp/messages")
     print(f"[MCP SSE]  {registry.count()} tools via MCP protocol (CORS-free)")
-    uvicorn.run(app, host="0.0.0.0", port=REST_PORT, log_level="info")
+    print(f"[MCP HTTP] Streamable-HTTP endpoint (stateless): {public}/mcp")
+    if WORKERS > 1:
+        print(f"[SERVER]   {WORKERS} worker processes, DB pool {pool_config()['maxsize']} connections each")
+        print(f"[MCP SSE]  Session affinity via {MCP_SESSION_STORE} store ({MCP_SESSION_DIR})")
+        # Workers re-import the app by name; each gets its own event loop and pool
+        uvicorn.run("rest_server:app", host="0.0.0.0", port=REST_PORT, log_level="info", workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=REST_PORT, log_level="info")
 
 
 if __name__ == "__main__":
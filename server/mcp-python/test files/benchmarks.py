@@ -0,0 +1,271 @@
+"""
+Micro-benchmarks for the MCP tools server internals (no database needed).
+
+Usage (from server/mcp-python):
+    python "test files/benchmarks.py"              # run all
+    python "test files/benchmarks.py" serialize    # run one
+    python "test files/benchmarks.py" json         # response encoders
+    python "test files/benchmarks.py" startup      # server import time, lazy vs eager tools
+    python "test files/benchmarks.py" catalog      # /openapi.json and /tools per request
+"""
+
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Make the server modules importable when run from anywhere
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def _timeit(fn, repeat: int = 5) -> float:
+    """Best-of-N wall time in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Row serialization (db._column_plan / _serialize_dicts)
+# ═══════════════════════════════════════════════════════════════════
+
+def _legacy_serialize_row(row: dict) -> dict:
+    """The original per-cell isinstance chain, kept here as the baseline."""
+    from datetime import date
+    out = {}
+    for key, val in row.items():
+        if isinstance(val, datetime):
+            out[key] = val.isoformat()
+        elif isinstance(val, date):
+            out[key] = val.isoformat()
+        elif isinstance(val, Decimal):
+            out[key] = float(val)
+        elif isinstance(val, (bytes, bytearray)):
+            out[key] = val.decode("utf-8", errors="replace")
+        else:
+            out[key] = val
+    return out
+
+
+def bench_serialize(n_rows: int = 20_000) -> None:
+    from pymysql.constants import FIELD_TYPE
+    import db
+
+    # Shape of an npa_audit_log row as returned by audit_get_trail / generate_audit_report
+    description = [
+        ("id", FIELD_TYPE.LONGLONG), ("project_id", FIELD_TYPE.VAR_STRING),
+        ("actor_name", FIELD_TYPE.VAR_STRING), ("actor_role", FIELD_TYPE.VAR_STRING),
+        ("action_type", FIELD_TYPE.VAR_STRING), ("action_details", FIELD_TYPE.BLOB),
+        ("is_agent_action", FIELD_TYPE.TINY), ("agent_name", FIELD_TYPE.VAR_STRING),
+        ("timestamp", FIELD_TYPE.TIMESTAMP), ("confidence_score", FIELD_TYPE.NEWDECIMAL),
+        ("reasoning", FIELD_TYPE.BLOB), ("model_version", FIELD_TYPE.VAR_STRING),
+        ("source_citations", FIELD_TYPE.BLOB),
+    ]
+    base = datetime(2026, 1, 1)
+
+    def make_rows() -> list[dict]:
+        return [{
+            "id": i, "project_id": "NPA-2026-001", "actor_name": "Classification Router",
+            "actor_role": "Agent", "action_type": "AGENT_CLASSIFIED",
+            "action_details": "Classified as New-to-Group (confidence: 95%).", "is_agent_action": 1,
+            "agent_name": "Classification Router", "timestamp": base + timedelta(minutes=i),
+            "confidence_score": Decimal("95.00"), "reasoning": "Automated classification",
+            "model_version": "CLASSIFICATION_AGENT_v1.0", "source_citations": None,
+        } for i in range(n_rows)]
+
+    legacy_rows, plan_rows, tuple_rows = make_rows(), make_rows(), [tuple(r.values()) for r in make_rows()]
+    legacy_ms = _timeit(lambda: [_legacy_serialize_row(r) for r in legacy_rows])
+    # _serialize_dicts converts in place, so convert fresh copies each repeat
+    plan_ms = _timeit(lambda: db._serialize_dicts([dict(r) for r in plan_rows], db._column_plan(description)))
+    copy_ms = _timeit(lambda: [dict(r) for r in plan_rows])
+    tuple_ms = _timeit(lambda: db._serialize_tuples(tuple_rows, db._column_plan(description)))
+
+    assert db._serialize_dicts([dict(plan_rows[0])], db._column_plan(description))[0] == _legacy_serialize_row(plan_rows[0])
+
+    print(f"--- Row serialization ({n_rows} npa_audit_log rows, 13 columns) ---")
+    print(f"  legacy isinstance chain : {legacy_ms:8.2f} ms")
+    print(f"  column plan (dict rows) : {plan_ms - copy_ms:8.2f} ms  (excl. {copy_ms:.2f} ms benchmark copy)")
+    print(f"  column plan (tuples)    : {tuple_ms:8.2f} ms")
+    print()
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Response encoding (json_encoding.dumps vs stdlib indent=2)
+# ═══════════════════════════════════════════════════════════════════
+
+def _audit_trail_payload(n_rows: int) -> dict:
+    """audit_get_trail output: serialized npa_audit_log rows."""
+    base = datetime(2026, 1, 1)
+    return {"success": True, "data": {"project_id": "NPA-2026-001", "entries": [{
+        "id": i, "project_id": "NPA-2026-001", "actor_name": "Classification Router",
+        "actor_role": "Agent", "action_type": "AGENT_CLASSIFIED",
+        "action_details": "Classified as New-to-Group (confidence: 95%). Cross-border booking SG/HK.",
+        "is_agent_action": 1, "agent_name": "Classification Router",
+        "timestamp": (base + timedelta(minutes=i)).isoformat(), "confidence_score": 95.0,
+        "reasoning": "Automated classification", "model_version": "CLASSIFICATION_AGENT_v1.0",
+        "source_citations": None,
+    } for i in range(n_rows)], "total": n_rows}}
+
+
+def _template_fields_payload(n_sections: int, n_fields: int) -> dict:
+    """autofill_get_template_fields output: sections -> fields -> options."""
+    return {"success": True, "data": {"template_id": "TPL-FULL-NPA", "sections": [{
+        "id": f"SEC_{s:02d}", "title": f"Section {s}", "description": "Product overview and business rationale",
+        "order_index": s, "fields": [{
+            "field_key": f"field_{s}_{f}", "label": f"Field {s}.{f} — Booking entity / légal name",
+            "field_type": "select" if f % 3 == 0 else "text", "is_required": f % 2 == 0,
+            "tooltip": "Provide the legal entity booking the trade.", "order_index": f,
+            "options": [{"value": f"OPT_{o}", "label": f"Option {o}"} for o in range(5)] if f % 3 == 0 else [],
+        } for f in range(n_fields)],
+    } for s in range(n_sections)]}}
+
+
+def bench_json() -> None:
+    import json
+    import json_encoding
+
+    payloads = {
+        "audit trail (5k rows)": _audit_trail_payload(5_000),
+        "template fields (12x40)": _template_fields_payload(12, 40),
+    }
+    encoders = [("stdlib indent=2 (legacy)", lambda o: json.dumps(o, indent=2, default=str).encode("utf-8"))]
+    saved = json_encoding.ENCODER
+    for name in ("stdlib", "orjson"):
+        if name == "orjson" and json_encoding.orjson is None:
+            print("  (orjson not installed — skipping orjson rows)")
+            continue
+
+        def encode(o, _name=name):
+            json_encoding.ENCODER = _name
+            return json_encoding.dumps(o)
+        encoders.append((f"{name} compact", encode))
+
+    for label, payload in payloads.items():
+        print(f"--- Response encoding: {label} ---")
+        baseline = None
+        for enc_label, enc in encoders:
+            out = enc(payload)
+            assert json.loads(out) == json.loads(json.dumps(payload, default=str))
+            ms = _timeit(lambda: enc(payload))
+            baseline = baseline or ms
+            print(f"  {enc_label:26s}: {ms:8.2f} ms  {len(out):>10,d} bytes  ({baseline / ms:4.1f}x)")
+        print()
+    json_encoding.ENCODER = saved
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Startup (tools/__init__.py catalog placeholders, main.py Tool list)
+# ═══════════════════════════════════════════════════════════════════
+
+_SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+_IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print((time.perf_counter() - t) * 1000)"
+)
+
+
+def _cold_import_ms(module: str, env: dict, repeat: int) -> float:
+    """Best-of-N import time of module in a fresh interpreter (bytecode already cached)."""
+    best = float("inf")
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _IMPORT_SNIPPET.format(module=module)],
+            cwd=_SERVER_DIR, env={**os.environ, **env}, capture_output=True, text=True, check=True,
+        )
+        best = min(best, float(out.stdout.strip().splitlines()[-1]))
+    return best
+
+
+def bench_startup(repeat: int = 5) -> None:
+    import tools  # placeholders only when tools/catalog.json is current (python -m tools --check)
+    from mcp.server.fastmcp import FastMCP
+    import main
+    from registry import registry
+
+    if tools.stats()["imported_at_startup"]:
+        print(f"  NOTE: catalog stale for {tools.stats()['imported_at_startup']}, run: python -m tools --write\n")
+    print("--- Cold import (fresh interpreter) ---")
+    for module in ("main", "rest_server"):
+        eager = _cold_import_ms(module, {"TOOLS_LAZY_IMPORT": "false"}, repeat)
+        lazy = _cold_import_ms(module, {"TOOLS_LAZY_IMPORT": "true"}, repeat)
+        print(f"  {module:12s} eager tools: {eager:8.1f} ms   catalog placeholders: {lazy:8.1f} ms  ({eager / lazy:4.2f}x)")
+    print(f"  ({tools.stats()['deferred_tools']} of {registry.count()} tools deferred when the catalog is current)")
+    print()
+
+    print(f"--- FastMCP registration of {registry.count()} tools ---")
+
+    def decorator_per_tool():
+        server = FastMCP(name="bench")
+        for td in registry.get_all():
+            async def handler(**kwargs):
+                return None
+            handler.__name__ = td.name
+            server.tool(name=td.name, description=td.description)(handler)
+
+    def shared_metadata():
+        FastMCP(name="bench", tools=[
+            main.Tool(fn=main._make_handler(td.name), name=td.name, description=td.description,
+                      parameters=td.input_schema, fn_metadata=main._TOOL_METADATA, is_async=True)
+            for td in registry.get_all()
+        ])
+
+    legacy = _timeit(decorator_per_tool, repeat)
+    current = _timeit(shared_metadata, repeat)
+    print(f"  tool() decorator per tool (legacy): {legacy:8.1f} ms")
+    print(f"  Tool list, shared arg model       : {current:8.1f} ms  ({legacy / current:4.1f}x)")
+    print()
+
+
+# ═══════════════════════════════════════════════════════════════════
+#  Tool catalog (rest_server._current_catalog)
+# ═══════════════════════════════════════════════════════════════════
+
+def bench_catalog(requests: int = 200) -> None:
+    import hashlib
+    from starlette.requests import Request
+    import rest_server
+    from json_encoding import dumps
+
+    request = Request({"type": "http", "method": "GET", "path": "/openapi.json", "headers": []})
+
+    def legacy():
+        # Previous handlers: rebuild the document, encode it and hash it on every request
+        for _ in range(requests):
+            for build in (rest_server._build_openapi_spec, rest_server._build_tool_list):
+                body = dumps(build())
+                hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    def cached():
+        for _ in range(requests):
+            catalog = rest_server._current_catalog()
+            catalog["openapi"].response(request)
+            catalog["tools"].response(request)
+
+    print(f"--- /openapi.json + /tools, {requests} requests each ---")
+    base = _timeit(legacy)
+    ms = _timeit(cached)
+    print(f"  rebuild + encode per request : {base:8.2f} ms  ({base / requests * 1000:7.1f} us/request)")
+    print(f"  precomputed bytes            : {ms:8.2f} ms  ({ms / requests * 1000:7.1f} us/request, {base / ms:5.1f}x)")
+    print()
+
+
+BENCHMARKS = {
+    "serialize": bench_serialize,
+    "json": bench_json,
+    "startup": bench_startup,
+    "catalog": bench_catalog,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        BENCHMARKS[name]()
@@ -0,0 +1,16 @@
+"""
+pytest setup for the focused unit tests in this folder (no database needed).
+
+Usage (from server/mcp-python):
+    python -m pytest "test files"
+
+test_runner.py and the test_all_tools scripts exercise a live server instead
+and are not collected.
+"""
+import os
+import sys
+
+# Make the server modules importable when run from anywhere
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+collect_ignore = ["test_runner.py"]
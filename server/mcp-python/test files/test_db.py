@@ -0,0 +1,259 @@
+"""db: row serialization, bulk writes and transactions (no database; connections are faked)."""
+import ast
+import asyncio
+import contextlib
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from pymysql.constants import FIELD_TYPE
+
+import db
+from benchmarks import _legacy_serialize_row
+
+
+def test_column_plan_matches_legacy_serializer():
+    description = [
+        ("id", FIELD_TYPE.LONGLONG), ("name", FIELD_TYPE.VAR_STRING), ("at", FIELD_TYPE.DATETIME),
+        ("on", FIELD_TYPE.DATE), ("amount", FIELD_TYPE.NEWDECIMAL), ("notes", FIELD_TYPE.BLOB),
+    ]
+    rows = [
+        {"id": 1, "name": "a", "at": datetime(2026, 1, 2, 3, 4, 5), "on": date(2026, 1, 2),
+         "amount": Decimal("12.50"), "notes": b"caf\xc3\xa9"},
+        {"id": 2, "name": None, "at": None, "on": None, "amount": None, "notes": None},
+    ]
+    plan = db._column_plan([(name, code, None, None, None, None, None) for name, code in description])
+    assert db._serialize_dicts([dict(r) for r in rows], plan) == [_legacy_serialize_row(r) for r in rows]
+    assert db._serialize_tuples([tuple(r.values()) for r in rows], plan) == [
+        tuple(_legacy_serialize_row(r).values()) for r in rows
+    ]
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("INSERT INTO t (a, b) VALUES (%s, %s)", ("INSERT INTO t (a, b) VALUES ", "(%s, %s)", "")),
+    ("INSERT INTO t (a, s, c) VALUES (%s, 'PENDING', NOW());",
+     ("INSERT INTO t (a, s, c) VALUES ", "(%s, 'PENDING', NOW())", "")),
+    ("insert into t (a) values (COALESCE(%s, 0)) ON DUPLICATE KEY UPDATE a = VALUES(a)",
+     ("insert into t (a) values ", "(COALESCE(%s, 0))", " ON DUPLICATE KEY UPDATE a = VALUES(a)")),
+    ("REPLACE INTO t (a) VALUES (%s)", ("REPLACE INTO t (a) VALUES ", "(%s)", "")),
+    ("UPDATE t SET a = %s WHERE id = %s", None),
+    ("DELETE FROM t WHERE id = %s", None),
+])
+def test_split_insert(sql, expected):
+    assert db._split_insert(sql) == expected
+
+
+class FakeServer:
+    """One auto-increment table behind any number of connections; yields between statements
+    so concurrent callers interleave like they would on a real server."""
+
+    def __init__(self, lock_mode=2, increment=1):
+        self.autoinc = (lock_mode, increment)
+        self.next_id = 100
+        self.rows = {}  # id -> inserted values
+        self.log = []
+        self.fail_on = None
+
+    def insert(self, values):
+        row_id = self.next_id
+        self.next_id += self.autoinc[1]
+        self.rows[row_id] = values
+        return row_id
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.server = conn.server
+        self.lastrowid = None
+        self._fetch = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def mogrify(self, template, params):
+        return template % tuple(repr(p) for p in params)
+
+    async def execute(self, sql, params=None):
+        await asyncio.sleep(0)
+        self.server.log.append(("execute", sql, params))
+        if sql.startswith("SELECT @@"):
+            self._fetch = self.server.autoinc
+            return 1
+        if self.server.fail_on is not None and self.server.fail_on in repr(params or sql):
+            raise RuntimeError("constraint violation")
+        if params is not None:
+            sql = sql % tuple(repr(p) for p in params)
+        rows = ast.literal_eval("[" + sql.partition("VALUES ")[2].replace("NOW()", "None") + "]")
+        ids = [self.server.insert(row) for row in rows]
+        (self.conn.pending if self.conn.in_tx else []).extend(ids)
+        self.lastrowid = ids[0]
+        return len(ids)
+
+    async def executemany(self, sql, params_seq):
+        self.server.log.append(("executemany", sql, list(params_seq)))
+        return len(params_seq)
+
+    async def fetchone(self):
+        return self._fetch
+
+
+class FakeConn:
+    def __init__(self, server):
+        self.server = server
+        self.in_tx = False
+        self.pending = []
+
+    def cursor(self, *_):
+        return FakeCursor(self)
+
+    async def begin(self):
+        self.server.log.append(("begin",))
+        self.in_tx = True
+
+    async def commit(self):
+        self.server.log.append(("commit",))
+        self.in_tx, self.pending = False, []
+
+    async def rollback(self):
+        self.server.log.append(("rollback",))
+        for row_id in self.pending:
+            del self.server.rows[row_id]
+        self.in_tx, self.pending = False, []
+
+
+@pytest.fixture
+def server(monkeypatch):
+    fake = FakeServer()
+
+    @contextlib.asynccontextmanager
+    async def acquire():
+        yield FakeConn(fake)
+
+    monkeypatch.setattr(db, "acquire", acquire)
+    monkeypatch.setattr(db, "_autoinc", None)
+    return fake
+
+
+def _statements(server):
+    return [entry[1] for entry in server.log if entry[0] == "execute" and not entry[1].startswith("SELECT")]
+
+
+def test_execute_many_batches_inserts(server):
+    rows = [(i, f"n{i}") for i in range(5)]
+    affected = asyncio.run(db.execute_many("INSERT INTO t (a, b) VALUES (%s, %s)", rows, batch_size=2))
+    assert _statements(server) == [
+        "INSERT INTO t (a, b) VALUES (0, 'n0'), (1, 'n1')",
+        "INSERT INTO t (a, b) VALUES (2, 'n2'), (3, 'n3')",
+        "INSERT INTO t (a, b) VALUES (4, 'n4')",
+    ]
+    assert affected == 5
+
+
+def test_execute_many_falls_back_to_executemany(server):
+    rows = [("x", 1), ("y", 2)]
+    affected = asyncio.run(db.execute_many("UPDATE t SET a = %s WHERE id = %s", rows))
+    assert server.log == [("executemany", "UPDATE t SET a = %s WHERE id = %s", rows)]
+    assert affected == 2
+
+
+def test_execute_many_notifies_writes(server):
+    seen = []
+    db.on_write(seen.append)
+    asyncio.run(db.execute_many("INSERT INTO kb_documents (doc_id) VALUES (%s)", [("a",)]))
+    assert "kb_documents" in seen
+    assert asyncio.run(db.execute_many("INSERT INTO t (a) VALUES (%s)", [])) == 0
+
+
+@pytest.mark.parametrize("lock_mode, increment", [(1, 1), (1, 2), (2, 1)])
+def test_insert_many_returns_each_rows_id(server, lock_mode, increment):
+    server.autoinc = (lock_mode, increment)
+    rows = [(i, f"n{i}") for i in range(5)]
+    ids = asyncio.run(db.insert_many("INSERT INTO t (a, b) VALUES (%s, %s)", rows, batch_size=2))
+    assert [server.rows[i] for i in ids] == rows
+    # Consecutive lock modes batch; interleaved mode goes row by row in one transaction
+    expected_statements = 3 if lock_mode == 1 else 5
+    assert len(_statements(server)) == expected_statements
+    assert (("begin",) in server.log) == (lock_mode == 2)
+
+
+def test_insert_many_rolls_back_a_failed_row(server):
+    server.fail_on = "'bad'"
+    with pytest.raises(RuntimeError):
+        asyncio.run(db.insert_many("INSERT INTO t (a) VALUES (%s)", [("ok",), ("bad",)]))
+    assert server.log[-1] == ("rollback",)
+    assert server.rows == {}
+
+
+@pytest.mark.parametrize("sql", [
+    "UPDATE t SET a = %s",
+    "REPLACE INTO t (a) VALUES (%s)",
+    "INSERT INTO t (a) VALUES (%s) ON DUPLICATE KEY UPDATE a = VALUES(a)",
+])
+def test_insert_many_rejects_statements_without_plain_ids(server, sql):
+    with pytest.raises(ValueError):
+        asyncio.run(db.insert_many(sql, [("x",)]))
+
+
+@pytest.mark.parametrize("lock_mode", [1, 2])
+def test_concurrent_signoff_matrices_get_their_own_ids(server, monkeypatch, lock_mode):
+    from tools import governance
+
+    async def query(sql, params=None):
+        return [{"notional_amount": 0}]
+
+    monkeypatch.setattr(governance, "query", query)
+    server.autoinc = (lock_mode, 1)
+    parties = ["Credit", "Market", "Legal", "Ops"]
+
+    def matrix(approver):
+        return {"project_id": "NPA-1", "signoffs_json": [
+            {"party": p, "department": "RMG", "approver_name": approver} for p in parties]}
+
+    async def run():
+        return await asyncio.gather(*(governance.governance_create_signoff_matrix_handler(matrix(a))
+                                      for a in ("alice", "bob")))
+
+    for approver, result in zip(("alice", "bob"), asyncio.run(run())):
+        created = result.data["signoffs_created"]
+        # Each returned id is the row this call inserted for that party
+        assert [(server.rows[c["id"]][1], server.rows[c["id"]][4]) for c in created] == [
+            (p, approver) for p in parties
+        ]
+
+
+def test_transaction_commits_and_then_notifies(server):
+    seen = []
+    db.on_write(seen.append)
+
+    async def run():
+        async with db.transaction() as tx:
+            await tx.execute("INSERT INTO npa_projects (id) VALUES (%s)", ["NPA-1"])
+            await tx.execute("INSERT INTO npa_workflow_states (project_id) VALUES (%s)", ["NPA-1"])
+            assert seen == []  # nothing is announced before COMMIT
+
+    asyncio.run(run())
+    assert server.log[0] == ("begin",) and server.log[-1] == ("commit",)
+    assert len(server.rows) == 2
+    assert seen[-2:] == ["npa_projects", "npa_workflow_states"]
+
+
+def test_transaction_rolls_back_on_error(server):
+    seen = []
+    db.on_write(seen.append)
+
+    async def run():
+        async with db.transaction() as tx:
+            await tx.execute("INSERT INTO npa_projects (id) VALUES (%s)", ["NPA-1"])
+            await tx.execute("INSERT INTO npa_workflow_states (project_id) VALUES (%s)", ["bad"])
+
+    server.fail_on = "'bad'"
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+    assert ("commit",) not in server.log
+    assert server.log[-1] == ("rollback",)
+    assert server.rows == {}
+    assert seen == []
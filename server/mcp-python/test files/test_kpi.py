@@ -0,0 +1,188 @@
+"""kpi: snapshot writer election and storage (no database; queries and the advisory lock are faked)."""
+import asyncio
+from datetime import date
+
+import pytest
+
+import kpi
+
+
+class FakeSnapshots:
+    """npa_kpi_snapshots with or without migration 018's unique snapshot_date key."""
+
+    def __init__(self, unique_key=True):
+        self.unique_key = unique_key
+        self.rows = []  # [id, snapshot_date, values]
+        self.writes = []
+
+    async def query(self, sql, params=None):
+        if sql is kpi._UNIQUE_DATE_KEY_SQL:
+            return [{"name": "uq_npa_kpi_snapshots_date"}] if self.unique_key else []
+        if sql is kpi._SNAPSHOT_LATEST_ID:
+            ids = [row[0] for row in self.rows if row[1] == params[0]]
+            return [{"id": max(ids)}] if ids else []
+        assert sql is kpi._SNAPSHOT_SQL
+        return [{"pipeline_value": 1500.0, "active_npas": 3, "avg_cycle_days": 12.5,
+                 "approvals_completed": 1, "approvals_total": 4, "critical_risks": 0}]
+
+    async def execute(self, sql, params=None):
+        self.writes.append(sql)
+        if sql is kpi._SNAPSHOT_UPSERT:
+            assert self.unique_key, "upsert without the unique key would insert duplicates"
+            day, values = params[0], params[1:]
+            existing = [row for row in self.rows if row[1] == day]
+            if existing:
+                existing[0][2] = values
+                return 0
+            sql, params = kpi._SNAPSHOT_INSERT, params
+        if sql is kpi._SNAPSHOT_INSERT:
+            self.rows.append([len(self.rows) + 1, params[0], params[1:]])
+            return len(self.rows)
+        assert sql is kpi._SNAPSHOT_UPDATE
+        for row in self.rows:
+            if row[0] == params[-1]:
+                row[2] = params[:-1]
+        return 0
+
+
+class FakeLocks:
+    """GET_LOCK semantics: one holder per name, released when the holder closes it."""
+
+    def __init__(self):
+        self.holders = {}
+
+    def factory(self):
+        locks = self
+
+        class Lock:
+            def __init__(self, name):
+                self.name = name
+
+            async def acquire(self):
+                return locks.holders.setdefault(self.name, self) is self
+
+            def release(self):
+                if locks.holders.get(self.name) is self:
+                    del locks.holders[self.name]
+
+        return Lock
+
+
+@pytest.fixture
+def snapshots(monkeypatch):
+    db = FakeSnapshots()
+    monkeypatch.setattr(kpi, "query", db.query)
+    monkeypatch.setattr(kpi, "execute", db.execute)
+    monkeypatch.setattr(kpi, "_snapshot_stats", {**kpi._snapshot_stats, "unique_date_key": None})
+    return db
+
+
+@pytest.mark.parametrize("unique_key", [True, False])
+def test_repeated_snapshots_keep_one_row_per_day(snapshots, unique_key):
+    snapshots.unique_key = unique_key
+
+    async def run():
+        upsert = await kpi.has_unique_snapshot_date()
+        for _ in range(3):
+            written = await kpi.write_snapshot(date(2026, 3, 1), upsert=upsert)
+        await kpi.write_snapshot(date(2026, 3, 2), upsert=upsert)
+        return written
+
+    written = asyncio.run(run())
+    assert [row[1] for row in snapshots.rows] == [date(2026, 3, 1), date(2026, 3, 2)]
+    assert written["approval_rate"] == 25.0
+    assert (kpi._SNAPSHOT_UPDATE in snapshots.writes) == (not unique_key)
+
+
+def test_only_the_lock_holder_writes_and_a_survivor_takes_over(snapshots, monkeypatch):
+    snapshots.unique_key = False
+    locks = FakeLocks()
+    monkeypatch.setattr(kpi, "AdvisoryLock", locks.factory())
+    monkeypatch.setenv("KPI_SNAPSHOT_INTERVAL", "0.01")
+
+    async def run():
+        first = asyncio.create_task(kpi.run_snapshot_writer())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(kpi.run_snapshot_writer())
+        await asyncio.sleep(0.05)
+        writes_while_first_led = len(snapshots.writes)
+        skipped = kpi._snapshot_stats["skipped_not_leader"]
+        first.cancel()  # the leader dies; its lock is released
+        await asyncio.sleep(0.05)
+        second.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        return writes_while_first_led, skipped
+
+    writes_while_first_led, skipped = asyncio.run(run())
+    # While both ran the second only skipped; once the first died it took over
+    assert skipped >= 1 and writes_while_first_led >= 1
+    assert len(snapshots.writes) > writes_while_first_led
+    assert kpi._snapshot_stats["unique_date_key"] is False
+    assert len(snapshots.rows) == 1
+    assert locks.holders == {}
+
+
+class FakeGroups:
+    """Answers every live-KPI group query from one counter; can hold queries open."""
+
+    def __init__(self):
+        self.value = 1
+        self.calls = 0
+        self.release = None  # an asyncio.Event that queries wait on, when set
+
+    async def query(self, sql, params=None):
+        self.calls += 1
+        value = self.value
+        if self.release is not None:
+            await self.release.wait()
+        for name, (_, group_sql, key) in kpi._GROUPS.items():
+            if sql is group_sql:
+                return [{"cnt": value}] if key is None else [{key: "X", "cnt": value}]
+        raise AssertionError(sql)
+
+
+@pytest.fixture
+def groups(monkeypatch):
+    fake = FakeGroups()
+    monkeypatch.setattr(kpi, "query", fake.query)
+    monkeypatch.setattr(kpi, "_values", {})
+    monkeypatch.setattr(kpi, "_computed_at", {})
+    monkeypatch.setattr(kpi, "_version", {name: 0 for name in kpi._GROUPS})
+    monkeypatch.setattr(kpi, "_clean_version", {})
+    monkeypatch.setattr(kpi, "_refresh_task", None)
+    monkeypatch.setattr(kpi, "_lock", asyncio.Lock())
+    return fake
+
+
+def test_cold_cache_waits_then_serves_from_memory(groups):
+    async def run():
+        first = await kpi.live()
+        calls = groups.calls
+        second = await kpi.live()
+        return first, second, calls
+
+    first, second, calls = asyncio.run(run())
+    assert first["pending_signoffs"] == 1 and first["status_distribution"] == {"X": 1}
+    assert second == first
+    assert calls == len(kpi._GROUPS) and groups.calls == calls
+
+
+def test_write_serves_stale_while_one_task_refreshes(groups):
+    async def run():
+        await kpi.live()
+        groups.value = 2
+        groups.release = asyncio.Event()
+        kpi._on_write("npa_signoffs")
+        # Readers during the refresh get the old values without waiting
+        during = await asyncio.wait_for(asyncio.gather(*(kpi.live() for _ in range(5))), 1)
+        task = kpi._refresh_task
+        groups.release.set()
+        await task
+        return during, await kpi.live()
+
+    during, after = asyncio.run(run())
+    assert all(snapshot["pending_signoffs"] == 1 for snapshot in during)
+    # Only the npa_signoffs groups were re-read, once
+    assert groups.calls == len(kpi._GROUPS) + 2
+    assert after["pending_signoffs"] == 2 and after["sla_breaches_pending"] == 2
+    assert after["status_distribution"] == {"X": 1}
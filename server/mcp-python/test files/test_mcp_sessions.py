@@ -0,0 +1,171 @@
+"""SessionAffinity: POSTs for a session held by another worker are relayed to it and answered as if local."""
+import asyncio
+import os
+import sys
+import types
+import uuid
+
+import pytest
+
+from mcp_sessions import FileSessionStore, SessionAffinity, SessionStore, make_store
+
+
+class FakeSSEApp:
+    """Stands in for FastMCP's sse_app(): GET /sse opens a session, POST /messages/ needs it to be local."""
+
+    def __init__(self):
+        self.sessions = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] == "GET":
+            session_id = uuid.uuid4().hex
+            self.sessions.add(session_id)
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/event-stream")]})
+            await send({"type": "http.response.body", "more_body": True,
+                        "body": f"event: endpoint\r\ndata: /messages/?session_id={session_id}\r\n\r\n".encode()})
+            await receive()  # held open until the client disconnects
+            self.sessions.discard(session_id)
+            return
+        session_id = scope["query_string"].decode().partition("session_id=")[2]
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        if session_id not in self.sessions:
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b"Could not find session"})
+            return
+        await send({"type": "http.response.start", "status": 202, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"Accepted " + body})
+
+
+def _scope(method, path, query=b""):
+    return {"type": "http", "method": method, "path": path, "root_path": "", "query_string": query, "headers": []}
+
+
+async def _post(app, session_id, body=b'{"jsonrpc": "2.0"}'):
+    sent = []
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(_scope("POST", "/messages/", f"session_id={session_id}".encode()), receive, send)
+    return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:])
+
+
+async def _open_session(app, store):
+    disconnect = asyncio.Event()
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    task = asyncio.create_task(app(_scope("GET", "/sse"), receive, send))
+    for _ in range(100):
+        if app.local:
+            break
+        await asyncio.sleep(0.01)
+    session_id = next(iter(app.local))
+    assert await store.lookup(session_id) == app.address
+    return session_id, disconnect, task
+
+
+@pytest.fixture
+def workers(tmp_path):
+    store = FileSessionStore(directory=str(tmp_path / "store"))
+    a, b = SessionAffinity(FakeSSEApp()), SessionAffinity(FakeSSEApp())
+    return store, a, b, tmp_path
+
+
+def test_post_is_relayed_to_the_owner(workers):
+    store, a, b, tmp = workers
+
+    async def run():
+        await a.start(store, relay="unix", directory=str(tmp / "a"), secret="s3cret")
+        await b.start(store, relay="unix", directory=str(tmp / "b"), secret="s3cret")
+        session_id, disconnect, task = await _open_session(a, store)
+        # Without affinity the other worker answers 404, as FastMCP did
+        assert await _post(b.app, session_id) == (404, b"Could not find session")
+        relayed = await _post(b, session_id, b"hello")
+        local = await _post(a, session_id, b"hello")
+        disconnect.set()
+        await task
+        gone = await store.lookup(session_id)
+        await a.stop()
+        await b.stop()
+        return relayed, local, gone
+
+    relayed, local, gone = asyncio.run(run())
+    assert relayed == local == (202, b"Accepted hello")
+    assert gone is None
+    assert b.stats()["relayed_out"] == 1 and a.stats()["relayed_in"] == 1
+
+
+def test_relay_with_the_wrong_secret_is_rejected(workers):
+    store, a, b, tmp = workers
+
+    async def run():
+        await a.start(store, relay="unix", directory=str(tmp / "a"), secret="s3cret")
+        await b.start(store, relay="unix", directory=str(tmp / "b"), secret="other")
+        session_id, disconnect, task = await _open_session(a, store)
+        result = await _post(b, session_id)
+        disconnect.set()
+        await task
+        await a.stop()
+        await b.stop()
+        return result
+
+    assert asyncio.run(run()) == (403, b"Relay rejected")
+    assert a.stats()["relay_rejected"] == 1
+
+
+def test_dead_owner_answers_404_and_forgets_the_session(workers):
+    store, a, b, tmp = workers
+
+    async def run():
+        await a.start(store, relay="unix", directory=str(tmp / "a"), secret="s3cret")
+        await b.start(store, relay="unix", directory=str(tmp / "b"), secret="s3cret")
+        session_id, disconnect, task = await _open_session(a, store)
+        # Owner process dies: its listener is gone but its store entry remains
+        a._server.close()
+        await a._server.wait_closed()
+        os.remove(a._unix_path)
+        result = await _post(b, session_id)
+        owner = await store.lookup(session_id)
+        disconnect.set()
+        await task
+        await b.stop()
+        return result, owner
+
+    result, owner = asyncio.run(run())
+    assert result == (404, b"Could not find session")
+    assert owner is None
+
+
+def test_tcp_relay_requires_a_secret(workers):
+    store, a, _, _ = workers
+    with pytest.raises(ValueError, match="MCP_RELAY_SECRET"):
+        asyncio.run(a.start(store, relay="tcp"))
+
+
+def test_custom_store_must_implement_the_interface(monkeypatch, tmp_path):
+    class Incomplete(SessionStore):
+        async def register(self, session_id, owner):
+            pass
+
+    module = types.ModuleType("custom_store")
+    module.Incomplete, module.NotAStore = Incomplete, dict
+    monkeypatch.setitem(sys.modules, "custom_store", module)
+    with pytest.raises(TypeError):
+        make_store("custom_store:Incomplete", str(tmp_path))
+    with pytest.raises(TypeError):
+        make_store("custom_store:NotAStore", str(tmp_path))
@@ -0,0 +1,84 @@
+"""prohibited_matcher: the compiled one-pass matcher agrees with a per-item scan."""
+import asyncio
+import re
+
+import pytest
+
+import prohibited_matcher
+from prohibited_matcher import _Matcher, _normalize
+
+ITEMS = [
+    {"id": 1, "layer": "REGULATORY", "item_code": "PRH-001", "item_name": "Binary Options",
+     "description": None, "jurisdictions": "ALL", "severity": "HARD_STOP"},
+    {"id": 2, "layer": "INTERNAL", "item_code": "PRH-002", "item_name": "Leveraged Crypto (>5x)",
+     "description": None, "jurisdictions": "SG,HK", "severity": "CONDITIONAL"},
+    {"id": 3, "layer": "INTERNAL", "item_code": "PRH-003", "item_name": "Crypto",
+     "description": None, "jurisdictions": None, "severity": "WARNING"},
+    {"id": 4, "layer": "SANCTIONS", "item_code": "PRH-004", "item_name": "Options on sanctioned entities",
+     "description": None, "jurisdictions": "US", "severity": "HARD_STOP"},
+]
+
+TEXTS = [
+    "Retail binary option product for SG clients",
+    "A leveraged crypto note (>5x) distributed in HK; see PRH-003.",
+    "Plain vanilla FX forward",
+    "CRYPTO custody; options on sanctioned entities excluded",
+    "",
+]
+
+
+def _reference(text, jurisdiction):
+    """Check every item's phrases one by one, as a per-item LIKE scan would."""
+    normalized = f" {_normalize(text)} "
+    hits = []
+    for item in ITEMS:
+        if not prohibited_matcher._applies(item, jurisdiction):
+            continue
+        phrases = {_normalize(s) for s in (item["item_code"], item["item_name"],
+                                          re.sub(r"\([^)]*\)", " ", item["item_name"]))}
+        if any(p and f" {p} " in normalized for p in phrases):
+            hits.append(item["id"])
+    return sorted(hits)
+
+
+@pytest.mark.parametrize("text", TEXTS)
+@pytest.mark.parametrize("jurisdiction", [None, "SG", "us"])
+def test_matcher_agrees_with_per_item_scan(text, jurisdiction):
+    hits = _Matcher(ITEMS).screen(text, jurisdiction)
+    assert sorted(h["id"] for h in hits) == _reference(text, jurisdiction)
+
+
+def test_hits_are_ordered_by_severity_with_matched_terms():
+    hits = _Matcher(ITEMS).screen("binary options and leveraged crypto", None)
+    assert [h["item_code"] for h in hits] == ["PRH-001", "PRH-002", "PRH-003"]
+    assert hits[0]["matched_terms"] == ["binary option"]
+    assert hits[1]["matched_terms"] == ["leveraged crypto"]
+
+
+def test_words_inside_other_words_do_not_match():
+    assert _Matcher(ITEMS).screen("cryptography primitives", None) == []
+
+
+def test_rebuilds_only_when_the_fingerprint_changes(monkeypatch):
+    fingerprint = {"cnt": 4, "synced": "2026-01-01 00:00:00", "today": "2026-01-02"}
+    loads = []
+
+    async def cached_query(sql, params=None):
+        return [dict(fingerprint)]
+
+    async def query(sql, params=None):
+        loads.append(sql)
+        return ITEMS
+
+    monkeypatch.setattr(prohibited_matcher, "cached_query", cached_query)
+    monkeypatch.setattr(prohibited_matcher, "query", query)
+    monkeypatch.setattr(prohibited_matcher, "_compiled", None)
+
+    async def run():
+        await prohibited_matcher.screen("binary options")
+        await prohibited_matcher.screen("crypto")
+        fingerprint["today"] = "2026-01-03"
+        return await prohibited_matcher.screen("crypto")
+
+    assert [h["id"] for h in asyncio.run(run())] == [3]
+    assert len(loads) == 2
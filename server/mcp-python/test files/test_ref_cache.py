@@ -0,0 +1,219 @@
+"""ref_cache: results match the uncached query, concurrent misses coalesce, invalidation is per table
+and reaches other processes; POST /cache/invalidate needs an ADMIN token."""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+import ref_cache
+import rest_server
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setenv("REF_CACHE_TTL", "300")
+    # Cross-process sync is exercised by its own tests
+    monkeypatch.setenv("REF_CACHE_SYNC_INTERVAL", "0")
+    monkeypatch.setattr(ref_cache, "_seen", None)
+    monkeypatch.setattr(ref_cache, "_synced_at", float("-inf"))
+    ref_cache.invalidate()
+    yield
+    ref_cache.invalidate()
+
+
+@pytest.fixture
+def fake_query(monkeypatch):
+    calls = []
+
+    async def query(sql, params=None):
+        calls.append((sql, tuple(params or ())))
+        await asyncio.sleep(0.01)
+        return [{"sql": sql, "params": list(params or [])}]
+
+    monkeypatch.setattr(ref_cache, "query", query)
+    return calls
+
+
+def test_cached_query_returns_uncached_rows(fake_query):
+    sql = "SELECT * FROM ref_npa_fields WHERE section_id = %s"
+
+    async def run():
+        return await ref_cache.cached_query(sql, [3]), await ref_cache.cached_query(sql, [3])
+
+    first, second = asyncio.run(run())
+    assert first == second == [{"sql": sql, "params": [3]}]
+    assert len(fake_query) == 1
+    # Callers get their own row dicts
+    first[0]["extra"] = True
+    assert "extra" not in asyncio.run(ref_cache.cached_query(sql, [3]))[0]
+
+
+def test_concurrent_misses_share_one_load(fake_query):
+    async def run():
+        return await asyncio.gather(*(ref_cache.cached_query("SELECT * FROM ref_npa_sections") for _ in range(20)))
+
+    results = asyncio.run(run())
+    assert len(fake_query) == 1
+    assert all(r == results[0] for r in results)
+
+
+def test_failed_load_is_not_cached(monkeypatch):
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("db down")
+        return "ok"
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await ref_cache.get_or_load("k", flaky, ["ref_x"])
+        return await ref_cache.get_or_load("k", flaky, ["ref_x"])
+
+    assert asyncio.run(run()) == "ok"
+    assert len(attempts) == 2
+
+
+def test_invalidate_drops_only_the_named_table(fake_query):
+    async def run():
+        await ref_cache.cached_query("SELECT * FROM ref_npa_sections")
+        await ref_cache.cached_query("SELECT * FROM ref_npa_fields f JOIN ref_field_options o ON o.field_id = f.id")
+        removed = ref_cache.invalidate("ref_field_options")
+        await ref_cache.cached_query("SELECT * FROM ref_npa_sections")
+        await ref_cache.cached_query("SELECT * FROM ref_npa_fields f JOIN ref_field_options o ON o.field_id = f.id")
+        return removed
+
+    assert asyncio.run(run()) == 1
+    assert [sql for sql, _ in fake_query].count("SELECT * FROM ref_npa_sections") == 1
+    assert len(fake_query) == 3
+
+
+def test_load_racing_an_invalidation_is_not_stored(monkeypatch):
+    async def run():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "old"
+
+        task = asyncio.create_task(ref_cache.get_or_load("k", slow, ["ref_x"]))
+        await asyncio.sleep(0)
+        ref_cache.invalidate("ref_x")
+        release.set()
+        assert await task == "old"
+
+        async def fresh():
+            return "new"
+
+        return await ref_cache.get_or_load("k", fresh, ["ref_x"])
+
+    assert asyncio.run(run()) == "new"
+
+
+def test_ttl_zero_bypasses_the_cache(monkeypatch, fake_query):
+    monkeypatch.setenv("REF_CACHE_TTL", "0")
+    asyncio.run(ref_cache.cached_query("SELECT * FROM ref_npa_sections"))
+    asyncio.run(ref_cache.cached_query("SELECT * FROM ref_npa_sections"))
+    assert len(fake_query) == 2
+    assert ref_cache.stats()["entries"] == 0
+
+
+class FakeGenerations:
+    """mcp_cache_generations shared by every simulated process."""
+
+    def __init__(self):
+        self.generations = {}
+        self.loads = 0
+
+    async def query(self, sql, params=None):
+        if sql is ref_cache._GENERATIONS_SQL:
+            return [{"cache_key": k, "generation": g} for k, g in self.generations.items()]
+        self.loads += 1
+        return [{"load": self.loads}]
+
+    async def execute(self, sql, params=None):
+        assert sql is ref_cache._BUMP_SQL
+        self.generations[params[0]] = self.generations.get(params[0], 0) + 1
+        return 0
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    fake = FakeGenerations()
+    monkeypatch.setattr(ref_cache, "query", fake.query)
+    monkeypatch.setattr(ref_cache, "execute", fake.execute)
+    monkeypatch.setenv("REF_CACHE_SYNC_INTERVAL", "5")
+    return fake
+
+
+def _elapse(monkeypatch, seconds):
+    monkeypatch.setattr(ref_cache, "_synced_at", ref_cache._synced_at - seconds)
+
+
+def test_invalidation_elsewhere_is_applied_on_the_next_sync(shared, monkeypatch):
+    fields = "SELECT * FROM ref_npa_fields"
+    sections = "SELECT * FROM ref_npa_sections"
+
+    async def run():
+        await ref_cache.cached_query(fields)
+        await ref_cache.cached_query(sections)
+        # Another worker handles POST /cache/invalidate
+        shared.generations["ref_npa_fields"] = 1
+        before_sync = await ref_cache.cached_query(fields)
+        _elapse(monkeypatch, 5)
+        return before_sync, await ref_cache.cached_query(fields), await ref_cache.cached_query(sections)
+
+    before_sync, after_sync, untouched = asyncio.run(run())
+    assert before_sync == [{"load": 1}]
+    assert after_sync == [{"load": 3}]
+    assert untouched == [{"load": 2}]
+    assert ref_cache.stats()["remote_invalidations"] == 1
+
+
+def test_invalidate_everywhere_records_a_generation(shared, monkeypatch):
+    async def run():
+        await ref_cache.cached_query("SELECT * FROM ref_npa_sections")
+        return await ref_cache.invalidate_everywhere()
+
+    assert asyncio.run(run()) == (1, True)
+    assert shared.generations == {"*": 1}
+
+
+def test_unpropagated_invalidation_is_reported(shared, monkeypatch):
+    async def missing_table(sql, params=None):
+        raise RuntimeError("Table 'mcp_cache_generations' doesn't exist")
+
+    monkeypatch.setattr(ref_cache, "execute", missing_table)
+    assert asyncio.run(ref_cache.invalidate_everywhere("ref_npa_fields")) == (0, False)
+
+
+def _token(secret, role, exp=None):
+    def b64(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+    signing_input = f"{b64({'alg': 'HS256', 'typ': 'JWT'})}.{b64({'role': role, 'exp': exp or time.time() + 60})}"
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode()}"
+
+
+@pytest.mark.parametrize("secret, authorization, status", [
+    ("", f"Bearer {_token('s3cret', 'ADMIN')}", 403),
+    ("s3cret", None, 401),
+    ("s3cret", f"Bearer {_token('other', 'ADMIN')}", 401),
+    ("s3cret", f"Bearer {_token('s3cret', 'ADMIN', exp=time.time() - 1)}", 401),
+    ("s3cret", f"Bearer {_token('s3cret', 'MAKER')}", 403),
+    ("s3cret", f"Bearer {_token('s3cret', 'admin')}", 200),
+])
+def test_invalidate_endpoint_requires_an_admin_token(shared, monkeypatch, secret, authorization, status):
+    monkeypatch.setenv("JWT_SECRET", secret)
+    headers = {"Authorization": authorization} if authorization else {}
+    response = TestClient(rest_server.rest_app).post("/cache/invalidate", json={"table": "ref_npa_fields"}, headers=headers)
+    assert response.status_code == status
+    assert response.json()["success"] is (status == 200)
+    assert shared.generations == ({"ref_npa_fields": 1} if status == 200 else {})
@@ -0,0 +1,110 @@
+"""REST catalog responses: compression round-trips to the same JSON, ETags revalidate with 304."""
+import gzip
+import json
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import rest_server
+from compression import CompressionMiddleware, _choose_encoding
+from registry import registry
+
+
+@pytest.fixture(scope="module")
+def client():
+    # No context manager: the lifespan (database warm-up, relays) is not run
+    return TestClient(rest_server.rest_app)
+
+
+@pytest.mark.parametrize("path, build", [
+    ("/openapi.json", rest_server._build_openapi_spec),
+    ("/tools", rest_server._build_tool_list),
+])
+def test_catalog_bodies_match_a_fresh_build(client, path, build):
+    gzipped = client.get(path, headers={"Accept-Encoding": "gzip"})
+    plain = client.get(path, headers={"Accept-Encoding": "identity"})
+    assert gzipped.status_code == plain.status_code == 200
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in gzipped.headers["vary"]
+    assert "content-encoding" not in plain.headers
+    assert gzipped.json() == plain.json() == json.loads(json.dumps(build(), default=str))
+    # One entity, whatever the transfer encoding
+    assert gzipped.headers["etag"] == plain.headers["etag"]
+
+
+@pytest.mark.parametrize("path", ["/openapi.json", "/tools"])
+def test_if_none_match_returns_304(client, path):
+    etag = client.get(path).headers["etag"]
+    for header in (etag, etag.removeprefix("W/"), f'"stale", {etag}', "*"):
+        revalidated = client.get(path, headers={"If-None-Match": header})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == etag
+    assert client.get(path, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_etag_changes_when_the_registry_does(client, monkeypatch):
+    etag = client.get("/tools").headers["etag"]
+    monkeypatch.setattr(rest_server, "_build_tool_list", lambda: {"tools": []})
+    monkeypatch.setattr(registry, "_version", registry.version + 1)
+    response = client.get("/tools", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == {"tools": []}
+    monkeypatch.undo()
+    assert client.get("/tools").headers["etag"] == etag
+
+
+def _app(minimum_size=100):
+    async def big(request):
+        return Response(json.dumps({"x": "y" * 500}), media_type="application/json")
+
+    async def small(request):
+        return Response('{"ok": true}', media_type="application/json")
+
+    async def binary(request):
+        return Response(b"\x00" * 500, media_type="application/octet-stream")
+
+    async def encoded(request):
+        return Response(gzip.compress(b"a" * 500), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+    async def streamed(request):
+        async def chunks():
+            yield b"a" * 500
+            yield b"b" * 500
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    async def text(request):
+        return PlainTextResponse("z" * 500)
+
+    app = Starlette(routes=[Route(f"/{f.__name__}", f) for f in (big, small, binary, encoded, streamed, text)])
+    app.add_middleware(CompressionMiddleware, minimum_size=minimum_size)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path, compressed", [
+    ("/big", True), ("/text", True), ("/small", False), ("/binary", False), ("/streamed", False),
+])
+def test_compression_middleware_only_touches_large_complete_text(path, compressed):
+    client = _app()
+    plain = client.get(path, headers={"Accept-Encoding": "identity"})
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert (response.headers.get("content-encoding") == "gzip") == compressed
+    assert response.content == plain.content
+    if compressed:
+        assert int(response.headers["content-length"]) < len(plain.content)
+
+
+def test_compression_middleware_leaves_encoded_bodies_alone():
+    response = _app().get("/encoded", headers={"Accept-Encoding": "gzip"})
+    # Decoded once by the client: not compressed a second time
+    assert response.content == b"a" * 500
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, deflate", "gzip"), ("gzip;q=0", None), ("identity", None), ("", None), ("GZIP;q=0.5", "gzip"),
+])
+def test_choose_encoding(accept, expected):
+    assert _choose_encoding(accept) == expected
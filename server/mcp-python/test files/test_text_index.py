@@ -0,0 +1,159 @@
+"""Indexes over text_index (kb_index, npa_similarity): ranking, SQL-equivalent filters and refresh against table changes."""
+import asyncio
+
+import pytest
+
+import kb_index
+import npa_similarity
+import text_index
+from text_index import TableIndex, fold, tokenize
+
+
+class FakeTable:
+    """Rows keyed by id, answering the queries TableIndex issues."""
+
+    def __init__(self, key, watermark):
+        self.key = key
+        self.watermark = watermark
+        self.rows = {}
+
+    def put(self, **row):
+        self.rows[row[self.key]] = row
+
+    async def stream(self, sql, params=None):
+        for row in list(self.rows.values()):
+            yield dict(row)
+
+    async def query(self, sql, params=None):
+        if " IN (" in sql:
+            return [dict(self.rows[k]) for k in self.rows if str(k) in params]
+        return [dict(r) for r in self.rows.values() if (r.get(self.watermark) or "") >= params[0]]
+
+    async def query_tuples(self, sql, params=None):
+        return [(k,) for k in self.rows]
+
+
+async def _gather(*aws):
+    return [await aw for aw in aws]
+
+
+def _install(monkeypatch, index: TableIndex, table: FakeTable):
+    monkeypatch.setattr(text_index, "stream", table.stream)
+    monkeypatch.setattr(text_index, "query", table.query)
+    monkeypatch.setattr(text_index, "query_tuples", table.query_tuples)
+    monkeypatch.setattr(text_index, "gather", _gather)
+    fresh = TableIndex(index.table, index.key, index.watermark_column, index.select, index.fields,
+                       index.result_columns, index.max_age_env, index.default_max_age)
+    return fresh
+
+
+@pytest.fixture
+def kb(monkeypatch):
+    table = FakeTable("doc_id", "last_synced")
+    table.put(doc_id="d1", filename="Sanctions_Policy.pdf", title="Sanctions screening policy",
+              description="Group policy", doc_type="Policy", last_synced="2026-01-01 00:00:00")
+    table.put(doc_id="d2", filename="fx_guide.pdf", title="FX desk guide",
+              description="Mentions sanctions once", doc_type="GUIDE", last_synced="2026-01-01 00:00:00")
+    table.put(doc_id="d3", filename="Crédit_règles.pdf", title="Règles de crédit",
+              description=None, doc_type="Policy", last_synced="2026-01-01 00:00:00")
+    monkeypatch.setattr(kb_index, "_table", _install(monkeypatch, kb_index._table, table))
+    return table
+
+
+@pytest.fixture
+def npa(monkeypatch):
+    table = FakeTable("id", "updated_at")
+    table.put(id=1, title="FX Swap desk expansion", description="Cross-currency swaps", npa_type="New-to-Group",
+              product_category="FX", updated_at="2026-01-01 00:00:00")
+    table.put(id=2, title="Equity swap", description="Total return swap on equities", npa_type="Variation",
+              product_category="Equity", updated_at="2026-01-01 00:00:00")
+    table.put(id=3, title="Green bond", description="Sustainability-linked bond", npa_type="New-to-Group",
+              product_category="Fixed Income", updated_at="2026-01-01 00:00:00")
+    monkeypatch.setattr(npa_similarity, "_table", _install(monkeypatch, npa_similarity._table, table))
+    monkeypatch.setattr(npa_similarity, "_norms_cache", (None, -1, {}))
+    return table
+
+
+def _ids(results, key):
+    return [r[key] for r in results]
+
+
+def test_tokenize_keeps_non_ascii_and_casefolds():
+    assert tokenize("Crédit-Linked NOTES, Straße") == ["crédit", "linked", "notes", "strasse"]
+    assert tokenize(None) == []
+
+
+def test_fold_matches_case_insensitive_sql_equality():
+    # utf8mb4_general_ci: 'Policy' = 'POLICY ' is true
+    assert fold("Policy") == fold("POLICY ")
+    assert fold("Policy") != fold("Policies")
+
+
+def test_kb_ranks_name_hits_first_and_prefix_matches(kb):
+    assert _ids(asyncio.run(kb_index.search("sanctions")), "doc_id") == ["d1", "d2"]
+    # LIKE '%sanction%' found both; prefix expansion keeps that
+    assert set(_ids(asyncio.run(kb_index.search("sanction")), "doc_id")) == {"d1", "d2"}
+
+
+def test_kb_finds_non_ascii_terms(kb):
+    assert _ids(asyncio.run(kb_index.search("crédit")), "doc_id") == ["d3"]
+    assert _ids(asyncio.run(kb_index.search("RÈGLES")), "doc_id") == ["d3"]
+
+
+def test_kb_doc_type_filter_is_case_insensitive(kb):
+    assert _ids(asyncio.run(kb_index.search("sanctions", doc_type="policy")), "doc_id") == ["d1"]
+    assert _ids(asyncio.run(kb_index.search("sanctions", doc_type="Guide")), "doc_id") == ["d2"]
+    assert asyncio.run(kb_index.search("sanctions", doc_type="memo")) == []
+
+
+def test_kb_result_columns_match_the_sql_result(kb):
+    hit = asyncio.run(kb_index.search("guide"))[0]
+    assert set(hit) == {"doc_id", "filename", "doc_type", "embedding_id", "last_synced", "score"}
+
+
+def test_kb_refresh_sees_updates_deletes_and_reused_slots(kb):
+    asyncio.run(kb_index.search("sanctions"))
+    # Delete one row and insert another without a watermark: the row count is unchanged
+    del kb.rows["d2"]
+    kb.put(doc_id="d4", filename="sanctions_faq.pdf", title=None, description=None, doc_type="FAQ", last_synced=None)
+    kb.put(doc_id="d1", filename="Sanctions_Policy.pdf", title="Sanctions screening policy v2",
+           description="Updated", doc_type="Memo", last_synced="2026-02-01 00:00:00")
+    kb_index._table._on_write("kb_documents")
+
+    results = asyncio.run(kb_index.search("sanctions"))
+    assert set(_ids(results, "doc_id")) == {"d1", "d4"}
+    assert {r["doc_id"]: r["doc_type"] for r in results}["d1"] == "Memo"
+    stats = kb_index.stats()
+    assert stats["full_builds"] == 1 and stats["rows_removed"] == 1 and stats["documents"] == 3
+
+
+def test_kb_clean_index_is_not_requeried(kb, monkeypatch):
+    asyncio.run(kb_index.search("sanctions"))
+    del kb.rows["d1"]
+    # No write notification and within KB_INDEX_REFRESH: the cached index answers
+    assert "d1" in _ids(asyncio.run(kb_index.search("sanctions")), "doc_id")
+    monkeypatch.setenv("KB_INDEX_REFRESH", "0")
+    assert "d1" not in _ids(asyncio.run(kb_index.search("sanctions")), "doc_id")
+
+
+def test_npa_similarity_ranks_by_cosine(npa):
+    results = asyncio.run(npa_similarity.find_similar("swap"))
+    assert _ids(results, "id") == [2, 1]
+    assert all(0 < r["similarity"] <= 1 for r in results)
+    assert asyncio.run(npa_similarity.find_similar("unrelated words")) == []
+
+
+def test_npa_filters_are_case_insensitive(npa):
+    filters = {"npa_type": "new-to-group"}
+    assert _ids(asyncio.run(npa_similarity.find_similar("swap", filters)), "id") == [1]
+    filters = {"npa_type": "NEW-TO-GROUP", "product_category": "fixed income"}
+    assert _ids(asyncio.run(npa_similarity.find_similar("bond", filters)), "id") == [3]
+
+
+def test_npa_refresh_drops_deleted_projects(npa):
+    asyncio.run(npa_similarity.find_similar("swap"))
+    del npa.rows[2]
+    npa.put(id=4, title="Commodity swap", description=None, npa_type="Variation",
+            product_category="Commodities", updated_at="2025-12-01 00:00:00")
+    npa_similarity._table._on_write("npa_projects")
+    assert _ids(asyncio.run(npa_similarity.find_similar("swap")), "id") == [4, 1]
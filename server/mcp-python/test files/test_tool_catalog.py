@@ -0,0 +1,78 @@
+"""tools/catalog.json: committed copy is current, staleness follows imported files, nothing is written at runtime."""
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import tools
+from tools.__main__ import build
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def test_committed_catalog_is_current():
+    assert build() == tools._read_catalog(), "run: python -m tools --write"
+
+
+def test_catalog_matches_the_imported_definitions():
+    catalog = tools._read_catalog()
+    listed = [tool["name"] for module in tools.MODULES for tool in catalog[module]["tools"]]
+    assert listed == [td.name for td in tools.registry.get_all()]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """A copy of the server sources to edit."""
+    for path in glob.glob(os.path.join(SERVER_DIR, "*.py")):
+        shutil.copy(path, tmp_path)
+    shutil.copytree(os.path.join(SERVER_DIR, "tools"), tmp_path / "tools",
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    return tmp_path
+
+
+def _run(tree, *args):
+    return subprocess.run([sys.executable, "-W", "ignore", *args], cwd=tree, capture_output=True, text=True,
+                          env={**os.environ, "TOOLS_LAZY_IMPORT": "true"})
+
+
+def _startup_stats(tree):
+    out = _run(tree, "-c", "import json, tools; print(json.dumps(tools.stats()))")
+    assert out.returncode == 0, out.stderr
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_current_catalog_defers_every_module(tree):
+    stats = _startup_stats(tree)
+    assert stats["imported_at_startup"] == []
+    assert stats["deferred_tools"] == sum(len(e["tools"]) for e in tools._read_catalog().values())
+
+
+def test_crlf_checkout_is_still_current(tree):
+    for path in ("tools/risk.py", "db.py"):
+        data = (tree / path).read_bytes()
+        (tree / path).write_bytes(data.replace(b"\r\n", b"\n").replace(b"\n", b"\r\n"))
+    assert _run(tree, "-m", "tools", "--check").returncode == 0
+    assert _startup_stats(tree)["imported_at_startup"] == []
+
+
+def test_editing_an_imported_module_makes_its_dependents_stale(tree):
+    catalog_before = (tree / "tools" / "catalog.json").read_bytes()
+    with open(tree / "ref_cache.py", "a") as f:
+        f.write("\n# edited\n")
+    dependents = [m for m in tools.MODULES if "ref_cache.py" in tools._read_catalog()[m]["files"]]
+    assert dependents
+
+    check = _run(tree, "-m", "tools", "--check")
+    assert check.returncode == 1
+    assert all(m in check.stderr for m in dependents)
+    assert _startup_stats(tree)["imported_at_startup"] == dependents
+    # Stale entries are imported eagerly, never rewritten at runtime
+    assert (tree / "tools" / "catalog.json").read_bytes() == catalog_before
+
+    assert _run(tree, "-m", "tools", "--write").returncode == 0
+    assert _run(tree, "-m", "tools", "--check").returncode == 0
+    assert _startup_stats(tree)["imported_at_startup"] == []
@@ -0,0 +1,220 @@
+"""
+In-process inverted index over a MySQL table, kept in sync with it.
+
+Shared by kb_index (BM25 over kb_documents) and npa_similarity (TF-IDF cosine
+over npa_projects): TableIndex owns the postings and the refresh protocol,
+and each module only scores over it.
+
+Text columns are tokenized into casefolded Unicode word tokens with per-column
+weights. Filters compare casefolded values, matching the case-insensitive `=`
+of the tables' utf8mb4_general_ci collation that the replaced SQL relied on.
+
+Refresh protocol: the first use streams the whole table. Afterwards the index
+is refreshed when a committed write touches the table (db.on_write) or when it
+is older than its max age, which covers writes made outside this process:
+rows whose watermark column (last_synced / updated_at) is at or past the
+watermark are re-indexed, and the table's key set is read to drop deleted rows
+and pick up rows the watermark missed (NULL or back-dated timestamps).
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import os
+import re
+import time
+from collections import Counter
+from contextlib import aclosing
+from typing import Any
+
+from db import gather, on_write, query, query_tuples, stream
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+# Cap on vocabulary terms a single query-token prefix expands to
+_MAX_PREFIX_TERMS = 50
+# Keys per "WHERE key IN (...)" when fetching rows the watermark missed
+_FETCH_CHUNK = 500
+
+
+def tokenize(text: Any) -> list[str]:
+    """Casefolded Unicode word tokens ("Crédit-Linked Notes" -> ["crédit", "linked", "notes"])."""
+    return _TOKEN_RE.findall(str(text).casefold()) if text else []
+
+
+def fold(value: Any) -> str | None:
+    """Comparison form of a filter value: casefolded, trailing spaces ignored (PAD SPACE)."""
+    return None if value is None else str(value).casefold().rstrip()
+
+
+class InvertedIndex:
+    def __init__(self) -> None:
+        self.postings: dict[str, dict[str, int]] = {}
+        self.doc_terms: dict[str, Counter] = {}
+        self.doc_len: dict[str, int] = {}
+        self.docs: dict[str, dict] = {}
+        self.total_len = 0
+        # Bumped on every add/remove so scorers can cache per-document values
+        self.generation = 0
+        self._vocab: list[str] | None = None
+
+    def add(self, doc_id: str, terms: Counter, doc: dict) -> None:
+        self.remove(doc_id)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(terms.values())
+        self.doc_terms[doc_id] = terms
+        self.doc_len[doc_id] = length
+        self.total_len += length
+        self.docs[doc_id] = doc
+        self.generation += 1
+        self._vocab = None
+
+    def remove(self, doc_id: str) -> None:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            plist = self.postings[term]
+            del plist[doc_id]
+            if not plist:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+        del self.docs[doc_id]
+        self.generation += 1
+        self._vocab = None
+
+    def expand(self, token: str) -> list[str]:
+        """Exact term if indexed, else vocabulary terms starting with token
+        (keeps LIKE-style partial matches such as 'sanction' -> 'sanctions')."""
+        if token in self.postings:
+            return [token]
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        i = bisect.bisect_left(self._vocab, token)
+        out = []
+        while i < len(self._vocab) and self._vocab[i].startswith(token) and len(out) < _MAX_PREFIX_TERMS:
+            out.append(self._vocab[i])
+            i += 1
+        return out
+
+    def matches(self, doc_id: str, filters: dict[str, str]) -> bool:
+        """True if the document's column equals every filter value, case-insensitively."""
+        doc = self.docs[doc_id]
+        return all(fold(doc.get(column)) == fold(value) for column, value in filters.items())
+
+
+class TableIndex:
+    """An InvertedIndex over one table, refreshed from it on demand.
+
+    fields: (column, weight) pairs to index; columns absent from a row are skipped.
+    result_columns: the row columns stored and returned with each document.
+    """
+
+    def __init__(
+        self,
+        table: str,
+        key: str,
+        watermark_column: str,
+        select: str,
+        fields: tuple[tuple[str, int], ...],
+        result_columns: tuple[str, ...],
+        max_age_env: str,
+        default_max_age: float,
+    ) -> None:
+        self.table = table
+        self.key = key
+        self.watermark_column = watermark_column
+        self.select = select
+        self.fields = fields
+        self.result_columns = result_columns
+        self.max_age_env = max_age_env
+        self.default_max_age = default_max_age
+        self.index = InvertedIndex()
+        self.watermark: str | None = None
+        self._built = False
+        self._dirty = True
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self._stats = {"full_builds": 0, "incremental_refreshes": 0, "rows_reindexed": 0, "rows_removed": 0}
+        on_write(self._on_write)
+
+    def max_age(self) -> float:
+        return float(os.getenv(self.max_age_env, str(self.default_max_age)))
+
+    def _on_write(self, table: str) -> None:
+        if table == self.table:
+            self._dirty = True
+
+    def _add(self, index: InvertedIndex, row: dict) -> None:
+        terms: Counter = Counter()
+        for column, weight in self.fields:
+            for tok in tokenize(row.get(column)):
+                terms[tok] += weight
+        index.add(str(row[self.key]), terms, {c: row.get(c) for c in self.result_columns})
+        touched = row.get(self.watermark_column)
+        if touched is not None:
+            # Serialized as ISO-8601; MySQL compares against the space-separated form
+            touched = str(touched).replace("T", " ")
+            if self.watermark is None or touched > self.watermark:
+                self.watermark = touched
+
+    async def _full_build(self) -> None:
+        index = InvertedIndex()
+        self.watermark = None
+        async with aclosing(stream(self.select)) as rows:
+            async for row in rows:
+                self._add(index, row)
+        self.index = index
+        self._built = True
+        self._stats["full_builds"] += 1
+
+    async def _incremental(self) -> None:
+        # >= so rows touched within the watermark's second are re-read; add() is idempotent
+        changed, keys = await gather(
+            query(f"{self.select} WHERE {self.watermark_column} >= %s", [self.watermark]),
+            query_tuples(f"SELECT {self.key} FROM {self.table}"),
+        )
+        for row in changed:
+            self._add(self.index, row)
+        live = {str(k) for (k,) in keys}
+        removed = [doc_id for doc_id in self.index.docs if doc_id not in live]
+        for doc_id in removed:
+            self.index.remove(doc_id)
+        missing = [k for k in live if k not in self.index.docs]
+        for i in range(0, len(missing), _FETCH_CHUNK):
+            chunk = missing[i:i + _FETCH_CHUNK]
+            for row in await query(f"{self.select} WHERE {self.key} IN ({', '.join(['%s'] * len(chunk))})", chunk):
+                self._add(self.index, row)
+        self._stats["incremental_refreshes"] += 1
+        self._stats["rows_reindexed"] += len(changed) + len(missing)
+        self._stats["rows_removed"] += len(removed)
+
+    async def refresh(self) -> InvertedIndex:
+        """Bring the index up to date if it is dirty or expired, and return it."""
+        if not self._dirty and time.monotonic() - self._checked_at < self.max_age():
+            return self.index
+        async with self._lock:
+            if not self._dirty and time.monotonic() - self._checked_at < self.max_age():
+                return self.index
+            # Cleared before reading: a write landing mid-refresh marks it dirty again
+            self._dirty = False
+            try:
+                if not self._built:
+                    await self._full_build()
+                else:
+                    await self._incremental()
+            except BaseException:
+                self._dirty = True
+                raise
+            self._checked_at = time.monotonic()
+        return self.index
+
+    def stats(self) -> dict[str, Any]:
+        """Index size and refresh counters for /metrics."""
+        return {
+            "documents": len(self.index.docs),
+            "terms": len(self.index.postings),
+            "watermark": self.watermark,
+            "max_age": self.max_age(),
+            **self._stats,
+        }
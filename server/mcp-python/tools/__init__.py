@@ -1,21 +1,139 @@
-"""Import all tool modules so they self-register on import."""
-from tools import session  # noqa: F401
-from tools import ideation  # noqa: F401
-from tools import classification  # noqa: F401
-from tools import autofill  # noqa: F401
-from tools import risk  # noqa: F401
-from tools import governance  # noqa: F401
-from tools import audit  # noqa: F401
-from tools import npa_data  # noqa: F401
-from tools import workflow  # noqa: F401
-from tools import monitoring  # noqa: F401
-from tools import documents  # noqa: F401
-from tools import governance_ext  # noqa: F401
-from tools import risk_ext  # noqa: F401
-from tools import kb_search  # noqa: F401
-from tools import prospects  # noqa: F401
-from tools import dashboard  # noqa: F401
-from tools import notifications  # noqa: F401
-from tools import jurisdiction  # noqa: F401
-from tools import bundling  # noqa: F401
-from tools import evergreen  # noqa: F401
+"""
+Tool modules — each registers its ToolDefinitions with the registry on import.
+
+Importing all of them at startup (plus db/aiomysql and the index helpers they
+pull in) is deferred when tools/catalog.json is current. The catalog records
+every tool's name, description, category and input schema per module, with the
+local source files the module imports (itself, registry, db, ...) and a hash of
+those files with line endings normalized. Placeholders are registered from it,
+so /tools, /openapi.json and the MCP tool list are complete immediately, and a
+module is imported on the first call to one of its tools, replacing its
+placeholders with the real definitions.
+
+The catalog is generated at build time and never written at runtime:
+
+  python -m tools --write   regenerate tools/catalog.json after editing a tool module
+  python -m tools --check   exit 1 if the committed catalog is stale (run by the Docker build)
+
+A module whose files no longer match its catalog entry (or has none) is simply
+imported at startup, so an edited module is never served with stale metadata.
+
+Env vars:
+  - TOOLS_LAZY_IMPORT: true/false — false imports every module at startup (default: true)
+"""
+from __future__ import annotations
+
+import hashlib
+import importlib
+import json
+import os
+from typing import Any
+
+from registry import ToolDefinition, ToolResult, registry
+
+# Import order is registration order, which is the order of /tools and /openapi.json
+MODULES = (
+    "session",
+    "ideation",
+    "classification",
+    "autofill",
+    "risk",
+    "governance",
+    "audit",
+    "npa_data",
+    "workflow",
+    "monitoring",
+    "documents",
+    "governance_ext",
+    "risk_ext",
+    "kb_search",
+    "prospects",
+    "dashboard",
+    "notifications",
+    "jurisdiction",
+    "bundling",
+    "evergreen",
+)
+
+LAZY = os.getenv("TOOLS_LAZY_IMPORT", "true").lower() in ("1", "true", "yes")
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), "catalog.json")
+# Directory the catalog's file paths are relative to (the server root)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_stats: dict[str, Any] = {"imported_at_startup": [], "imported_on_call": []}
+
+
+def _file_digest(path: str) -> bytes | None:
+    try:
+        with open(os.path.join(ROOT, path), "rb") as f:
+            # CRLF checkouts hash the same as LF ones
+            return hashlib.blake2b(f.read().replace(b"\r\n", b"\n"), digest_size=16).digest()
+    except OSError:
+        return None
+
+
+def _files_hash(files: list[str], digests: dict[str, bytes | None]) -> str | None:
+    """Hash of a module's catalog files (paths relative to ROOT); None if one is missing."""
+    h = hashlib.blake2b(digest_size=16)
+    for path in files:
+        if path not in digests:
+            digests[path] = _file_digest(path)
+        if digests[path] is None:
+            return None
+        h.update(path.encode("utf-8") + b"\0" + digests[path])
+    return h.hexdigest()
+
+
+def _read_catalog() -> dict[str, Any]:
+    try:
+        with open(CATALOG_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _deferred_handler(name: str, module: str):
+    async def handler(input: dict) -> ToolResult:
+        td = registry.get_tool(name)
+        if td.module is not None:
+            _stats["imported_on_call"].append(module)
+            importlib.import_module(f"{__name__}.{module}")
+            td = registry.get_tool(name)
+            if td.module is not None:
+                raise RuntimeError(f"Module tools.{module} did not register tool '{name}'")
+        return await td.handler(input)
+    return handler
+
+
+def load() -> None:
+    """Register every tool: placeholders for modules with a current catalog entry, real imports otherwise."""
+    catalog = _read_catalog() if LAZY else {}
+    digests: dict[str, bytes | None] = {}
+    for module in MODULES:
+        entry = catalog.get(module)
+        if entry is not None and entry.get("hash") == _files_hash(entry.get("files", []), digests):
+            for tool in entry["tools"]:
+                registry.register(ToolDefinition(
+                    name=tool["name"],
+                    description=tool["description"],
+                    category=tool["category"],
+                    input_schema=tool["input_schema"],
+                    handler=_deferred_handler(tool["name"], module),
+                    module=module,
+                ))
+        else:
+            _stats["imported_at_startup"].append(module)
+            importlib.import_module(f"{__name__}.{module}")
+
+
+def stats() -> dict[str, Any]:
+    """Which tool modules are loaded, and whether at startup or on a first call, for /metrics."""
+    return {
+        "lazy": LAZY,
+        "modules": len(MODULES),
+        "deferred_tools": sum(1 for td in registry.get_all() if td.module is not None),
+        **_stats,
+    }
+
+
+load()
@@ -0,0 +1,114 @@
+"""
+Build-time generator for tools/catalog.json (see tools/__init__.py).
+
+  python -m tools --write   import every tool module and rewrite the catalog
+  python -m tools --check   exit 1 if the committed catalog differs from a fresh build
+
+Each module's entry lists the local source files it depends on — found by
+following its import statements (including ones inside functions) to files
+under the server root — so editing a schema constant in another module
+invalidates the entry as well.
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import importlib
+import json
+import os
+import sys
+from typing import Any
+
+from registry import registry
+from tools import CATALOG_PATH, MODULES, ROOT, _files_hash, _read_catalog
+
+
+def _resolve(name: str) -> str | None:
+    """Path (relative to ROOT) of the local module or package named name, if any."""
+    base = name.replace(".", "/")
+    for candidate in (f"{base}.py", f"{base}/__init__.py"):
+        if os.path.isfile(os.path.join(ROOT, candidate)):
+            return candidate
+    return None
+
+
+def _imports(path: str) -> set[str]:
+    package = os.path.dirname(path).replace("/", ".")
+    with open(os.path.join(ROOT, path), "rb") as f:
+        tree = ast.parse(f.read(), filename=path)
+    names: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ""
+            if node.level:
+                module = ".".join(filter(None, [package, module]))
+            names.add(module)
+            # "from pkg import mod" imports a submodule
+            names.update(f"{module}.{alias.name}" for alias in node.names)
+    return names
+
+
+def _dependencies(module: str) -> list[str]:
+    """tools/<module>.py plus every local file it transitively imports, sorted."""
+    seen: set[str] = set()
+    pending = [f"tools/{module}.py"]
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        for name in _imports(path):
+            dep = _resolve(name)
+            # The tools package itself only holds the loader, not tool metadata
+            if dep is not None and dep != "tools/__init__.py":
+                pending.append(dep)
+    return sorted(seen)
+
+
+def build() -> dict[str, Any]:
+    """Import every tool module and return the catalog describing them."""
+    for module in MODULES:
+        importlib.import_module(f"tools.{module}")
+    catalog = {}
+    for module in MODULES:
+        files = _dependencies(module)
+        catalog[module] = {
+            "hash": _files_hash(files, {}),
+            "files": files,
+            "tools": [
+                {"name": td.name, "description": td.description, "category": td.category, "input_schema": td.input_schema}
+                for td in registry.get_all()
+                if td.handler.__module__ == f"tools.{module}"
+            ],
+        }
+    return catalog
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tools", description=__doc__.strip().splitlines()[0])
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--write", action="store_true", help="rewrite tools/catalog.json")
+    mode.add_argument("--check", action="store_true", help="fail if tools/catalog.json is stale")
+    args = parser.parse_args(argv)
+
+    catalog = build()
+    if args.write:
+        with open(CATALOG_PATH, "w", encoding="utf-8", newline="\n") as f:
+            json.dump(catalog, f, indent=1, ensure_ascii=False)
+            f.write("\n")
+        print(f"Wrote {CATALOG_PATH} ({sum(len(e['tools']) for e in catalog.values())} tools)")
+        return 0
+
+    committed = _read_catalog()
+    stale = [m for m in MODULES if committed.get(m) != catalog[m]]
+    if stale:
+        print(f"tools/catalog.json is stale for: {', '.join(stale)} — run: python -m tools --write", file=sys.stderr)
+        return 1
+    print(f"tools/catalog.json is current ({len(MODULES)} modules)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,10 +4,11 @@ Powers the Audit Trail Agent: immutable logging of all human and agent actions.
 Mirrors server/mcp/src/tools/audit.ts exactly.
 """
 import json
+from contextlib import aclosing
 from datetime import datetime, timezone
 
 from registry import ToolDefinition, ToolResult, registry
-from db import execute, query
+from db import execute, query, query_tuples, stream
 
 
 # ─── Tool 1: audit_log_action ─────────────────────────────────────
@@ -147,11 +148,11 @@ _REQUIRED_ACTIONS = [
 
 
 async def check_audit_completeness_handler(inp: dict) -> ToolResult:
-    entries = await query(
+    entries = await query_tuples(
         """SELECT DISTINCT action_type FROM npa_audit_log WHERE project_id = %s""",
         [inp["project_id"]],
     )
-    logged_types = {e["action_type"] for e in entries}
+    logged_types = {e[0] for e in entries}
 
     missing = [a for a in _REQUIRED_ACTIONS if a not in logged_types]
     present = [a for a in _REQUIRED_ACTIONS if a in logged_types]
@@ -188,62 +189,84 @@ GENERATE_AUDIT_REPORT_SCHEMA = {
     "properties": {
         "project_id": {"type": "string", "description": "NPA project ID"},
         "include_agent_reasoning": {"type": "string", "description": "Include AI agent reasoning chains in the report. Use 'true' or 'false'. Defaults to true"},
+        "timeline_limit": {"type": "integer", "description": "Max timeline entries to return. Defaults to 500; the summary always covers the full trail"},
+        "timeline_offset": {"type": "integer", "description": "Timeline entries to skip, for fetching the next page (use next_offset from the previous call). Defaults to 0"},
     },
     "required": ["project_id"],
 }
 
+_TIMELINE_PAGE = 500
 
-async def generate_audit_report_handler(inp: dict) -> ToolResult:
-    # Get all audit entries
-    entries = await query(
-        """SELECT id, actor_name, actor_role, action_type, action_details,
-                  is_agent_action, agent_name, timestamp, confidence_score,
-                  reasoning, model_version, source_citations
-           FROM npa_audit_log WHERE project_id = %s
-           ORDER BY timestamp ASC""",
-        [inp["project_id"]],
-    )
 
+async def generate_audit_report_handler(inp: dict) -> ToolResult:
     # Get project info
     project = await query(
         "SELECT id, title, npa_type, current_stage, status, created_at FROM npa_projects WHERE id = %s",
         [inp["project_id"]],
     )
 
-    # Build timeline
+    include_reasoning = str(inp.get("include_agent_reasoning", "true")).lower() not in ("false", "0", "no")
+    offset = max(0, int(inp.get("timeline_offset", 0)))
+    limit = max(0, int(inp.get("timeline_limit", _TIMELINE_PAGE)))
+
+    # Stream every audit entry: the summary is accumulated over the whole trail,
+    # but only one page of the timeline is kept, so memory is bounded by the page
+    # size rather than by the size of the audit log
     timeline = []
-    for e in entries:
-        entry = {
-            "timestamp": str(e.get("timestamp")) if e.get("timestamp") else None,
-            "action": e["action_type"],
-            "actor": e["actor_name"],
-            "role": e.get("actor_role"),
-            "details": e.get("action_details"),
-            "is_agent": bool(e.get("is_agent_action")),
-        }
-        if str(inp.get("include_agent_reasoning", "true")).lower() not in ("false", "0", "no") and e.get("is_agent_action"):
-            entry["agent_name"] = e.get("agent_name")
-            entry["confidence"] = e.get("confidence_score")
-            entry["reasoning"] = e.get("reasoning")
-            entry["model_version"] = e.get("model_version")
-        timeline.append(entry)
-
-    # Stage transitions
-    stage_entries = [e for e in entries if e["action_type"] == "STAGE_ADVANCED"]
-    agent_entries = [e for e in entries if e.get("is_agent_action")]
-    confidence_scores = [e["confidence_score"] for e in agent_entries if e.get("confidence_score") is not None]
+    total_actions = 0
+    stage_transitions = 0
+    agent_actions = 0
+    confidence_sum = 0.0
+    confidence_count = 0
+    unique_actors = set()
+    async with aclosing(stream(
+        """SELECT id, actor_name, actor_role, action_type, action_details,
+                  is_agent_action, agent_name, timestamp, confidence_score,
+                  reasoning, model_version, source_citations
+           FROM npa_audit_log WHERE project_id = %s
+           ORDER BY timestamp ASC, id ASC""",
+        [inp["project_id"]],
+    )) as entries:
+        async for e in entries:
+            if offset <= total_actions < offset + limit:
+                entry = {
+                    "timestamp": str(e.get("timestamp")) if e.get("timestamp") else None,
+                    "action": e["action_type"],
+                    "actor": e["actor_name"],
+                    "role": e.get("actor_role"),
+                    "details": e.get("action_details"),
+                    "is_agent": bool(e.get("is_agent_action")),
+                }
+                if include_reasoning and e.get("is_agent_action"):
+                    entry["agent_name"] = e.get("agent_name")
+                    entry["confidence"] = e.get("confidence_score")
+                    entry["reasoning"] = e.get("reasoning")
+                    entry["model_version"] = e.get("model_version")
+                timeline.append(entry)
+
+            total_actions += 1
+            unique_actors.add(e["actor_name"])
+            if e["action_type"] == "STAGE_ADVANCED":
+                stage_transitions += 1
+            if e.get("is_agent_action"):
+                agent_actions += 1
+                if e.get("confidence_score") is not None:
+                    confidence_sum += e["confidence_score"]
+                    confidence_count += 1
 
     return ToolResult(success=True, data={
         "project_id": inp["project_id"],
         "project": project[0] if project else None,
         "timeline": timeline,
+        "timeline_offset": offset,
+        "next_offset": offset + len(timeline) if offset + len(timeline) < total_actions else None,
         "summary": {
-            "total_actions": len(entries),
-            "stage_transitions": len(stage_entries),
-            "agent_actions": len(agent_entries),
-            "human_actions": len(entries) - len(agent_entries),
-            "avg_agent_confidence": round(sum(confidence_scores) / len(confidence_scores)) if confidence_scores else None,
-            "unique_actors": list({e["actor_name"] for e in entries}),
+            "total_actions": total_actions,
+            "stage_transitions": stage_transitions,
+            "agent_actions": agent_actions,
+            "human_actions": total_actions - agent_actions,
+            "avg_agent_confidence": round(confidence_sum / confidence_count) if confidence_count else None,
+            "unique_actors": list(unique_actors),
         },
     })
 
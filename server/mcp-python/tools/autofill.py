@@ -6,7 +6,8 @@ Mirrors server/mcp/src/tools/autofill.ts exactly.
 import json
 
 from registry import ToolDefinition, ToolResult, registry
-from db import execute, query
+from db import execute, execute_many, query
+from ref_cache import cached_query, get_or_load
 
 
 def _normalize_field_type(value) -> str:
@@ -55,36 +56,63 @@ GET_TEMPLATE_FIELDS_SCHEMA = {
 }
 
 
-async def autofill_get_template_fields_handler(inp: dict) -> ToolResult:
-    template_id = inp.get("template_id", "STD_NPA_V2")
-    section_sql = "SELECT s.id, s.title, s.description, s.order_index FROM ref_npa_sections s WHERE s.template_id = %s"
-    section_params: list = [template_id]
+async def _load_template_structure(template_id: str, section_id: str | None) -> list[dict]:
+    """Sections → fields → options for a template, in three set-based queries."""
+    scope_sql = "s.template_id = %s"
+    scope_params: list = [template_id]
+    if section_id:
+        scope_sql += " AND s.id = %s"
+        scope_params.append(section_id)
 
-    if inp.get("section_id"):
-        section_sql += " AND s.id = %s"
-        section_params.append(inp["section_id"])
-    section_sql += " ORDER BY s.order_index"
+    sections = await query(
+        f"SELECT s.id, s.title, s.description, s.order_index FROM ref_npa_sections s WHERE {scope_sql} ORDER BY s.order_index",
+        scope_params,
+    )
+    fields = await query(
+        f"""SELECT f.id, f.field_key, f.label, f.field_type, f.is_required, f.tooltip, f.order_index, f.section_id
+            FROM ref_npa_fields f JOIN ref_npa_sections s ON s.id = f.section_id
+            WHERE {scope_sql} ORDER BY f.order_index""",
+        scope_params,
+    )
+    options = await query(
+        f"""SELECT o.field_id, o.value, o.label, o.order_index
+            FROM ref_field_options o
+            JOIN ref_npa_fields f ON f.id = o.field_id
+            JOIN ref_npa_sections s ON s.id = f.section_id
+            WHERE {scope_sql} ORDER BY o.order_index""",
+        scope_params,
+    )
 
-    sections = await query(section_sql, section_params)
+    options_by_field: dict = {}
+    for opt in options:
+        field_id = opt.pop("field_id")
+        options_by_field.setdefault(field_id, []).append(opt)
+
+    fields_by_section: dict = {}
+    for field in fields:
+        ft = _normalize_field_type(field.get("field_type"))
+        field["field_type"] = ft
+        if ft in OPTION_FIELD_TYPES:
+            field["options"] = options_by_field.get(field["id"], [])
+        fields_by_section.setdefault(field.pop("section_id"), []).append(field)
 
     result = []
     for section in sections:
-        fields = await query(
-            """SELECT f.id, f.field_key, f.label, f.field_type, f.is_required, f.tooltip, f.order_index
-               FROM ref_npa_fields f WHERE f.section_id = %s ORDER BY f.order_index""",
-            [section["id"]],
-        )
-        for field in fields:
-            ft = _normalize_field_type(field.get("field_type"))
-            field["field_type"] = ft
-            if ft in OPTION_FIELD_TYPES:
-                options = await query(
-                    "SELECT value, label, order_index FROM ref_field_options WHERE field_id = %s ORDER BY order_index",
-                    [field["id"]],
-                )
-                field["options"] = options
-
-        result.append({**section, "fields": fields, "field_count": len(fields)})
+        section_fields = fields_by_section.get(section["id"], [])
+        result.append({**section, "fields": section_fields, "field_count": len(section_fields)})
+    return result
+
+
+async def autofill_get_template_fields_handler(inp: dict) -> ToolResult:
+    template_id = inp.get("template_id", "STD_NPA_V2")
+    section_id = inp.get("section_id")
+
+    # The assembled structure is cached per template/section until the ref tables are invalidated
+    result = await get_or_load(
+        ("autofill_template_structure", template_id, section_id),
+        lambda: _load_template_structure(template_id, section_id),
+        ["ref_npa_sections", "ref_npa_fields", "ref_field_options"],
+    )
 
     return ToolResult(success=True, data={
         "template_id": template_id,
@@ -161,27 +189,37 @@ async def autofill_populate_batch_handler(inp: dict) -> ToolResult:
     if isinstance(fields_raw, str):
         fields_raw = json.loads(fields_raw)
 
+    upsert_sql = """INSERT INTO npa_form_data (project_id, field_key, field_value, lineage, confidence_score)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                       field_value = VALUES(field_value),
+                       lineage = VALUES(lineage),
+                       confidence_score = VALUES(confidence_score)"""
+
+    def _row(field: dict) -> list:
+        return [inp["project_id"], field["field_key"], field["value"],
+                field.get("lineage", "AUTO"), field.get("confidence_score", 90)]
+
     results = []
     success_count = 0
     error_count = 0
 
-    for field in fields_raw:
-        try:
-            await execute(
-                """INSERT INTO npa_form_data (project_id, field_key, field_value, lineage, confidence_score)
-                   VALUES (%s, %s, %s, %s, %s)
-                   ON DUPLICATE KEY UPDATE
-                      field_value = VALUES(field_value),
-                      lineage = VALUES(lineage),
-                      confidence_score = VALUES(confidence_score)""",
-                [inp["project_id"], field["field_key"], field["value"],
-                 field.get("lineage", "AUTO"), field.get("confidence_score", 90)],
-            )
-            results.append({"field_key": field["field_key"], "status": "ok"})
-            success_count += 1
-        except Exception as e:
-            results.append({"field_key": field["field_key"], "status": "error", "error": str(e)})
-            error_count += 1
+    try:
+        # One multi-row upsert for the whole batch
+        await execute_many(upsert_sql, [_row(f) for f in fields_raw])
+        results = [{"field_key": f["field_key"], "status": "ok"} for f in fields_raw]
+        success_count = len(fields_raw)
+    except Exception:
+        # A single bad row (e.g. unknown field_key FK) rejects the whole statement;
+        # fall back to row-by-row so each field reports its own status.
+        for field in fields_raw:
+            try:
+                await execute(upsert_sql, _row(field))
+                results.append({"field_key": field["field_key"], "status": "ok"})
+                success_count += 1
+            except Exception as e:
+                results.append({"field_key": field["field_key"], "status": "error", "error": str(e)})
+                error_count += 1
 
     return ToolResult(success=error_count == 0, data={
         "project_id": inp["project_id"],
@@ -225,7 +263,7 @@ async def autofill_get_form_data_handler(inp: dict) -> ToolResult:
     project_row = await query("SELECT approval_track FROM npa_projects WHERE id = %s", [inp["project_id"]])
     approval_track = project_row[0].get("approval_track", "STD") if project_row else "STD"
     tpl_id = "FULL_NPA_V1" if approval_track == "FULL_NPA" else "STD_NPA_V2"
-    total_fields = await query(
+    total_fields = await cached_query(
         """SELECT COUNT(*) as cnt FROM ref_npa_fields f
            JOIN ref_npa_sections s ON s.id = f.section_id
            WHERE s.template_id = %s""",
@@ -261,11 +299,11 @@ GET_FIELD_OPTIONS_SCHEMA = {
 
 
 async def autofill_get_field_options_handler(inp: dict) -> ToolResult:
-    options = await query(
+    options = await cached_query(
         "SELECT value, label, order_index FROM ref_field_options WHERE field_id = %s ORDER BY order_index",
         [inp["field_id"]],
     )
-    field = await query(
+    field = await cached_query(
         "SELECT id, field_key, label, field_type FROM ref_npa_fields WHERE id = %s",
         [inp["field_id"]],
     )
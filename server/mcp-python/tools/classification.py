@@ -6,7 +6,8 @@ Mirrors server/mcp/src/tools/classification.ts exactly.
 import json
 
 from registry import ToolDefinition, ToolResult, registry
-from db import execute, query
+from db import execute, execute_many, insert_many, query
+from ref_cache import cached_query
 
 
 # ─── Tool 1: classify_assess_domains ──────────────────────────────
@@ -49,29 +50,41 @@ async def classify_assess_domains_handler(inp: dict) -> ToolResult:
 
         # Ensure score is within valid range (0-100)
         score = min(100, max(0, int(a.get("score", 0))))
+        results.append({"id": None, "domain": a["domain"], "status": status, "score": score})
 
-        # Write to npa_intake_assessments (domain-level intake)
-        row_id = await execute(
-            """INSERT INTO npa_intake_assessments (project_id, domain, status, score, findings, assessed_at)
-               VALUES (%s, %s, %s, %s, %s, NOW())""",
-            [inp["project_id"], a["domain"], status, score,
-             json.dumps(a["findings"]) if a.get("findings") else None],
-        )
-        # Also write per-criteria scores to npa_classification_assessments (architecture spec)
-        # Map domain to a criteria from ref_classification_criteria
-        domain_criteria = await query(
-            "SELECT id FROM ref_classification_criteria WHERE category = %s AND is_active = 1 LIMIT 1",
-            [a["domain"]],
+    # Write to npa_intake_assessments (domain-level intake); ids come back in row order
+    ids = await insert_many(
+        """INSERT INTO npa_intake_assessments (project_id, domain, status, score, findings, assessed_at)
+           VALUES (%s, %s, %s, %s, %s, NOW())""",
+        [[inp["project_id"], r["domain"], r["status"], r["score"],
+          json.dumps(a["findings"]) if a.get("findings") else None]
+         for r, a in zip(results, assessments_raw)],
+    )
+    for r, row_id in zip(results, ids):
+        r["id"] = row_id
+
+    # Also write per-criteria scores to npa_classification_assessments (architecture spec)
+    # Map each domain to its first active criteria from ref_classification_criteria
+    domains = sorted({r["domain"] for r in results})
+    domain_criteria: dict = {}
+    if domains:
+        criteria_rows = await cached_query(
+            f"""SELECT id, category FROM ref_classification_criteria
+                WHERE category IN ({', '.join(['%s'] * len(domains))}) AND is_active = 1
+                ORDER BY id""",
+            domains,
         )
-        if domain_criteria:
-            await execute(
-                """INSERT INTO npa_classification_assessments (project_id, criteria_id, score, evidence, assessed_by, confidence, assessed_at)
-                   VALUES (%s, %s, %s, %s, %s, %s, NOW())""",
-                [inp["project_id"], domain_criteria[0]["id"], score,
-                 json.dumps({"domain": a["domain"], "findings": a.get("findings", [])}),
-                 "CLASSIFICATION_AGENT", score],
-            )
-        results.append({"id": row_id, "domain": a["domain"], "status": status, "score": score})
+        for c in criteria_rows:
+            domain_criteria.setdefault(c["category"], c["id"])
+
+    await execute_many(
+        """INSERT INTO npa_classification_assessments (project_id, criteria_id, score, evidence, assessed_by, confidence, assessed_at)
+           VALUES (%s, %s, %s, %s, %s, %s, NOW())""",
+        [[inp["project_id"], domain_criteria[r["domain"]], r["score"],
+          json.dumps({"domain": r["domain"], "findings": a.get("findings", [])}),
+          "CLASSIFICATION_AGENT", r["score"]]
+         for r, a in zip(results, assessments_raw) if r["domain"] in domain_criteria],
+    )
 
     avg_score = sum(a["score"] for a in assessments_raw) / len(assessments_raw)
     fail_count = sum(1 for a in assessments_raw if a["status"] == "FAIL")
@@ -230,7 +243,7 @@ async def classify_get_criteria_handler(inp: dict) -> ToolResult:
         params.append(inp["indicator_type"])
     sql += " ORDER BY category, weight DESC"
 
-    criteria = await query(sql, params)
+    criteria = await cached_query(sql, params)
     return ToolResult(success=True, data={"criteria": criteria, "count": len(criteria)})
 
 
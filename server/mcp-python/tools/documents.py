@@ -5,7 +5,8 @@ Document management: upload metadata, completeness checks, requirements lookup.
 import json
 
 from registry import ToolDefinition, ToolResult, registry
-from db import execute, query
+from db import execute, execute_many, query
+from ref_cache import cached_query
 
 
 # ─── Tool 1: upload_document_metadata ─────────────────────────────
@@ -77,7 +78,7 @@ async def check_document_completeness_handler(inp: dict) -> ToolResult:
     approval_track = project[0]["approval_track"] if project else "FULL_NPA"
 
     # Get requirements that apply
-    requirements = await query(
+    requirements = await cached_query(
         """SELECT id, doc_code, doc_name, category, criticality, required_for, required_by_stage
            FROM ref_document_requirements
            WHERE required_for IN ('ALL', %s)
@@ -159,7 +160,7 @@ async def get_document_requirements_handler(inp: dict) -> ToolResult:
 
     where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
 
-    reqs = await query(
+    reqs = await cached_query(
         f"""SELECT id, doc_code, doc_name, description, category, criticality,
                    required_for, source, template_available, required_by_stage, order_index
             FROM ref_document_requirements{where}
@@ -168,7 +169,7 @@ async def get_document_requirements_handler(inp: dict) -> ToolResult:
     )
 
     # Also get conditional rules
-    rules = await query("SELECT * FROM ref_document_rules ORDER BY id")
+    rules = await cached_query("SELECT * FROM ref_document_rules ORDER BY id")
 
     return ToolResult(success=True, data={
         "requirements": reqs,
@@ -246,27 +247,41 @@ async def doc_lifecycle_validate_handler(inp: dict) -> ToolResult:
     if isinstance(validations_raw, str):
         validations_raw = json.loads(validations_raw)
 
+    # Fetch every referenced document for this project in one query
+    doc_ids = list({v["document_id"] for v in validations_raw})
+    docs_by_id = {}
+    if doc_ids:
+        docs = await query(
+            f"""SELECT id, document_name, validation_status FROM npa_documents
+                WHERE project_id = %s AND id IN ({', '.join(['%s'] * len(doc_ids))})""",
+            [inp["project_id"], *doc_ids],
+        )
+        docs_by_id = {str(d["id"]): d for d in docs}
+
     results = []
+    updates = []
     for v in validations_raw:
-        docs = await query("SELECT id, document_name, validation_status FROM npa_documents WHERE id = %s AND project_id = %s",
-                           [v["document_id"], inp["project_id"]])
-        if not docs:
+        doc = docs_by_id.get(str(v["document_id"]))
+        if doc is None:
             results.append({"document_id": v["document_id"], "error": "Not found"})
             continue
 
-        await execute(
-            """UPDATE npa_documents
-               SET validation_status = %s, validation_stage = %s
-               WHERE id = %s""",
-            [v["validation_status"], v.get("validation_stage"), v["document_id"]],
-        )
+        updates.append([v["validation_status"], v.get("validation_stage"), v["document_id"]])
         results.append({
             "document_id": v["document_id"],
-            "document_name": docs[0]["document_name"],
-            "previous_status": docs[0]["validation_status"],
+            "document_name": doc["document_name"],
+            "previous_status": doc["validation_status"],
             "new_status": v["validation_status"],
         })
 
+    # All updates on a single pooled connection
+    await execute_many(
+        """UPDATE npa_documents
+           SET validation_status = %s, validation_stage = %s
+           WHERE id = %s""",
+        updates,
+    )
+
     # After validating all docs, check completeness
     completeness = await check_document_completeness_handler({"project_id": inp["project_id"]})
 
@@ -6,7 +6,7 @@ Mirrors server/mcp/src/tools/governance.ts exactly.
 from datetime import datetime, timedelta, timezone
 
 from registry import ToolDefinition, ToolResult, registry
-from db import execute, query
+from db import execute, insert_many, query, transaction
 
 
 # ─── Tool 1: governance_get_signoffs ──────────────────────────────
@@ -79,20 +79,17 @@ async def governance_create_signoff_matrix_handler(inp: dict) -> ToolResult:
     if isinstance(signoffs_raw, str):
         signoffs_raw = _json.loads(signoffs_raw)
 
+    rows = []
     for signoff in signoffs_raw:
         sla_hours = signoff.get("sla_hours", 72)
         sla_deadline = datetime.now(timezone.utc) + timedelta(hours=sla_hours)
         sla_str = sla_deadline.strftime("%Y-%m-%d %H:%M:%S")
 
-        row_id = await execute(
-            """INSERT INTO npa_signoffs (project_id, party, department, status, approver_name, approver_email, sla_deadline, created_at)
-               VALUES (%s, %s, %s, 'PENDING', %s, %s, %s, NOW())""",
-            [inp["project_id"], signoff["party"], signoff["department"],
-             signoff["approver_name"], signoff.get("approver_email"), sla_str],
-        )
+        rows.append([inp["project_id"], signoff["party"], signoff["department"],
+                     signoff["approver_name"], signoff.get("approver_email"), sla_str])
         parties_added.add(signoff["party"])
         results.append({
-            "id": row_id,
+            "id": None,
             "party": signoff["party"],
             "approver": signoff["approver_name"],
             "sla_deadline": sla_deadline.isoformat(),
@@ -115,20 +112,25 @@ async def governance_create_signoff_matrix_handler(inp: dict) -> ToolResult:
         if ta["party"] not in parties_added:
             sla_deadline = datetime.now(timezone.utc) + timedelta(hours=ta["sla"])
             sla_str = sla_deadline.strftime("%Y-%m-%d %H:%M:%S")
-            row_id = await execute(
-                """INSERT INTO npa_signoffs (project_id, party, department, status, approver_name, sla_deadline, created_at)
-                   VALUES (%s, %s, %s, 'PENDING', %s, %s, NOW())""",
-                [inp["project_id"], ta["party"], ta["dept"], "TBD (Notional Threshold)", sla_str],
-            )
+            rows.append([inp["project_id"], ta["party"], ta["dept"], "TBD (Notional Threshold)", None, sla_str])
             parties_added.add(ta["party"])
             results.append({
-                "id": row_id,
+                "id": None,
                 "party": ta["party"],
                 "approver": "TBD (Notional Threshold)",
                 "sla_deadline": sla_deadline.isoformat(),
                 "added_by": "NOTIONAL_THRESHOLD",
             })
 
+    # Whole matrix (requested + threshold parties); ids come back in row order
+    ids = await insert_many(
+        """INSERT INTO npa_signoffs (project_id, party, department, status, approver_name, approver_email, sla_deadline, created_at)
+           VALUES (%s, %s, %s, 'PENDING', %s, %s, %s, NOW())""",
+        rows,
+    )
+    for r, row_id in zip(results, ids):
+        r["id"] = row_id
+
     return ToolResult(success=True, data={
         "project_id": inp["project_id"],
         "signoffs_created": results,
@@ -242,26 +244,28 @@ ADVANCE_STAGE_SCHEMA = {
 
 
 async def governance_advance_stage_handler(inp: dict) -> ToolResult:
-    project = await query(
-        "SELECT current_stage FROM npa_projects WHERE id = %s",
-        [inp["project_id"]],
-    )
-    previous_stage = project[0].get("current_stage", "UNKNOWN") if project else "UNKNOWN"
+    # One connection, one commit: the stage transition is atomic
+    async with transaction() as tx:
+        project = await tx.query(
+            "SELECT current_stage FROM npa_projects WHERE id = %s FOR UPDATE",
+            [inp["project_id"]],
+        )
+        previous_stage = project[0].get("current_stage", "UNKNOWN") if project else "UNKNOWN"
 
-    await execute(
-        """UPDATE npa_workflow_states SET status = 'COMPLETED', completed_at = NOW()
-           WHERE project_id = %s AND stage_id = %s AND status = 'IN_PROGRESS'""",
-        [inp["project_id"], previous_stage],
-    )
-    await execute(
-        """INSERT INTO npa_workflow_states (project_id, stage_id, status, started_at)
-           VALUES (%s, %s, 'IN_PROGRESS', NOW())""",
-        [inp["project_id"], inp["new_stage"]],
-    )
-    await execute(
-        "UPDATE npa_projects SET current_stage = %s, updated_at = NOW() WHERE id = %s",
-        [inp["new_stage"], inp["project_id"]],
-    )
+        await tx.execute(
+            """UPDATE npa_workflow_states SET status = 'COMPLETED', completed_at = NOW()
+               WHERE project_id = %s AND stage_id = %s AND status = 'IN_PROGRESS'""",
+            [inp["project_id"], previous_stage],
+        )
+        await tx.execute(
+            """INSERT INTO npa_workflow_states (project_id, stage_id, status, started_at)
+               VALUES (%s, %s, 'IN_PROGRESS', NOW())""",
+            [inp["project_id"], inp["new_stage"]],
+        )
+        await tx.execute(
+            "UPDATE npa_projects SET current_stage = %s, updated_at = NOW() WHERE id = %s",
+            [inp["new_stage"], inp["project_id"]],
+        )
 
     return ToolResult(success=True, data={
         "project_id": inp["project_id"],
@@ -8,7 +8,10 @@ import uuid
 from datetime import datetime, timezone
 
 from registry import ToolDefinition, ToolResult, registry
-from db import execute, query
+from db import execute, execute_many, query
+from ref_cache import cached_query, get_or_load
+import npa_similarity
+import prohibited_matcher
 
 
 # ─── Tool 1: ideation_create_npa ──────────────────────────────────
@@ -81,22 +84,9 @@ FIND_SIMILAR_SCHEMA = {
 
 
 async def ideation_find_similar_handler(inp: dict) -> ToolResult:
-    sql = """SELECT id, title, description, npa_type, product_category, risk_level,
-                    current_stage, status, notional_amount, approval_track, created_at
-             FROM npa_projects WHERE (title LIKE %s OR description LIKE %s)"""
-    term = f"%{inp['search_term']}%"
-    params: list = [term, term]
-
-    if inp.get("npa_type"):
-        sql += " AND npa_type = %s"
-        params.append(inp["npa_type"])
-    if inp.get("product_category"):
-        sql += " AND product_category = %s"
-        params.append(inp["product_category"])
-    sql += " ORDER BY created_at DESC LIMIT %s"
-    params.append(inp.get("limit", 10))
-
-    results = await query(sql, params)
+    # TF-IDF ranked from the in-process index (npa_similarity.py), best match first
+    filters = {col: inp[col] for col in ("npa_type", "product_category") if inp.get(col)}
+    results = await npa_similarity.find_similar(inp["search_term"], filters, int(inp.get("limit", 10)))
     return ToolResult(success=True, data={
         "matches": results,
         "count": len(results),
@@ -133,7 +123,7 @@ async def ideation_get_prohibited_list_handler(inp: dict) -> ToolResult:
     # Only return currently effective items
     sql += " AND (effective_to IS NULL OR effective_to > NOW())"
     sql += " ORDER BY layer, severity DESC, item_name"
-    items = await query(sql, params)
+    items = await cached_query(sql, params)
 
     # Group by layer
     by_layer = {}
@@ -141,12 +131,16 @@ async def ideation_get_prohibited_list_handler(inp: dict) -> ToolResult:
         layer = item.get("layer", "UNKNOWN")
         by_layer.setdefault(layer, []).append(item)
 
-    return ToolResult(success=True, data={
+    data = {
         "prohibited_items": items,
         "by_layer": by_layer,
         "total_items": len(items),
         "layers": list(by_layer.keys()),
-    })
+    }
+    # Screen the product description so the agent gets hits instead of matching by hand
+    if inp.get("product_description"):
+        data["matches"] = await prohibited_matcher.screen(inp["product_description"])
+    return ToolResult(success=True, data=data)
 
 
 # ─── Tool 4: ideation_save_concept ────────────────────────────────
@@ -164,6 +158,13 @@ SAVE_CONCEPT_SCHEMA = {
 }
 
 
+async def _form_field_keys() -> frozenset:
+    """All field_keys in ref_npa_fields, cached with the rest of the reference data."""
+    async def load() -> frozenset:
+        return frozenset(r["field_key"] for r in await query("SELECT field_key FROM ref_npa_fields"))
+    return await get_or_load(("ref_npa_field_keys",), load, ["ref_npa_fields"])
+
+
 async def ideation_save_concept_handler(inp: dict) -> ToolResult:
     fields = [
         ("concept_notes", inp.get("concept_notes")),
@@ -173,31 +174,30 @@ async def ideation_save_concept_handler(inp: dict) -> ToolResult:
     ]
     fields = [(k, v) for k, v in fields if v is not None]
 
-    # Check that the field_key exists in ref_npa_fields before inserting into npa_form_data (FK constraint)
-    for key, value in fields:
-        existing_field = await query(
-            "SELECT field_key FROM ref_npa_fields WHERE field_key = %s",
-            [key],
-        )
-        if existing_field:
-            await execute(
-                """INSERT INTO npa_form_data (project_id, field_key, field_value, lineage, confidence_score)
-                   VALUES (%s, %s, %s, 'AUTO', 85.00)
-                   ON DUPLICATE KEY UPDATE field_value = VALUES(field_value), lineage = 'AUTO', confidence_score = 85.00""",
-                [inp["project_id"], key, value],
-            )
-        else:
-            # Field not in reference table — store as description update on the project instead
-            if key == "concept_notes":
-                await execute(
-                    "UPDATE npa_projects SET description = CONCAT(COALESCE(description, ''), %s) WHERE id = %s",
-                    [f"\n[Concept Notes]: {value}", inp["project_id"]],
-                )
+    # Only keys present in ref_npa_fields may go into npa_form_data (FK constraint)
+    known_keys = await _form_field_keys()
+    await execute_many(
+        """INSERT INTO npa_form_data (project_id, field_key, field_value, lineage, confidence_score)
+           VALUES (%s, %s, %s, 'AUTO', 85.00)
+           ON DUPLICATE KEY UPDATE field_value = VALUES(field_value), lineage = 'AUTO', confidence_score = 85.00""",
+        [[inp["project_id"], key, value] for key, value in fields if key in known_keys],
+    )
 
+    # Everything else lands on the project row in a single UPDATE
+    set_clauses = []
+    params: list = []
+    concept_notes = inp.get("concept_notes")
+    if concept_notes is not None and "concept_notes" not in known_keys:
+        # Field not in reference table — store as description update on the project instead
+        set_clauses.append("description = CONCAT(COALESCE(description, ''), %s)")
+        params.append(f"\n[Concept Notes]: {concept_notes}")
     if inp.get("estimated_revenue") is not None:
+        set_clauses.append("estimated_revenue = %s")
+        params.append(inp["estimated_revenue"])
+    if set_clauses:
         await execute(
-            "UPDATE npa_projects SET estimated_revenue = %s WHERE id = %s",
-            [inp["estimated_revenue"], inp["project_id"]],
+            f"UPDATE npa_projects SET {', '.join(set_clauses)} WHERE id = %s",
+            params + [inp["project_id"]],
         )
 
     return ToolResult(success=True, data={
@@ -231,7 +231,7 @@ async def ideation_list_templates_handler(inp: dict) -> ToolResult:
         sql += " WHERE t.is_active = 1"
 
     sql += " GROUP BY t.id, t.name, t.version, t.is_active ORDER BY t.name"
-    templates = await query(sql)
+    templates = await cached_query(sql)
 
     return ToolResult(success=True, data={
         "templates": templates,
@@ -242,7 +242,7 @@ async def ideation_list_templates_handler(inp: dict) -> ToolResult:
 # ── Register ──────────────────────────────────────────────────────
 registry.register_all([
     ToolDefinition(name="ideation_create_npa", description="Create a new NPA project record in the database. Returns the new NPA ID for subsequent operations.", category="ideation", input_schema=CREATE_NPA_SCHEMA, handler=ideation_create_npa_handler),
-    ToolDefinition(name="ideation_find_similar", description="Search for similar historical NPAs by product name, description, or category. Returns matching NPAs with their outcomes.", category="ideation", input_schema=FIND_SIMILAR_SCHEMA, handler=ideation_find_similar_handler),
+    ToolDefinition(name="ideation_find_similar", description="Search for similar historical NPAs by product name, description, or category. Returns matching NPAs ranked by similarity, with their outcomes.", category="ideation", input_schema=FIND_SIMILAR_SCHEMA, handler=ideation_find_similar_handler),
     ToolDefinition(name="ideation_get_prohibited_list", description="Retrieve the prohibited products/activities list from classification criteria. Use this to check if a proposed product falls under prohibited categories.", category="ideation", input_schema=PROHIBITED_LIST_SCHEMA, handler=ideation_get_prohibited_list_handler),
     ToolDefinition(name="ideation_save_concept", description="Save initial product concept notes and rationale as form data for an NPA project.", category="ideation", input_schema=SAVE_CONCEPT_SCHEMA, handler=ideation_save_concept_handler),
     ToolDefinition(name="ideation_list_templates", description="List all available NPA templates with their sections and field counts.", category="ideation", input_schema=LIST_TEMPLATES_SCHEMA, handler=ideation_list_templates_handler),
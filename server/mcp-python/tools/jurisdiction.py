@@ -5,6 +5,7 @@ Uses npa_jurisdictions table (project_id, jurisdiction_code) and ref_prohibited_
 """
 from registry import ToolDefinition, ToolResult, registry
 from db import execute, query
+from ref_cache import cached_query
 
 
 # Known jurisdiction metadata (no ref_jurisdictions table exists in DB)
@@ -83,7 +84,7 @@ async def get_jurisdiction_rules_handler(inp: dict) -> ToolResult:
     jurisdiction = {"jurisdiction_code": code, **meta}
 
     # Get prohibited items specific to this jurisdiction
-    prohibited = await query(
+    prohibited = await cached_query(
         """SELECT item_code, item_name, severity, description, layer
            FROM ref_prohibited_items
            WHERE (jurisdictions LIKE %s OR jurisdictions = 'ALL')
@@ -1,10 +1,15 @@
 """
-KB Search Tools — 3 tools
-Knowledge base document search and retrieval.
+KB Search Tools — 4 tools
+Knowledge base document search and retrieval (keyword BM25 and local vector similarity).
 Used by Ideation, AutoFill, Diligence, Risk, and Classification agents.
 """
+from contextlib import aclosing
+
 from registry import ToolDefinition, ToolResult, registry
-from db import query
+from db import query, stream
+import kb_index
+import kb_vectors
+from text_index import fold
 
 
 # ─── Tool 1: search_kb_documents ─────────────────────────────────
@@ -21,25 +26,8 @@ SEARCH_KB_DOCUMENTS_SCHEMA = {
 
 
 async def search_kb_documents_handler(inp: dict) -> ToolResult:
-    conditions = ["(filename LIKE %s OR doc_type LIKE %s)"]
-    search = f"%{inp['search_term']}%"
-    params = [search, search]
-
-    if inp.get("doc_type"):
-        conditions.append("doc_type = %s")
-        params.append(inp["doc_type"])
-
-    limit = inp.get("limit", 10)
-    params.append(limit)
-
-    docs = await query(
-        f"""SELECT doc_id, filename, doc_type, embedding_id, last_synced
-            FROM kb_documents
-            WHERE {' AND '.join(conditions)}
-            ORDER BY last_synced DESC
-            LIMIT %s""",
-        params,
-    )
+    # BM25 over names, titles and descriptions from the in-process index (kb_index.py)
+    docs = await kb_index.search(inp["search_term"], inp.get("doc_type"), int(inp.get("limit", 10)))
 
     return ToolResult(success=True, data={
         "query": inp["search_term"],
@@ -77,37 +65,117 @@ LIST_KB_SOURCES_SCHEMA = {
     "type": "object",
     "properties": {
         "doc_type": {"type": "string", "description": "Filter by document type"},
+        "limit": {"type": "integer", "description": "Max sources to return. Defaults to 500; by_type and total always cover every document"},
+        "offset": {"type": "integer", "description": "Sources to skip, for fetching the next page (use next_offset from the previous call). Defaults to 0"},
     },
 }
 
+_SOURCES_PAGE = 500
+
 
 async def list_kb_sources_handler(inp: dict) -> ToolResult:
     if inp.get("doc_type"):
-        docs = await query(
-            "SELECT doc_id, filename, doc_type, last_synced FROM kb_documents WHERE doc_type = %s ORDER BY filename",
-            [inp["doc_type"]],
-        )
+        sql = "SELECT doc_id, filename, doc_type, last_synced FROM kb_documents WHERE doc_type = %s ORDER BY filename"
+        params = [inp["doc_type"]]
     else:
+        sql = "SELECT doc_id, filename, doc_type, last_synced FROM kb_documents ORDER BY doc_type, filename"
+        params = []
+
+    offset = max(0, int(inp.get("offset", 0)))
+    limit = max(0, int(inp.get("limit", _SOURCES_PAGE)))
+
+    # Stream rows: counts cover every document, but only one page of sources is kept
+    docs = []
+    by_type: dict = {}
+    total = 0
+    async with aclosing(stream(sql, params)) as rows:
+        async for d in rows:
+            if offset <= total < offset + limit:
+                docs.append(d)
+            total += 1
+            dt = d.get("doc_type", "UNKNOWN")
+            by_type[dt] = by_type.get(dt, 0) + 1
+
+    return ToolResult(success=True, data={
+        "sources": docs,
+        "by_type": by_type,
+        "total": total,
+        "offset": offset,
+        "next_offset": offset + len(docs) if offset + len(docs) < total else None,
+    })
+
+
+# ─── Tool 4: semantic_search_kb ──────────────────────────────────
+
+SEMANTIC_SEARCH_KB_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "query_vector": {"type": "string", "description": "Comma-separated query embedding from the same model that produced the KB embeddings"},
+        "doc_id": {"type": "string", "description": "Find documents similar to this KB document instead of a query vector"},
+        "doc_type": {"type": "string", "description": "Filter by document type"},
+        "limit": {"type": "integer", "description": "Max results to return. Defaults to 10"},
+    },
+}
+
+
+async def semantic_search_kb_handler(inp: dict) -> ToolResult:
+    limit = int(inp.get("limit", 10))
+    # Over-fetch when filtering by type so the filter doesn't starve the result list
+    k = limit * 4 if inp.get("doc_type") else limit
+
+    try:
+        if inp.get("query_vector"):
+            vector = inp["query_vector"]
+            if isinstance(vector, str):
+                vector = [float(x) for x in vector.strip("[] ").split(",") if x.strip()]
+            hits = await kb_vectors.search(vector, k)
+        elif inp.get("doc_id"):
+            rows = await query("SELECT embedding_id FROM kb_documents WHERE doc_id = %s", [inp["doc_id"]])
+            if not rows:
+                return ToolResult(success=False, error=f"KB document '{inp['doc_id']}' not found")
+            if not rows[0]["embedding_id"]:
+                return ToolResult(success=False, error=f"KB document '{inp['doc_id']}' has no embedding")
+            hits = await kb_vectors.similar_to(rows[0]["embedding_id"], k)
+        else:
+            return ToolResult(success=False, error="Provide either query_vector or doc_id")
+    except kb_vectors.VectorIndexUnavailable as e:
+        return ToolResult(success=False, error=f"Semantic search unavailable: {e}")
+    except KeyError:
+        return ToolResult(success=False, error=f"KB document '{inp['doc_id']}' is not in the embeddings index")
+    except ValueError as e:
+        return ToolResult(success=False, error=str(e))
+
+    docs_by_embedding = {}
+    if hits:
+        embedding_ids = [eid for eid, _ in hits]
         docs = await query(
-            "SELECT doc_id, filename, doc_type, last_synced FROM kb_documents ORDER BY doc_type, filename",
+            f"""SELECT doc_id, filename, doc_type, embedding_id, last_synced
+                FROM kb_documents
+                WHERE embedding_id IN ({', '.join(['%s'] * len(embedding_ids))})""",
+            embedding_ids,
         )
-
-    # Group by type
-    by_type = {}
-    for d in docs:
-        dt = d.get("doc_type", "UNKNOWN")
-        by_type.setdefault(dt, []).append(d)
+        docs_by_embedding = {d["embedding_id"]: d for d in docs}
+
+    results = []
+    for eid, score in hits:
+        doc = docs_by_embedding.get(eid)
+        # Embeddings whose document was removed from kb_documents are skipped
+        if doc is None or (inp.get("doc_type") and fold(doc["doc_type"]) != fold(inp["doc_type"])):
+            continue
+        results.append({**doc, "score": score})
+        if len(results) == limit:
+            break
 
     return ToolResult(success=True, data={
-        "sources": docs,
-        "by_type": {k: len(v) for k, v in by_type.items()},
-        "total": len(docs),
+        "results": results,
+        "total": len(results),
     })
 
 
 # ── Register ──────────────────────────────────────────────────────
 registry.register_all([
-    ToolDefinition(name="search_kb_documents", description="Search the knowledge base for documents by keyword, with optional type filtering. Used for RAG context.", category="kb_search", input_schema=SEARCH_KB_DOCUMENTS_SCHEMA, handler=search_kb_documents_handler),
+    ToolDefinition(name="search_kb_documents", description="Search the knowledge base for documents by keyword (BM25-ranked over names, titles and descriptions), with optional type filtering. Used for RAG context.", category="kb_search", input_schema=SEARCH_KB_DOCUMENTS_SCHEMA, handler=search_kb_documents_handler),
     ToolDefinition(name="get_kb_document_by_id", description="Retrieve a specific knowledge base document by ID with its metadata and embedding reference.", category="kb_search", input_schema=GET_KB_DOCUMENT_BY_ID_SCHEMA, handler=get_kb_document_by_id_handler),
     ToolDefinition(name="list_kb_sources", description="List all available knowledge base sources, optionally filtered by document type.", category="kb_search", input_schema=LIST_KB_SOURCES_SCHEMA, handler=list_kb_sources_handler),
+    ToolDefinition(name="semantic_search_kb", description="Semantic nearest-neighbour search over knowledge base embeddings (local index). Takes a query embedding, or a doc_id to find similar documents.", category="kb_search", input_schema=SEMANTIC_SEARCH_KB_SCHEMA, handler=semantic_search_kb_handler),
 ])
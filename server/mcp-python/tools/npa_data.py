@@ -5,7 +5,7 @@ Core CRUD operations for NPA projects.
 import json
 
 from registry import ToolDefinition, ToolResult, registry
-from db import execute, query
+from db import execute, gather, query
 
 
 # ─── Tool 1: get_npa_by_id ───────────────────────────────────────
@@ -20,29 +20,28 @@ GET_NPA_BY_ID_SCHEMA = {
 
 
 async def get_npa_by_id_handler(inp: dict) -> ToolResult:
-    rows = await query(
-        "SELECT * FROM npa_projects WHERE id = %s",
-        [inp["project_id"]],
+    # Project row, latest workflow state and signoff summary are independent reads
+    rows, states, signoffs = await gather(
+        query(
+            "SELECT * FROM npa_projects WHERE id = %s",
+            [inp["project_id"]],
+        ),
+        query(
+            """SELECT stage_id, status, started_at, completed_at
+               FROM npa_workflow_states
+               WHERE project_id = %s ORDER BY started_at DESC LIMIT 1""",
+            [inp["project_id"]],
+        ),
+        query(
+            """SELECT status, COUNT(*) as cnt FROM npa_signoffs
+               WHERE project_id = %s GROUP BY status""",
+            [inp["project_id"]],
+        ),
     )
     if not rows:
         return ToolResult(success=False, error=f"NPA '{inp['project_id']}' not found")
 
     npa = rows[0]
-
-    # Fetch latest workflow state
-    states = await query(
-        """SELECT stage_id, status, started_at, completed_at
-           FROM npa_workflow_states
-           WHERE project_id = %s ORDER BY started_at DESC LIMIT 1""",
-        [inp["project_id"]],
-    )
-
-    # Fetch signoff summary
-    signoffs = await query(
-        """SELECT status, COUNT(*) as cnt FROM npa_signoffs
-           WHERE project_id = %s GROUP BY status""",
-        [inp["project_id"]],
-    )
     signoff_summary = {row["status"]: row["cnt"] for row in signoffs}
 
     return ToolResult(success=True, data={
@@ -6,7 +6,7 @@ Used by the Ideation Agent.
 import uuid
 
 from registry import ToolDefinition, ToolResult, registry
-from db import execute, query
+from db import query, transaction
 
 
 # ─── Tool 1: get_prospects ────────────────────────────────────────
@@ -68,46 +68,48 @@ CONVERT_PROSPECT_TO_NPA_SCHEMA = {
 
 
 async def convert_prospect_to_npa_handler(inp: dict) -> ToolResult:
-    # Fetch the prospect
-    prospects = await query(
-        "SELECT * FROM npa_prospects WHERE id = %s",
-        [inp["prospect_id"]],
-    )
-
-    if not prospects:
-        return ToolResult(success=False, error=f"Prospect {inp['prospect_id']} not found")
-
-    prospect = prospects[0]
-
     # Generate collision-resistant NPA ID (align with Node API convention)
     npa_id = f"NPA-{uuid.uuid4().hex}"
 
-    # Create the NPA project from prospect data
-    await execute(
-        """INSERT INTO npa_projects
-               (id, title, description, npa_type, risk_level, status,
-                estimated_revenue, submitted_by, current_stage, created_at, updated_at)
-           VALUES (%s, %s, %s, %s, %s, 'ACTIVE', %s, %s, 'INITIATION', NOW(), NOW())""",
-        [npa_id, prospect["name"],
-         f"Converted from prospect: {prospect.get('theme', '')}",
-         inp.get("npa_type", "New-to-Group"),
-         inp.get("risk_level", "MEDIUM"),
-         prospect.get("estimated_value"),
-         inp.get("submitted_by", "system")],
-    )
-
-    # Update prospect status to Converted
-    await execute(
-        "UPDATE npa_prospects SET status = 'Converted' WHERE id = %s",
-        [inp["prospect_id"]],
-    )
-
-    # Create initial workflow state
-    await execute(
-        """INSERT INTO npa_workflow_states (project_id, stage_id, status, started_at)
-           VALUES (%s, 'INITIATION', 'IN_PROGRESS', NOW())""",
-        [npa_id],
-    )
+    # One connection, one commit: a prospect is never half-converted
+    async with transaction() as tx:
+        # Fetch the prospect (locked so two agents can't convert it twice)
+        prospects = await tx.query(
+            "SELECT * FROM npa_prospects WHERE id = %s FOR UPDATE",
+            [inp["prospect_id"]],
+        )
+
+        if not prospects:
+            return ToolResult(success=False, error=f"Prospect {inp['prospect_id']} not found")
+
+        prospect = prospects[0]
+
+        # Create the NPA project from prospect data
+        await tx.execute(
+            """INSERT INTO npa_projects
+                   (id, title, description, npa_type, risk_level, status,
+                    estimated_revenue, submitted_by, current_stage, created_at, updated_at)
+               VALUES (%s, %s, %s, %s, %s, 'ACTIVE', %s, %s, 'INITIATION', NOW(), NOW())""",
+            [npa_id, prospect["name"],
+             f"Converted from prospect: {prospect.get('theme', '')}",
+             inp.get("npa_type", "New-to-Group"),
+             inp.get("risk_level", "MEDIUM"),
+             prospect.get("estimated_value"),
+             inp.get("submitted_by", "system")],
+        )
+
+        # Update prospect status to Converted
+        await tx.execute(
+            "UPDATE npa_prospects SET status = 'Converted' WHERE id = %s",
+            [inp["prospect_id"]],
+        )
+
+        # Create initial workflow state
+        await tx.execute(
+            """INSERT INTO npa_workflow_states (project_id, stage_id, status, started_at)
+               VALUES (%s, 'INITIATION', 'IN_PROGRESS', NOW())""",
+            [npa_id],
+        )
 
     return ToolResult(success=True, data={
         "npa_id": npa_id,
@@ -1,11 +1,13 @@
 """
-Risk Extension Tools — 4 tools
-Additional risk capabilities: prerequisites, risk checks, form field lookups.
+Risk Extension Tools — 5 tools
+Additional risk capabilities: prerequisites, risk checks, form field lookups, prohibited-list screening.
 """
 import json
 
 from registry import ToolDefinition, ToolResult, registry
 from db import execute, query
+from ref_cache import cached_query
+import prohibited_matcher
 
 
 # ─── Tool 1: get_prerequisite_categories ──────────────────────────
@@ -19,7 +21,7 @@ GET_PREREQUISITE_CATEGORIES_SCHEMA = {
 
 
 async def get_prerequisite_categories_handler(inp: dict) -> ToolResult:
-    categories = await query(
+    categories = await cached_query(
         """SELECT id, category_code, category_name, weight, description, order_index
            FROM ref_prerequisite_categories
            ORDER BY order_index""",
@@ -27,7 +29,7 @@ async def get_prerequisite_categories_handler(inp: dict) -> ToolResult:
 
     if str(inp.get("include_checks", "true")).lower() not in ("false", "0", "no"):
         for cat in categories:
-            checks = await query(
+            checks = await cached_query(
                 """SELECT id, check_code, check_name, description, mandatory_for, is_critical, order_index
                    FROM ref_prerequisite_checks
                    WHERE category_id = %s
@@ -64,7 +66,7 @@ async def validate_prerequisites_handler(inp: dict) -> ToolResult:
         approval_track = inp["approval_track"]
 
     # Get all applicable checks
-    checks = await query(
+    checks = await cached_query(
         """SELECT c.id, c.check_code, c.check_name, c.mandatory_for, c.is_critical,
                   cat.category_name, cat.weight
            FROM ref_prerequisite_checks c
@@ -212,10 +214,36 @@ async def get_form_field_value_handler(inp: dict) -> ToolResult:
     })
 
 
+# ─── Tool 5: screen_prohibited_items ──────────────────────────────
+
+SCREEN_PROHIBITED_ITEMS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "product_description": {"type": "string", "description": "Product name and description text to screen"},
+        "jurisdiction_code": {"type": "string", "description": "Only report items applying to this jurisdiction (e.g. SG, HK). Defaults to all"},
+    },
+    "required": ["product_description"],
+}
+
+
+async def screen_prohibited_items_handler(inp: dict) -> ToolResult:
+    hits = await prohibited_matcher.screen(inp["product_description"], inp.get("jurisdiction_code"))
+    hard_stops = [h["item_code"] for h in hits if h["severity"] == "HARD_STOP"]
+
+    return ToolResult(success=True, data={
+        "jurisdiction_code": inp.get("jurisdiction_code") or "ALL",
+        "hits": hits,
+        "hit_count": len(hits),
+        "hard_stops": hard_stops,
+        "result": "FAIL" if hard_stops else "WARNING" if hits else "PASS",
+    })
+
+
 # ── Register ──────────────────────────────────────────────────────
 registry.register_all([
     ToolDefinition(name="get_prerequisite_categories", description="Get all prerequisite categories and their individual checks for NPA readiness validation.", category="risk", input_schema=GET_PREREQUISITE_CATEGORIES_SCHEMA, handler=get_prerequisite_categories_handler),
     ToolDefinition(name="validate_prerequisites", description="Validate all prerequisites for an NPA project and compute a readiness score.", category="risk", input_schema=VALIDATE_PREREQUISITES_SCHEMA, handler=validate_prerequisites_handler),
     ToolDefinition(name="save_risk_check_result", description="Save the result of a risk check layer (prohibited list, sanctions, AML, reputational).", category="risk", input_schema=SAVE_RISK_CHECK_RESULT_SCHEMA, handler=save_risk_check_result_handler),
     ToolDefinition(name="get_form_field_value", description="Look up a specific form field value for an NPA project with its lineage and confidence score.", category="risk", input_schema=GET_FORM_FIELD_VALUE_SCHEMA, handler=get_form_field_value_handler),
+    ToolDefinition(name="screen_prohibited_items", description="Screen a product description against the prohibited list (item names and codes) in one pass. Returns matched items with severity and a PASS/WARNING/FAIL result.", category="risk", input_schema=SCREEN_PROHIBITED_ITEMS_SCHEMA, handler=screen_prohibited_items_handler),
 ])
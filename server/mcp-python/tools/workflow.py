@@ -5,7 +5,7 @@ Workflow state management, session history, routing decisions, user profiles.
 import json
 
 from registry import ToolDefinition, ToolResult, registry
-from db import execute, query
+from db import execute, query, transaction
 
 
 # ─── Tool 1: get_workflow_state ──────────────────────────────────
@@ -67,20 +67,6 @@ ADVANCE_WORKFLOW_STATE_SCHEMA = {
 
 
 async def advance_workflow_state_handler(inp: dict) -> ToolResult:
-    project = await query(
-        "SELECT current_stage FROM npa_projects WHERE id = %s",
-        [inp["project_id"]],
-    )
-    previous_stage = project[0].get("current_stage", "UNKNOWN") if project else "UNKNOWN"
-
-    # Complete current IN_PROGRESS state
-    await execute(
-        """UPDATE npa_workflow_states SET status = 'COMPLETED', completed_at = NOW()
-           WHERE project_id = %s AND status = 'IN_PROGRESS'""",
-        [inp["project_id"]],
-    )
-
-    # Create new state
     blockers_raw = inp.get("blockers")
     if isinstance(blockers_raw, str) and blockers_raw:
         blockers_json = json.dumps([b.strip() for b in blockers_raw.split(",") if b.strip()])
@@ -88,17 +74,34 @@ async def advance_workflow_state_handler(inp: dict) -> ToolResult:
         blockers_json = json.dumps(blockers_raw) if blockers_raw else None
     else:
         blockers_json = None
-    await execute(
-        """INSERT INTO npa_workflow_states (project_id, stage_id, status, started_at, blockers)
-           VALUES (%s, %s, 'IN_PROGRESS', NOW(), %s)""",
-        [inp["project_id"], inp["new_stage"], blockers_json],
-    )
 
-    # Update project's current_stage
-    await execute(
-        "UPDATE npa_projects SET current_stage = %s, updated_at = NOW() WHERE id = %s",
-        [inp["new_stage"], inp["project_id"]],
-    )
+    # One connection, one commit: the stage transition is atomic
+    async with transaction() as tx:
+        project = await tx.query(
+            "SELECT current_stage FROM npa_projects WHERE id = %s FOR UPDATE",
+            [inp["project_id"]],
+        )
+        previous_stage = project[0].get("current_stage", "UNKNOWN") if project else "UNKNOWN"
+
+        # Complete current IN_PROGRESS state
+        await tx.execute(
+            """UPDATE npa_workflow_states SET status = 'COMPLETED', completed_at = NOW()
+               WHERE project_id = %s AND status = 'IN_PROGRESS'""",
+            [inp["project_id"]],
+        )
+
+        # Create new state
+        await tx.execute(
+            """INSERT INTO npa_workflow_states (project_id, stage_id, status, started_at, blockers)
+               VALUES (%s, %s, 'IN_PROGRESS', NOW(), %s)""",
+            [inp["project_id"], inp["new_stage"], blockers_json],
+        )
+
+        # Update project's current_stage
+        await tx.execute(
+            "UPDATE npa_projects SET current_stage = %s, updated_at = NOW() WHERE id = %s",
+            [inp["new_stage"], inp["project_id"]],
+        )
 
     return ToolResult(success=True, data={
         "project_id": inp["project_id"],